@@ -100,21 +100,21 @@ class Embedder():
         return result
 
     
-def get_approx_knn_mapping_by_size(emb_size):
+def get_approx_knn_mapping_by_size(emb_size, engine="nmslib"):
     retval = {
         "type": "knn_vector",
                 "dimension": emb_size,
                 "method": {
                     "name": "hnsw",
                     "space_type": "cosinesimil",
-                    "engine": "nmslib",
+                    "engine": engine,
                     "parameters": {"ef_construction": 128, "m": 24}
                 }
     }
     return retval
 
 
-def get_approx_knn_mapping(fieldnames, emb_sizes):
+def get_approx_knn_mapping(fieldnames, emb_sizes, engine="nmslib"):
     retval = {
         "settings": {
             "index": {"knn": True, "knn.algo_param.ef_search": 100, "number_of_shards": 2}
@@ -126,7 +126,7 @@ def get_approx_knn_mapping(fieldnames, emb_sizes):
     
     for i in range(len(fieldnames)):
         retval["mappings"]["properties"][fieldnames[i]
-                                         ] = get_approx_knn_mapping_by_size(emb_sizes[i])
+                                         ] = get_approx_knn_mapping_by_size(emb_sizes[i], engine)
     return retval
 
 
@@ -1,4 +1,6 @@
-from typing import Any
+import json
+from typing import Any, Iterator
+
 import httpx
 
 
@@ -59,7 +61,9 @@ class SearchServiceClient:
         response.raise_for_status()
         return response.json()
 
-    def scan(self, query: dict):
-        response = self.client.post("/scan", json=query)
-        response.raise_for_status()
-        return response.json()
+    def scan(self, query: dict) -> Iterator[dict]:
+        with self.client.stream("POST", "/scan", json=query) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
@@ -113,7 +113,7 @@ def test_delta_ingest(
 ):
     httpx_mock.add_response(
         url=f"{config['base_url_search']}/scan",
-        json=[{"_id": "test1"}, {"_id": "test3"}],
+        content=b'{"_id": "test1"}\n{"_id": "test3"}\n',
         status_code=200,
     )
     httpx_mock.add_response(
@@ -274,7 +274,7 @@ def test_delete(
 ):
     httpx_mock.add_response(
         url=f"{config['base_url_search']}/scan",
-        json=[{"_id": "test1"}, {"_id": "test3"}],
+        content=b'{"_id": "test1"}\n{"_id": "test3"}\n',
         status_code=200,
     )
     httpx_mock.add_response(
@@ -1,10 +1,12 @@
+import json
 import os
 from typing import Annotated, Any
 
 from envyaml import EnvYAML
 from fastapi import APIRouter, Depends, FastAPI, Query, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from opensearchpy.exceptions import TransportError
+from src.models import KnnRequest, KnnResponse
 from src.oss_accessor import OssAccessor
 
 NAMESPACE = "search"
@@ -28,6 +30,11 @@ def health_check():
     return {"status": "OK"}
 
 
+@router.get("/cache-stats")
+def cache_stats(oss_accessor: OssAccessor = Depends(get_oss_accessor)):
+    return oss_accessor.cache_stats()
+
+
 @router.post("/documents/{document_id}")
 def create_document(
     document_id: str,
@@ -81,12 +88,37 @@ def get_document_with_query(
 @router.post("/scan")
 def scan_documents(
     query: dict[str, Any],
+    fields: Annotated[str | None, Query()] = None,
+    size: Annotated[int, Query(gt=0, le=10000)] = 1000,
+    scroll: Annotated[str, Query()] = "5m",
+    pit: Annotated[bool, Query()] = False,
     oss_accessor: OssAccessor = Depends(get_oss_accessor),
 ):
-    return oss_accessor.scan_oss_docs(query)
+    _fields = fields.split(",") if fields else []
+    hits = oss_accessor.scan_oss_docs(
+        query, fields=_fields, size=size, scroll=scroll, use_pit=pit
+    )
+    return StreamingResponse(
+        (json.dumps(hit) + "\n" for hit in hits),
+        media_type="application/x-ndjson",
+    )
+
 
+@router.post("/knn")
+def get_nearest_neighbours(
+    request: KnnRequest,
+    oss_accessor: OssAccessor = Depends(get_oss_accessor),
+) -> KnnResponse:
+    ids, scores = oss_accessor.knn_search(
+        field=request.field,
+        k=request.k,
+        id=request.id,
+        vector=request.vector,
+        filter=request.filter,
+        mode=request.mode,
+    )
+    return KnnResponse(ids=ids, scores=scores)
 
-# TODO: search query for the nearest neighbors
 
 app = FastAPI(title="Search Service")
 app.include_router(router, prefix=ROUTER_PREFIX)
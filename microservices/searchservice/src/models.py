@@ -0,0 +1,29 @@
+import enum
+from typing import Any
+
+from pydantic import BaseModel, Field, model_validator
+
+
+class KnnMode(str, enum.Enum):
+    EXACT = "exact"
+    APPROXIMATE = "approximate"
+
+
+class KnnRequest(BaseModel):
+    id: str | None = None
+    vector: list[float] | None = None
+    field: str
+    k: int = Field(default=10, gt=0, le=1000)
+    filter: dict[str, Any] | None = None
+    mode: KnnMode = KnnMode.EXACT
+
+    @model_validator(mode="after")
+    def check_id_or_vector(self) -> "KnnRequest":
+        if (self.id is None) == (self.vector is None):
+            raise ValueError("Exactly one of 'id' or 'vector' must be given")
+        return self
+
+
+class KnnResponse(BaseModel):
+    ids: list[str]
+    scores: list[float]
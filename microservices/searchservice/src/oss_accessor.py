@@ -1,6 +1,7 @@
+import itertools
 import json
 import logging
-from typing import Any, Iterator
+from typing import Any, Iterable, Iterator
 
 import sys
 
@@ -13,20 +14,57 @@ else:
 
 from fastapi import HTTPException
 from opensearchpy import (
+    NotFoundError,
     OpenSearch,
     RequestError,
     RequestsHttpConnection,
     helpers,
 )
+from src.cache import LRUCache
+from src.models import KnnMode
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, format="%(message)s")
 
 
 class OssAccessor:
-    def __init__(self, index: str, client: OpenSearch) -> None:
+    # engines supporting efficient filtering inside the knn clause
+    KNN_FILTERING_ENGINES = ("lucene", "faiss")
+
+    def __init__(
+        self,
+        index: str,
+        client: OpenSearch,
+        vector_cache_size: int = 10000,
+        read_cache_size: int = 0,
+        read_cache_ttl: float | None = None,
+        knn_engine: str | None = None,
+        knn_oversampling: int = 5,
+    ) -> None:
         self.target_idx_name = index
         self.oss_client = client
+        # knn engine of all vector fields, read from the field mappings if not configured
+        self.knn_engine = knn_engine
+        self.knn_oversampling = knn_oversampling
+        # vector field -> knn engine from its mapping
+        self._knn_engines: dict[str, str] = {}
+        # (document id, vector field) -> vector
+        self.vector_cache = LRUCache(maxsize=vector_cache_size)
+        # optional read-through caches, disabled if no size is configured
+        # (document id, requested fields) -> response
+        self.doc_cache = (
+            LRUCache(maxsize=read_cache_size, ttl=read_cache_ttl)
+            if read_cache_size
+            else None
+        )
+        # normalized query body -> response
+        self.query_cache = (
+            LRUCache(maxsize=read_cache_size, ttl=read_cache_ttl)
+            if read_cache_size
+            else None
+        )
+        # (cache attribute, fields) combinations in use, needed to invalidate by id
+        self._cached_fields: set[tuple[str, str]] = set()
 
     @classmethod
     def from_config(cls, config) -> Self:
@@ -48,16 +86,54 @@ class OssAccessor:
             timeout=600,
         )
 
-        return cls(index, client)
+        read_cache_enabled = config.get("read_cache.enabled", False)
+        return cls(
+            index,
+            client,
+            vector_cache_size=config.get("knn.vector_cache_size", 10000),
+            read_cache_size=config.get("read_cache.maxsize", 1024)
+            if read_cache_enabled
+            else 0,
+            read_cache_ttl=config.get("read_cache.ttl", 60),
+            knn_engine=config.get("knn.engine") or None,
+            knn_oversampling=config.get("knn.oversampling", 5),
+        )
+
+    def invalidate(self, ids: Iterable[str]) -> None:
+        """Drops cached reads that may be affected by writes to the given ids.
+
+        Cached query responses cannot be attributed to single documents, since
+        a written document may start or stop matching any query, so they are
+        dropped entirely. Writes invalidate once they are visible to searches,
+        so reads arriving meanwhile cannot put outdated responses back.
+        """
+        for id in ids:
+            for cache_name, fields_key in list(self._cached_fields):
+                cache = getattr(self, cache_name)
+                if cache is not None:
+                    cache.pop((id, fields_key))
+        if self.query_cache is not None:
+            self.query_cache.clear()
+
+    def cache_stats(self) -> dict[str, dict[str, Any]]:
+        stats = {"knn": self.vector_cache.stats()}
+        if self.doc_cache is not None:
+            stats["documents"] = self.doc_cache.stats()
+        if self.query_cache is not None:
+            stats["query"] = self.query_cache.stats()
+        return stats
 
     def create_oss_doc(self, id: str, data: dict[str, Any]):
         # add document to index
-        response = self.oss_client.update(
-            index=self.target_idx_name,
-            body={"doc": data, "doc_as_upsert": True},
-            id=id,
-            refresh=True,
-        )
+        try:
+            response = self.oss_client.update(
+                index=self.target_idx_name,
+                body={"doc": data, "doc_as_upsert": True},
+                id=id,
+                refresh=True,
+            )
+        finally:
+            self.invalidate([id])
 
         logger.info(
             "Response os OSS update: " + json.dumps(response, indent=4, default=str)
@@ -66,29 +142,42 @@ class OssAccessor:
         return response
 
     def delete_oss_doc(self, id: str):
-        return self.oss_client.delete(index=self.target_idx_name, id=id)
+        try:
+            return self.oss_client.delete(
+                index=self.target_idx_name, id=id, refresh="wait_for"
+            )
+        finally:
+            self.invalidate([id])
 
     def bulk_ingest(self, jsonlst: dict[str, dict]) -> None:
-        for success, info in helpers.parallel_bulk(
-            client=self.oss_client,
-            index=self.target_idx_name,
-            raise_on_error=False,
-            raise_on_exception=False,
-            actions=self.upsert_action_generator(jsonlst),
-        ):
-            if not success:
-                print("A document failed:", info)
+        try:
+            for success, info in helpers.parallel_bulk(
+                client=self.oss_client,
+                index=self.target_idx_name,
+                raise_on_error=False,
+                raise_on_exception=False,
+                refresh="wait_for",
+                actions=self.upsert_action_generator(jsonlst),
+            ):
+                if not success:
+                    print("A document failed:", info)
+        finally:
+            self.invalidate(jsonlst.keys())
 
     def bulk_delete(self, ids: list[str]) -> None:
-        for success, info in helpers.parallel_bulk(
-            client=self.oss_client,
-            index=self.target_idx_name,
-            raise_on_error=False,
-            raise_on_exception=False,
-            actions=self.delete_action_generator(ids),
-        ):
-            if not success:
-                print("A delete failed:", info)
+        try:
+            for success, info in helpers.parallel_bulk(
+                client=self.oss_client,
+                index=self.target_idx_name,
+                raise_on_error=False,
+                raise_on_exception=False,
+                refresh="wait_for",
+                actions=self.delete_action_generator(ids),
+            ):
+                if not success:
+                    print("A delete failed:", info)
+        finally:
+            self.invalidate(ids)
 
     def upsert_action_generator(
         self, jsonlst: dict[str, dict]
@@ -110,26 +199,270 @@ class OssAccessor:
             }
 
     def get_oss_doc(self, id: str, fields: list[str]) -> dict:
-        return self.oss_client.get(
+        fields_key = ",".join(sorted(fields))
+        if self.doc_cache is not None:
+            cached = self.doc_cache.get((id, fields_key))
+            if cached is not None:
+                return cached
+
+        response = self.oss_client.get(
             index=self.target_idx_name,
             id=id,
             params={"_source_includes": ",".join(fields)},
         )
 
+        if self.doc_cache is not None:
+            self._cached_fields.add(("doc_cache", fields_key))
+            self.doc_cache.set((id, fields_key), response)
+        return response
+
     def get_oss_docs(self, query: dict[str, str]) -> dict:
+        cache_key = json.dumps(query, sort_keys=True, default=str)
+        if self.query_cache is not None:
+            cached = self.query_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        try:
+            response = self.oss_client.search(index=self.target_idx_name, body=query)
+        except RequestError as e:
+            raise HTTPException(
+                detail=f"Invalid query: {e.info}", status_code=400
+            ) from e
+
+        if self.query_cache is not None:
+            self.query_cache.set(cache_key, response)
+        return response
+
+    def knn_search(
+        self,
+        field: str,
+        k: int,
+        id: str | None = None,
+        vector: list[float] | None = None,
+        filter: dict[str, Any] | None = None,
+        mode: KnnMode = KnnMode.EXACT,
+    ) -> tuple[list[str], list[float]]:
+        """Finds the k nearest neighbours of a document or a vector.
+
+        :param field: knn vector field of the model to search in
+        :param k: number of neighbours
+        :param id: id of the reference document, its vector is looked up and cached
+        :param vector: reference vector, used if no id is given
+        :param filter: OpenSearch query restricting the candidate documents
+        :param mode: exact script score search or approximate HNSW search
+        :return: ids and raw OpenSearch scores of the neighbours
+        """
+        if id is not None:
+            vector = self.get_vector(id, field)
+
+        if mode == KnnMode.APPROXIMATE:
+            query = self._compose_approximate_knn_query(
+                field,
+                vector,
+                k,
+                filter,
+                self.get_knn_engine(field),
+                self.knn_oversampling,
+            )
+        else:
+            query = self._compose_exact_knn_query(field, vector, k, filter)
+
         try:
-            return self.oss_client.search(index=self.target_idx_name, body=query)
+            response = self.oss_client.search(index=self.target_idx_name, body=query)
         except RequestError as e:
             raise HTTPException(
                 detail=f"Invalid query: {e.info}", status_code=400
             ) from e
 
-    def scan_oss_docs(self, query: dict[str, str]) -> list[dict]:
+        hits = response["hits"]["hits"]
+        return [hit["_id"] for hit in hits], [hit["_score"] for hit in hits]
+
+    def get_vector(self, id: str, field: str) -> list[float]:
+        vector = self.vector_cache.get((id, field))
+        if vector is not None:
+            return vector
+
         try:
-            return list(
-                helpers.scan(self.oss_client, query=query, index=self.target_idx_name)
+            response = self.oss_client.get(
+                index=self.target_idx_name, id=id, params={"_source_includes": field}
+            )
+        except NotFoundError as e:
+            raise HTTPException(
+                detail=f"Document [{id}] not found", status_code=404
+            ) from e
+
+        vector = response.get("_source", {}).get(field)
+        if not vector:
+            raise HTTPException(
+                detail=f"Document [{id}] has no vector in field [{field}]",
+                status_code=404,
+            )
+
+        self._cached_fields.add(("vector_cache", field))
+        self.vector_cache.set((id, field), vector)
+        return vector
+
+    @staticmethod
+    def _compose_exact_knn_query(
+        field: str, vector: list[float], k: int, filter: dict[str, Any] | None
+    ) -> dict[str, Any]:
+        return {
+            "size": k,
+            "_source": False,
+            "query": {
+                "script_score": {
+                    "query": {"bool": {"filter": [filter]}}
+                    if filter
+                    else {"match_all": {}},
+                    "script": {
+                        "source": "knn_score",
+                        "lang": "knn",
+                        "params": {
+                            "field": field,
+                            "query_value": vector,
+                            "space_type": "cosinesimil",
+                        },
+                    },
+                }
+            },
+        }
+
+    def get_knn_engine(self, field: str) -> str:
+        """Returns the knn engine of the vector field, as configured or set in its mapping.
+
+        Fields without an engine in their mapping use the OpenSearch default nmslib.
+        """
+        if self.knn_engine:
+            return self.knn_engine
+        engine = self._knn_engines.get(field)
+        if engine is None:
+            response = self.oss_client.indices.get_field_mapping(
+                index=self.target_idx_name, fields=field
             )
+            engine = "nmslib"
+            for index_mapping in response.values():
+                mapping = (
+                    index_mapping.get("mappings", {})
+                    .get(field, {})
+                    .get("mapping", {})
+                    .get(field, {})
+                )
+                engine = mapping.get("method", {}).get("engine", engine)
+            self._knn_engines[field] = engine
+        return engine
+
+    @classmethod
+    def _compose_approximate_knn_query(
+        cls,
+        field: str,
+        vector: list[float],
+        k: int,
+        filter: dict[str, Any] | None,
+        engine: str = "nmslib",
+        oversampling: int = 5,
+    ) -> dict[str, Any]:
+        knn_clause: dict[str, Any] = {"vector": vector, "k": k}
+        query: dict[str, Any] = {"size": k, "_source": False}
+        if not filter:
+            query["query"] = {"knn": {field: knn_clause}}
+        elif engine in cls.KNN_FILTERING_ENGINES:
+            # efficient filtering: the graph search only visits matching documents
+            knn_clause["filter"] = filter
+            query["query"] = {"knn": {field: knn_clause}}
+        else:
+            # engines without efficient filtering drop non-matching neighbours
+            # after the graph search, so oversample to still fill up k results
+            knn_clause["k"] = k * oversampling
+            query["query"] = {
+                "bool": {
+                    "must": [{"knn": {field: knn_clause}}],
+                    "filter": [filter],
+                }
+            }
+        return query
+
+    def scan_oss_docs(
+        self,
+        query: dict[str, Any],
+        fields: list[str] | None = None,
+        size: int = 1000,
+        scroll: str = "5m",
+        use_pit: bool = False,
+    ) -> Iterator[dict]:
+        """Lazily iterates over all hits matching the query.
+
+        The first page is requested eagerly so that invalid queries are reported
+        before the caller starts streaming a response.
+
+        :param query: OpenSearch query body
+        :param fields: source fields to return, only the document ids are returned if empty
+        :param size: number of hits fetched per round trip
+        :param scroll: keep alive of the scroll context or point in time
+        :param use_pit: paginate with a point in time and search_after instead of a scroll
+        :return: iterator over the hits
+        """
+        query = self._project_source(query, fields)
+        if use_pit:
+            hits = self._scan_with_pit(query, size, scroll)
+        else:
+            hits = helpers.scan(
+                self.oss_client,
+                query=query,
+                index=self.target_idx_name,
+                size=size,
+                scroll=scroll,
+            )
+
+        try:
+            first_hit = next(hits, None)
         except RequestError as e:
             raise HTTPException(
                 detail=f"Invalid query: {e.info}", status_code=400
             ) from e
+
+        if first_hit is None:
+            return iter(())
+        return itertools.chain([first_hit], hits)
+
+    @staticmethod
+    def _project_source(
+        query: dict[str, Any], fields: list[str] | None
+    ) -> dict[str, Any]:
+        # never ship full documents (including embedding vectors) unless asked for
+        query = dict(query)
+        if fields:
+            query["_source"] = {"includes": fields}
+        elif "_source" not in query:
+            query["_source"] = False
+        return query
+
+    def _scan_with_pit(
+        self, query: dict[str, Any], size: int, keep_alive: str
+    ) -> Iterator[dict]:
+        pit_id = self.oss_client.create_pit(
+            index=self.target_idx_name, params={"keep_alive": keep_alive}
+        )["pit_id"]
+        # _shard_doc is the cheap unique tiebreaker of a point in time, sorting by _id would load fielddata
+        sort = list(query.get("sort", []))
+        if not any("_shard_doc" in clause for clause in sort):
+            sort.append({"_shard_doc": "asc"})
+        body = {
+            **query,
+            "size": size,
+            "pit": {"id": pit_id, "keep_alive": keep_alive},
+            "sort": sort,
+        }
+        try:
+            while True:
+                response = self.oss_client.search(body=body)
+                hits = response["hits"]["hits"]
+                if not hits:
+                    break
+                yield from hits
+                if len(hits) < size:
+                    break
+                body["pit"]["id"] = response.get("pit_id", body["pit"]["id"])
+                body["search_after"] = hits[-1]["sort"]
+        finally:
+            self.oss_client.delete_pit(body={"pit_id": [body["pit"]["id"]]})
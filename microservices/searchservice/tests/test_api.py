@@ -1,3 +1,4 @@
+import json
 import os
 from time import sleep
 
@@ -221,8 +222,52 @@ def test_scan_documents__valid_request(test_client: TestClient):
         },
     )
     assert response.status_code == 200
-    assert len(response.json()) == 2
-    assert [item["_id"] for item in response.json()] == ["test1", "test2"]
+    assert response.headers["content-type"] == "application/x-ndjson"
+    hits = [json.loads(line) for line in response.iter_lines() if line]
+    assert len(hits) == 2
+    assert [item["_id"] for item in hits] == ["test1", "test2"]
+
+
+def test_scan_documents__source_is_projected(test_client: TestClient):
+    response = test_client.post(
+        "/documents/test1",
+        json={"id": "test1", "title": "test", "embedding_01": [0.1, 0.2]},
+    )
+    assert response.status_code == 200
+
+    response = test_client.post("scan", json={"query": {"match_all": {}}})
+    assert response.status_code == 200
+    hits = [json.loads(line) for line in response.iter_lines() if line]
+    assert [item["_id"] for item in hits] == ["test1"]
+    assert "_source" not in hits[0]
+
+    response = test_client.post(
+        "scan?fields=id,title", json={"query": {"match_all": {}}}
+    )
+    assert response.status_code == 200
+    hits = [json.loads(line) for line in response.iter_lines() if line]
+    assert hits[0]["_source"] == {"id": "test1", "title": "test"}
+
+
+def test_scan_documents__with_point_in_time(test_client: TestClient):
+    for id in ["test1", "test2", "test3"]:
+        response = test_client.post(f"/documents/{id}", json={"id": id})
+        assert response.status_code == 200
+
+    response = test_client.post(
+        "scan?pit=true&size=2", json={"query": {"match_all": {}}}
+    )
+    assert response.status_code == 200
+    hits = [json.loads(line) for line in response.iter_lines() if line]
+    assert [item["_id"] for item in hits] == ["test1", "test2", "test3"]
+
+
+def test_scan_documents__invalid_request(test_client: TestClient):
+    response = test_client.post(
+        "scan",
+        json={"query": {"bool": {"must_not": [{"exists": {"wrong": ["test"]}}]}}},
+    )
+    assert response.status_code == 400
 
 
 def test_bulk_delete_document__valid_request(test_client: TestClient):
@@ -251,3 +296,146 @@ def test_bulk_delete_document__valid_request(test_client: TestClient):
     sleep(1)  # wait for data to be deleted
     assert test_client.get("/documents/test1").is_error
     assert test_client.get("/documents/test2").is_error
+
+
+@pytest.fixture
+def knn_index(oss_client: OpenSearch, oss_index: str):
+    oss_client.indices.delete(index=oss_index)
+    oss_client.indices.create(
+        index=oss_index,
+        body={
+            "settings": {"index": {"knn": True}},
+            "mappings": {
+                "properties": {
+                    "embedding_01": {
+                        "type": "knn_vector",
+                        "dimension": 2,
+                        "method": {
+                            "name": "hnsw",
+                            "space_type": "cosinesimil",
+                            "engine": "nmslib",
+                        },
+                    }
+                }
+            },
+        },
+    )
+    documents = {
+        "test1": {"id": "test1", "genre": "a", "embedding_01": [1.0, 0.0]},
+        "test2": {"id": "test2", "genre": "a", "embedding_01": [0.9, 0.1]},
+        "test3": {"id": "test3", "genre": "b", "embedding_01": [0.0, 1.0]},
+    }
+    for id, document in documents.items():
+        oss_client.index(oss_index, document, id, params={"refresh": "true"})
+
+
+@pytest.mark.usefixtures("knn_index")
+@pytest.mark.parametrize("mode", ["exact", "approximate"])
+def test_knn__by_id(test_client: TestClient, mode: str):
+    response = test_client.post(
+        "/knn", json={"id": "test1", "field": "embedding_01", "k": 2, "mode": mode}
+    )
+    assert response.status_code == 200
+    assert response.json()["ids"] == ["test1", "test2"]
+    assert len(response.json()["scores"]) == 2
+
+
+@pytest.mark.usefixtures("knn_index")
+def test_knn__by_vector_with_filter(test_client: TestClient):
+    response = test_client.post(
+        "/knn",
+        json={
+            "vector": [1.0, 0.0],
+            "field": "embedding_01",
+            "k": 3,
+            "filter": {"term": {"genre.keyword": "b"}},
+        },
+    )
+    assert response.status_code == 200
+    assert response.json()["ids"] == ["test3"]
+
+
+@pytest.mark.usefixtures("knn_index")
+def test_knn__approximate_with_filter_on_nmslib(test_client: TestClient):
+    response = test_client.post(
+        "/knn",
+        json={
+            "vector": [1.0, 0.0],
+            "field": "embedding_01",
+            "k": 2,
+            "filter": {"term": {"genre.keyword": "a"}},
+            "mode": "approximate",
+        },
+    )
+    assert response.status_code == 200
+    assert response.json()["ids"] == ["test1", "test2"]
+
+
+@pytest.mark.usefixtures("knn_index")
+def test_knn__unknown_id(test_client: TestClient):
+    response = test_client.post(
+        "/knn", json={"id": "unknown", "field": "embedding_01", "k": 2}
+    )
+    assert response.status_code == 404
+
+
+def test_knn__malformed_request(test_client: TestClient):
+    response = test_client.post(
+        "/knn", json={"id": "test1", "vector": [1.0, 0.0], "field": "embedding_01"}
+    )
+    assert response.status_code == 422
+
+
+def test_read_cache__invalidated_on_write(
+    test_client: TestClient, oss_client: OpenSearch, oss_index: str
+):
+    from src.main import app, get_oss_accessor
+
+    oss_accessor = OssAccessor(
+        oss_index, oss_client, read_cache_size=10, read_cache_ttl=60
+    )
+    app.dependency_overrides[get_oss_accessor] = lambda: oss_accessor
+
+    response = test_client.post("/documents/test", json={"id": "test", "hash": "a"})
+    assert response.status_code == 200
+
+    assert test_client.get("/documents/test?fields=hash").json()["_source"] == {
+        "hash": "a"
+    }
+    assert test_client.get("/documents/test?fields=hash").json()["_source"] == {
+        "hash": "a"
+    }
+
+    response = test_client.post("/documents/test", json={"hash": "b"})
+    assert response.status_code == 200
+    assert test_client.get("/documents/test?fields=hash").json()["_source"] == {
+        "hash": "b"
+    }
+
+    response = test_client.get("/cache-stats")
+    assert response.status_code == 200
+    assert response.json()["documents"]["hits"] == 1
+    assert response.json()["documents"]["misses"] == 2
+
+
+def test_read_cache__read_during_bulk_write_is_not_served(
+    oss_client: OpenSearch, oss_index: str, monkeypatch: pytest.MonkeyPatch
+):
+    oss_accessor = OssAccessor(
+        oss_index, oss_client, read_cache_size=10, read_cache_ttl=60
+    )
+    oss_accessor.bulk_ingest({"test": {"hash": "a"}})
+    query = {"query": {"term": {"hash.keyword": "b"}}}
+    bulk = oss_client.bulk
+
+    def bulk_with_concurrent_read(*args, **kwargs):
+        # reads arriving before the written documents are refreshed see the old state
+        oss_accessor.get_oss_doc("test", ["hash"])
+        oss_accessor.get_oss_docs(query)
+        return bulk(*args, **kwargs)
+
+    monkeypatch.setattr(oss_client, "bulk", bulk_with_concurrent_read)
+    oss_accessor.bulk_ingest({"test": {"hash": "b"}})
+
+    assert oss_accessor.get_oss_doc("test", ["hash"])["_source"] == {"hash": "b"}
+    assert oss_accessor.get_oss_docs(query)["hits"]["total"]["value"] == 1
@@ -0,0 +1,85 @@
+import argparse
+import copy
+import sys
+import timeit
+import tracemalloc
+import pathlib
+from dataclasses import fields
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent / "src"))
+
+from dto.content_item import ContentItemDto  # noqa: E402
+from dto.wdr_content_item import WDRContentItemDto  # noqa: E402
+from util.dto_utils import items_from_props, update_from_props  # noqa: E402
+
+FIELD_MAPPING = {
+    "showTitle": "show_title",
+    "teaserimage": "teaser_image",
+    "createdFormatted": "created_formatted",
+}
+
+
+def legacy_update_from_props(item, database_props, field_mapping):
+    """Per hit hydration as done before the field plans, for comparison"""
+    item_props = {f.name for f in fields(item) if f.init and not f.name.startswith("_")}
+    for prop in item_props:
+        mapped_key = field_mapping.get(prop, prop)
+        value = database_props.get(mapped_key)
+        if value:
+            setattr(item, prop, value)
+    return item
+
+
+def make_hits(item_class, num_hits):
+    props = [f for f in fields(item_class) if f.init and not f.name.startswith("_")]
+    hits = []
+    for i in range(num_hits):
+        hit = {"embedding_01": [0.1] * 16}
+        for f in props:
+            key = FIELD_MAPPING.get(f.name, f.name)
+            if f.type in (int, "int"):
+                hit[key] = i
+            elif f.type in (bool, "bool"):
+                hit[key] = bool(i % 2)
+            else:
+                hit[key] = f"{f.name}-{i}"
+        hits.append(hit)
+    return hits
+
+
+def measure_memory(template, hits):
+    tracemalloc.start()
+    items = items_from_props(template, hits, FIELD_MAPPING)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del items
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark of dto hydration from OpenSearch hits")
+    parser.add_argument("-n", "--hits", type=int, default=500, help="hits per response")
+    parser.add_argument("-r", "--repeat", type=int, default=50, help="responses per measurement")
+    args = parser.parse_args()
+
+    for item_class in (ContentItemDto, WDRContentItemDto):
+        template = item_class(_position="reco", _item_type="content", _provenance="c2c")
+        hits = make_hits(item_class, args.hits)
+        runs = {
+            "legacy per hit": lambda: [
+                legacy_update_from_props(copy.copy(template), hit, FIELD_MAPPING) for hit in hits
+            ],
+            "update_from_props": lambda: [
+                update_from_props(copy.copy(template), hit, FIELD_MAPPING) for hit in hits
+            ],
+            "items_from_props": lambda: items_from_props(template, hits, FIELD_MAPPING),
+        }
+        print(f"{item_class.__name__}: {args.hits} hits x {args.repeat} responses")
+        for name, run in runs.items():
+            seconds = min(timeit.repeat(run, number=args.repeat, repeat=3))
+            print(f"  {name:<20} {seconds * 1000 / args.repeat:8.2f} ms per response")
+        print(f"  {'memory':<20} {measure_memory(template, hits) / args.hits:8.0f} bytes per dto")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 import logging
 import sys
+import time
+from contextlib import contextmanager
 
 import panel as pn
 
@@ -18,10 +20,18 @@ logging.basicConfig()
 logging.getLogger().setLevel(logging.INFO)
 
 
-def getExplorerInstance(
-    config_full_paths: dict[str, str], config: dict[str, str], client: str
-):
-    return RecoExplorerApp(config_full_paths, config, client).render()
+@contextmanager
+def timed(timings: dict[str, float], step: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[step] = time.perf_counter() - start
+
+
+def log_startup_timings(timings: dict[str, float]) -> None:
+    steps = ", ".join(f"{step}: {duration * 1000:.1f}ms" for step, duration in timings.items())
+    logger.info(f"Session startup took {sum(timings.values()) * 1000:.1f}ms ({steps})")
 
 
 #
@@ -30,6 +40,7 @@ def getExplorerInstance(
 if not len(sys.argv[1:]):
     exit("Unable to start Reco Explorer - no config was passed.")
 
+timings = {}
 try:
     client, config_full_path, config_full_paths = get_configs_from_arg(sys.argv[1])
 
@@ -39,13 +50,15 @@ try:
         if search:
             client, config_full_path = search
 
-    config = load_config(config_full_path)
-    config = load_deployment_version_config(config)
+    with timed(timings, "load_config"):
+        config = load_config(config_full_path)
+        config = load_deployment_version_config(config)
     config["reco_explorer_url_base"] = pn.state.location.href.replace(
         pn.state.location.search, ""
     )
 
-    setup_configuration = load_model_configuration(config)
+    with timed(timings, "load_model_configuration"):
+        setup_configuration = load_model_configuration(config)
 
     if setup_configuration.model_config.c2c_config:
         print(setup_configuration.model_config.c2c_config.to_dict())
@@ -56,7 +69,11 @@ try:
         config["s2c_config"] = setup_configuration.model_config.s2c_config.to_dict()
     if setup_configuration.open_search_config.index:
         config["opensearch.index"] = setup_configuration.open_search_config.index
-    getExplorerInstance(config_full_paths, config, client).server_doc()
+    with timed(timings, "build_app"):
+        app = RecoExplorerApp(config_full_paths, config, client)
+    with timed(timings, "render"):
+        app.render().server_doc()
+    log_startup_timings(timings)
 
 except ConfigError as e:
     logger.critical(e.message)
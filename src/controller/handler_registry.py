@@ -0,0 +1,74 @@
+import hashlib
+import json
+import logging
+import threading
+from typing import Any, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class HandlerRegistry:
+    """Process-wide registry of handler instances (seekers, accessors, model clients)
+
+    Handlers hold connection pools, credentials and parsed lookup files, so they are created
+    once per (handler, endpoint, config hash) key and shared by all sessions. Creation of a
+    handler runs at most once per key, even if several threads ask for it at the same time.
+    """
+
+    def __init__(self):
+        self._handlers: dict[Hashable, Any] = {}
+        self._creation_locks: dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Returns the handler registered for the key, creating it with the factory if needed
+
+        :param key: Registry key, see get_handler_key
+        :param factory: Callable creating the handler
+        :return: The shared handler instance
+        """
+        handler = self._handlers.get(key)
+        if handler is not None:
+            return handler
+
+        with self._lock:
+            creation_lock = self._creation_locks.setdefault(key, threading.Lock())
+        with creation_lock:
+            handler = self._handlers.get(key)
+            if handler is None:
+                logger.info(f"Creating handler for {key[:2] if isinstance(key, tuple) else key}")
+                handler = factory()
+                self._handlers[key] = handler
+        return handler
+
+    def invalidate(self, handler: str | None = None) -> None:
+        """Drops registered handlers, so they are created again on next use
+
+        :param handler: Handler class specifier (e.g. NnSeekerOpenSearch@model.opensearch.nn_seeker_opensearch),
+            drops all handlers if not given
+        """
+        with self._lock:
+            for key in list(self._handlers):
+                if handler is None or (isinstance(key, tuple) and key[0] == handler):
+                    del self._handlers[key]
+                    self._creation_locks.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._handlers)
+
+
+def get_config_hash(*configs) -> str:
+    """Builds a stable hash over one or more configs (EnvYAML or dicts)
+
+    :param configs: Configs to hash
+    :return: Hex digest of the configs
+    """
+    exported = [config.export() if hasattr(config, "export") else config for config in configs]
+    return hashlib.sha256(json.dumps(exported, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def get_handler_key(handler: str, endpoint: str | None, config_hash: str) -> tuple[str, str | None, str]:
+    return handler, endpoint, config_hash
+
+
+handler_registry = HandlerRegistry()
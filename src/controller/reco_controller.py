@@ -1,6 +1,7 @@
 from controller.RefinementWidgetManger.BrRefinementWidgetRequestManger import BrRefinementWidgetRequestManger
 from controller.RefinementWidgetManger.WdrRefinementWidgetRequestManger import WdrRefinementWidgetRequestManger
 from controller.RefinementWidgetManger.NoRefinementWidgetRequestManger import NoRefinementWidgetRequestManger
+from controller.RefinementWidgetManger.RefinementWidgetStatefulManger import RefinementWidgetStatefulManger
 from model.rest.nn_seeker_paservice_clients import NnSeekerPaServiceClients
 import logging
 import copy
@@ -9,28 +10,43 @@ import datetime
 import math
 import re
 import importlib
+import contextlib
+import contextvars
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait
+from typing import Iterator
 import constants
 from model.sagemaker.clustering_model_client import ClusteringModelClient
 from model.opensearch.base_data_accessor_opensearch import BaseDataAccessorOpenSearch
+from model.opensearch.nn_seeker_opensearch import VECTOR_CACHE
+from controller.handler_registry import handler_registry, get_config_hash, get_handler_key
+from controller.reco_result_cache import reco_result_cache
 from exceptions.config_error import ConfigError
 from exceptions.date_validation_error import DateValidationError
 from exceptions.model_validation_error import ModelValidationError
 from exceptions.user_not_found_error import UnknownUserError
 from exceptions.item_not_found_error import UnknownItemError
 from exceptions.embedding_not_found_error import UnknownItemEmbeddingError
-from exceptions.empty_search_error import EmptySearchError
-from util.postprocessing import FilterPostproc
+from exceptions.search_cancelled_error import SearchCancelledError
+from util.postprocessing import FilterPostproc, overfetch_stats
+from util.cache_utils import LRUCache
+from util.cancellation import CancellationToken, raise_if_cancelled, run_cancellable, submit_with_context
 from util.dto_utils import (update_from_props, dto_from_classname, dto_from_model, get_primary_idents, )
+from util.file_utils import CONFIG_CACHE, MODEL_CONFIG_CACHE, read_yaml
 from dto.user_item import UserItemDto
 from dto.item import ItemDto
-from envyaml import EnvYAML
 
 logger = logging.getLogger(__name__)
 
+# page fetched by a speculative prefetch running in this context, see RecommendationController.prefetch_next_page
+_prefetch_page: contextvars.ContextVar[int | None] = contextvars.ContextVar("prefetch_page", default=None)
+
 
 class RecommendationController():
     FILTER_FIELD_MATRIX = {"genre": "genreCategory", "subgenre": "subgenreCategories", "theme": "thematicCategories",
         "show": "showId", }
+    DEFAULT_ITEM_ACCESSOR = "BaseDataAccessorOpenSearch@model.opensearch.base_data_accessor_opensearch"
+    DEFAULT_USER_CLUSTER_ACCESSOR = "ClusteringModelClient@model.sagemaker.clustering_model_client"
 
     def __init__(self, config, current_client: str = ""):
         self.config = config
@@ -39,17 +55,35 @@ class RecommendationController():
         self.refinement_widget = {"br": BrRefinementWidgetRequestManger(),
             "wdr": WdrRefinementWidgetRequestManger()}.get(current_client,NoRefinementWidgetRequestManger())
 
-        self.item_accessor = BaseDataAccessorOpenSearch(config)
+        self.config_hash = get_config_hash(config)
+        self.item_accessor = handler_registry.get(
+            get_handler_key(self.DEFAULT_ITEM_ACCESSOR, None, self.config_hash),
+            lambda: BaseDataAccessorOpenSearch(config))
         if constants.MODEL_CONFIG_U2C in config:
-            self.user_cluster_accessor = ClusteringModelClient(config)
+            self.user_cluster_accessor = handler_registry.get(
+                get_handler_key(self.DEFAULT_USER_CLUSTER_ACCESSOR, None, self.config_hash),
+                lambda: ClusteringModelClient(config))
         else:
             self.user_cluster_accessor = None
         self.reco_accessor = None
         self.postproc = FilterPostproc()
+        self.overfetch_stats = overfetch_stats
+        self.max_reco_fetch_size = 100  # upper bound of neighbours requested per start item when refilling rows
+        self.reco_result_cache = reco_result_cache
+        # refinement managers keep request state, lookups running concurrently must not interleave on it
+        self.refinement_lock = threading.RLock()
+        self.max_concurrent_requests = 8  # max reco lookups running at the same time per search
         self.components = collections.defaultdict(dict)
         self.watchers = collections.defaultdict(dict)
         self.callbacks = collections.defaultdict(dict)
         self.page_number = 1
+        # speculatively fetched pages of the current search state: (search state, page) -> (token, future)
+        self.prefetched_pages = LRUCache(maxsize=3)
+        self.prefetch_state = None
+        self.max_unused_prefetches = 3  # prefetch budget, refilled whenever the user pages forward
+        self.unused_prefetches = 0
+        self.prefetch_lock = threading.Lock()
+        self.prefetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
         #
         # TODO - refactor this into model code
         #
@@ -63,7 +97,7 @@ class RecommendationController():
         self.model_type = ""
         self.model_config = ""
         self.user_cluster = []  # refactor once clustering endpoint is better
-        self.config_MDP2 = EnvYAML("./config/mdp2_lookup.yaml")
+        self.config_MDP2 = read_yaml("./config/mdp2_lookup.yaml", include_environment=False)
 
         self.mapping_type = {"Verwandte Inhalte": "Semantic", "Diversität": "Diverse", "Aktualität": "Temporal"}
         self.mapping_direction = {"Ähnlicher": "more similar", "Aktueller": "more recent",
@@ -87,6 +121,11 @@ class RecommendationController():
     def get_item_defaults(self, component_name):
         return self.item_accessor.get_unique_vals_for_column(column=component_name, sort=True)
 
+    def register_item_defaults(self, component_names: list[str]) -> None:
+        """Registers the columns filter widgets get their options from, to load them with one query"""
+        if hasattr(self.item_accessor, "register_facet_columns"):
+            self.item_accessor.register_facet_columns(component_names)
+
     def get_user_cluster(self):
         # TODO: improve the model config pass
         assert self.user_cluster_accessor is not None
@@ -100,12 +139,14 @@ class RecommendationController():
 
     def increase_page_number(self):
         self.page_number = self.get_page_number() + 1
+        self.unused_prefetches = 0
 
     def decrease_page_number(self):
         self.page_number = self.get_page_number() - 1
 
     def get_page_number(self):
-        return self.page_number
+        page_number = _prefetch_page.get()
+        return self.page_number if page_number is None else page_number
 
     def get_num_items(self):
         return self.num_items
@@ -168,10 +209,7 @@ class RecommendationController():
         :param model_info: model config from config yaml (should contain handler and model info)
         :return: Boolean True if successful
         """
-        class_ = self._get_class_from_config(model_info["handler"])
-        self.reco_accessor = (
-            class_(self.config) if not getattr(class_, "from_config", None) else class_.from_config(self.config))
-        self.reco_accessor.set_model_config(model_info)
+        self.reco_accessor = self._create_reco_accessor(model_info)
         self.set_item_accessor(model_info)
         return True
 
@@ -182,20 +220,40 @@ class RecommendationController():
 
         :param model_info: model config from config yaml
         """
+        self.item_accessor = self._create_item_accessor(model_info)
+
+    def _create_reco_accessor(self, model_info):
+        """Gets the reco accessor for the model from the process-wide handler registry
+
+        The accessor is only created and configured on first use of the (handler, endpoint, config) combination.
+
+        :param model_info: model config from config yaml (should contain handler and model info)
+        :return: Configured reco accessor
+        """
+        def create():
+            class_ = self._get_class_from_config(model_info["handler"])
+            reco_accessor = (
+                class_(self.config) if not getattr(class_, "from_config", None) else class_.from_config(self.config))
+            reco_accessor.set_model_config(model_info)
+            return reco_accessor
+
+        key = get_handler_key(model_info["handler"], model_info.get("endpoint"),
+                              get_config_hash(self.config_hash, model_info))
+        return handler_registry.get(key, create)
+
+    def _create_item_accessor(self, model_info):
         if item_accessor := model_info.get("item_accessor"):
-            class_ = self._get_class_from_config(item_accessor)
-            self.item_accessor = class_(self.config)
+            key = get_handler_key(item_accessor, None, self.config_hash)
+            return handler_registry.get(key, lambda: self._get_class_from_config(item_accessor)(self.config))
+        return self.item_accessor
 
     def get_items_by_field(self, item_dto: ItemDto, ids: list):
-        ids_prim = []
         _, db_ident = get_primary_idents(self.config)
-        try:
-            for id in ids:
-                ids_prim.append(self.item_accessor.get_primary_key_by_field(id, db_ident))
-            item_dtos, _ = self.item_accessor.get_items_by_ids(item_dto, ids_prim)
-            return item_dtos
-        except EmptySearchError:
-            logger.warning("couldn't find item from user history")
+        items = self.item_accessor.get_items_by_field_values(item_dto, ids, db_ident)
+        misses = [id for id in ids if id not in items]
+        if misses:
+            logger.warning("couldn't find items from user history: " + ", ".join(misses))
+        return [items[id] for id in ids if id in items]
 
     def get_items(self) -> tuple[list, list[list], str]:
         """Gets Items from OSS based on selected models, inputs and filters
@@ -204,67 +262,334 @@ class RecommendationController():
         model but also for multiple models at the same time
         :return:
         """
+        models, model_config, num_rows, item_rows = self.get_items_stream()
+        return models, self._collect_item_rows(item_rows, num_rows), model_config
+
+    def get_items_stream(self) -> tuple[list, str, int, Iterator[tuple[int, list]]]:
+        """Streaming variant of get_items
+
+        Fetches the start items right away and returns an iterator which yields every item row as soon
+        as its reco lookup completed, so rows can be displayed one after another.
+
+        :return: Model names, model config, number of rows and an iterator of (row index, item row)
+        """
+        raise_if_cancelled()
         self.set_mode()
 
         if not self.selected_models:
             raise ModelValidationError("Start by selecting one or more models!", {})
 
-        if self.get_display_mode() == constants.DISPLAY_MODE_SINGLE:
-            model_info = self.config[self.model_config][self.model_type][self.selected_models[0]]
-            self.set_model_and_strategy(model_info)
-            return self.get_items_by_strategy_and_model(model_info)
-        else:
-            res = []
-            for model in self.selected_models:
-                model_info = self.config[self.model_config][self.model_type][model]
-                self.set_model_and_strategy(model_info)
-                _, items, _ = self.get_items_by_strategy_and_model(model_info)
-                res.append(items[0])
-            return list(self.selected_models), res, self.model_config
-
-    def get_items_by_strategy_and_model(self, model_info: dict) -> tuple[list, list[list], str]:
+        handlers = self._get_model_handlers()
+        # the handlers of the last selected model stay active
+        _, self.reco_accessor, self.item_accessor = handlers[-1]
+
+        prefetched = self._get_prefetched_items()
+        if prefetched is not None:
+            models, item_rows, model_config = prefetched
+            return models, model_config, len(item_rows), iter(enumerate(item_rows))
+
+        item_hits, lookups = self._get_lookups(handlers, self.get_display_mode())
+        self.set_num_pages(item_hits)
+        raise_if_cancelled()
+        num_rows = sum(len(start_items) for _, start_items, *_ in lookups)
+        return self._get_model_names(handlers), self.model_config, num_rows, self._iter_item_rows(lookups)
+
+    def get_cache_stats(self) -> dict[str, dict]:
+        """Reports size and hit rate of the process-wide caches, e.g. for the diagnostics panel
+
+        :return: Stats of every cache by cache name
+        """
+        return {
+            "Reco results": self.reco_result_cache.stats(),
+            "Embeddings": VECTOR_CACHE.stats(),
+            "Configs": CONFIG_CACHE.stats(),
+            "Model configs": MODEL_CONFIG_CACHE.stats(),
+        }
+
+    def prefetch_next_page(self) -> None:
+        """Speculatively fetches the page after the displayed one in the background
+
+        The result is kept per search state (all widget values), so paging forward renders it right
+        away, while any change of the search state drops it. Every prefetch spends one unit of the
+        session budget, paging forward refills it, so sessions which never page stop prefetching.
+        Prefetching is skipped for stateful refinement, as its requests depend on the previous ones.
+        The prefetch works on the models and handlers of the displayed search and never changes the
+        state of the controller, so it cannot interfere with a search started meanwhile. Filter and
+        widget values are read while fetching, so the result is dropped if the search state changed
+        before the prefetch finished.
         """
-        Gets start item(s) based on model info and already set strategy. If model is configured as
-        recos_in_same_response, function will not only return start items but also all recommended
-        items as well. Otherwise function will try to get recommended results for start item.
+        if self._is_refinement_stateful():
+            return
+        page_number = self.get_page_number() + 1
+        if page_number > self.get_num_pages():
+            return
+        state = self._get_search_state()
+        handlers = self._get_model_handlers()
+        snapshot = (self._get_model_names(handlers), self.model_config, self.get_display_mode(), handlers)
+        with self.prefetch_lock:
+            self._check_prefetch_state(state)
+            if self.prefetched_pages.get((state, page_number)) is not None:
+                return
+            if self.unused_prefetches >= self.max_unused_prefetches:
+                logger.info("Prefetch budget of the session is used up")
+                return
+            self.unused_prefetches += 1
+            token = CancellationToken()
+            future = self.prefetch_executor.submit(run_cancellable, token, self._prefetch_items, page_number, state,
+                                                   *snapshot)
+            self.prefetched_pages.set((state, page_number), (token, future))
+        logger.info(f"Prefetching page {page_number}")
+
+    def _prefetch_items(self, page_number: int, state: str, models: list, model_config: str, display_mode: str,
+                        handlers: list[tuple]) -> tuple[list, list[list], str]:
+        reset_token = _prefetch_page.set(page_number)
+        try:
+            _, lookups = self._get_lookups(handlers, display_mode)
+            raise_if_cancelled()
+            num_rows = sum(len(start_items) for _, start_items, *_ in lookups)
+            item_rows = self._collect_item_rows(self._iter_item_rows(lookups), num_rows)
+            if self._get_search_state() != state:
+                raise SearchCancelledError("Search state changed while prefetching", {})
+            return models, item_rows, model_config
+        finally:
+            _prefetch_page.reset(reset_token)
+
+    def _get_prefetched_items(self) -> tuple[list, list[list], str] | None:
+        """Returns the prefetched result of the current page, waiting for a prefetch still running
+
+        :return: Model names, item rows and model config, or None if the page was not prefetched
+        """
+        state = self._get_search_state()
+        key = (state, self.get_page_number())
+        with self.prefetch_lock:
+            self._check_prefetch_state(state)
+            entry = self.prefetched_pages.get(key)
+        if entry is None:
+            return None
+        token, future = entry
+        while not future.done():
+            raise_if_cancelled()
+            wait([future], timeout=0.1)
+        if token.cancelled or future.exception() is not None:
+            self.prefetched_pages.pop(key)
+            return None
+        logger.info(f"Serving page {key[1]} from prefetch")
+        self.unused_prefetches = 0
+        return future.result()
+
+    def _check_prefetch_state(self, state: str) -> None:
+        # prefetched pages only stay valid as long as the search state does not change
+        if state == self.prefetch_state:
+            return
+        for token, _ in self.prefetched_pages.values():
+            token.cancel()
+        self.prefetched_pages.clear()
+        self.prefetch_state = state
+
+    def _get_search_state(self) -> str:
+        state = {
+            group: {label: [getattr(component, "value", None), getattr(component, "visible", True),
+                            getattr(component, "params", None)] for label, component in components.items()}
+            # groups are created on first access, empty ones do not change the state
+            for group, components in list(self.components.items()) if components
+        }
+        return get_config_hash(state)
+
+    def _get_model_handlers(self) -> list[tuple]:
+        """Gets the handlers of every selected model, without making them the active ones
+
+        :return: One (model info, reco accessor, item accessor) tuple per selected model
+        """
+        model_infos = [self.config[self.model_config][self.model_type][model] for model in self.selected_models]
+        return [(model_info, self._create_reco_accessor(model_info), self._create_item_accessor(model_info))
+                for model_info in model_infos]
+
+    def _get_model_names(self, handlers: list[tuple]) -> list:
+        if self.get_display_mode() == constants.DISPLAY_MODE_SINGLE:
+            return [handlers[0][0]["display_name"]]
+        return list(self.selected_models)
+
+    def _get_lookups(self, handlers: list[tuple], display_mode: str) -> tuple[int, list[tuple]]:
+        """Gets the start items of the page for the selected models
 
+        A single model looks up all start items of the page, while multiple models only look up the
+        first start item of every model. Start items of all models are fetched concurrently, the reco
+        lookups of all models run concurrently afterwards, so the latency follows the slowest call
+        instead of the sum of all calls.
+
+        :param handlers: (model info, reco accessor, item accessor) tuples of the selected models
+        :param display_mode: single or multi display mode
+        :return: Number of start item hits and one (model info, start items, reco accessor, item accessor)
+            tuple per model
+        """
+        if display_mode == constants.DISPLAY_MODE_SINGLE:
+            model_info, reco_accessor, item_accessor = handlers[0]
+            item_hits, start_items = self._get_start_items(model_info, item_accessor)
+            return item_hits, [(model_info, start_items, reco_accessor, item_accessor)]
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrent_requests) as executor:
+            start_futures = [submit_with_context(executor, self._get_start_items, model_info, item_accessor)
+                             for model_info, _, item_accessor in handlers]
+            start_results = [future.result() for future in start_futures]
+        # only the first row of each model is displayed in multi model mode
+        return start_results[-1][0], [(model_info, start_items[:1], reco_accessor, item_accessor)
+                                      for (model_info, reco_accessor, item_accessor), (_, start_items)
+                                      in zip(handlers, start_results)]
+
+    def _iter_item_rows(self, lookups: list[tuple]) -> Iterator[tuple[int, list]]:
+        """Runs the reco lookups concurrently and yields the item rows in the order they complete
+
+        :param lookups: (model info, start items, reco accessor, item accessor) tuples
+        :return: Iterator of (row index, item row), row indexes count the start items of all lookups
+        """
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrent_requests)
+        wait_for_lookups = True
+        try:
+            pending = {}
+            offset = 0
+            for model_info, start_items, reco_accessor, item_accessor in lookups:
+                k = self._get_reco_fetch_size(model_info)
+                futures = self._submit_reco_lookups(executor, model_info, start_items, reco_accessor, item_accessor,
+                                                    k)
+                # one future per start item, or one future for all start items of a batched lookup
+                groups = ([[idx] for idx in range(len(start_items))] if len(futures) == len(start_items)
+                          else [list(range(len(start_items)))])
+                for future, group in zip(futures, groups):
+                    pending[future] = (model_info, reco_accessor, item_accessor, k, [offset + idx for idx in group],
+                                       [start_items[idx] for idx in group])
+                offset += len(start_items)
+
+            for future in as_completed(pending):
+                model_info, reco_accessor, item_accessor, k, row_idxs, start_items = pending[future]
+                rows = self._build_item_rows(start_items, future.result(), model_info, reco_accessor, item_accessor, k)
+                yield from zip(row_idxs, rows)
+        except GeneratorExit:
+            # closed early, e.g. by a superseded search, so pending lookups are dropped instead of awaited
+            wait_for_lookups = False
+            raise
+        finally:
+            executor.shutdown(wait=wait_for_lookups, cancel_futures=not wait_for_lookups)
+
+    def _collect_item_rows(self, item_rows: Iterator[tuple[int, list]], num_rows: int) -> list[list]:
+        rows = [None] * num_rows
+        for idx, item_row in item_rows:
+            rows[idx] = item_row
+        return [row for row in rows if row is not None]
+
+    def _submit_reco_lookups(self, executor: ThreadPoolExecutor, model_info: dict, start_items: list,
+                             reco_accessor, item_accessor, k: int | None = None) -> list[Future]:
+        """Submits the reco lookups for the given start items to the executor
+
+        Seekers with a batch API get one task for all start items, all others one task per start item.
+        Every future resolves to a list with one (reco items, distances) tuple or exception per start item.
+
+        :param executor: Executor to run the lookups on
         :param model_info: selected model info dictionary
-        :return:found items in a list
+        :param start_items: start items to get the recos for
+        :param reco_accessor: reco accessor configured for the model
+        :param item_accessor: item accessor configured for the model
+        :param k: number of neighbours to request, see _get_reco_fetch_size
+        :return: Futures in the order of the start items
         """
-        item_hits, start_items = self._get_start_items(model_info)
-        self.set_num_pages(item_hits)
-        return self.get_reco_items_for_start_items_from_response(model_info, start_items)
+        k = self._get_reco_fetch_size(model_info) if k is None else k
+        if self._supports_batched_reco_items(reco_accessor, item_accessor):
+            return [submit_with_context(executor, self._get_reco_items_c2c_s2c_many, start_items, model_info,
+                                        reco_accessor, item_accessor, k)]
+        return [submit_with_context(executor, self._get_reco_result, start_item, model_info, reco_accessor,
+                                    item_accessor, k)
+                for start_item in start_items]
+
+    def _get_reco_result(self, start_item: ItemDto, model_info: dict, reco_accessor, item_accessor,
+                         k: int | None = None) -> list:
+        try:
+            return [self._get_reco_items(start_item, model_info, reco_accessor, item_accessor, k)]
+        except Exception as e:
+            return [e]
 
-    def get_reco_items_for_start_items_from_response(self, model_info: dict, start_items) -> tuple[
-        list, list[list], str]:
-        """
-        Returns the items from the response. Here Recommendations are not part of the response, so they need to be requeted
-        from service for each start item from response.
+    def _get_postproc_chain(self) -> list:
+        filter_state = self._get_current_filter_state("reco_filter")
+        # stateful refinement managers move the flat filter values below "filters"
+        return filter_state.get("remove_duplicate") or filter_state.get("filters", {}).get("remove_duplicate", [])
+
+    def _get_reco_fetch_size(self, model_info: dict) -> int:
+        """Gets the number of neighbours to request per start item
+
+        Without post-processing one neighbour more than displayed is requested, to make up for the start
+        item itself. With post-processing the request is over-fetched by the factor tuned on the model's
+        hit rate, so rows are usually filled without a refill round.
 
         :param model_info: selected model info dictionary
+        :return: Number of neighbours to request
+        """
+        k = self.num_NN + 1
+        if not self._get_postproc_chain():
+            return k
+        factor = self.overfetch_stats.get_factor(model_info.get("display_name", ""))
+        return min(math.ceil(k * factor), max(self.max_reco_fetch_size, k))
+
+    def _postprocess_reco_row(self, start_item: ItemDto, reco_result: tuple, k: int, postproc_chain: list,
+                              model_info: dict | None, reco_accessor, item_accessor) -> list:
+        """Applies the post-processors to the reco items of a row and refills short rows
+
+        While fewer than num_NN items survive and the seeker returned all requested neighbours, the
+        lookup is repeated with twice as many neighbours, up to max_reco_fetch_size. Rows of stateful
+        refinement managers are not refilled, as a repeated request would be a refinement step of its own.
+
+        :param start_item: start item of the row
+        :param reco_result: (reco items, distances) tuple of the lookup
+        :param k: number of neighbours requested by the lookup
+        :param postproc_chain: selected post-processors from the reco filter state
+        :param model_info: selected model info dictionary, the row is not refilled without it
+        :param reco_accessor: reco accessor to refill the row with
+        :param item_accessor: item accessor to refill the row with
+        :return: Reco items of the row, cut to the number of recommendations
+        """
+        nn_items, nn_dists = reco_result
+        while True:
+            for idx, reco_item in enumerate(nn_items):
+                reco_item.dist = nn_dists[idx]
+                reco_item.position = constants.ITEM_POSITION_RECO
+            if not postproc_chain:
+                return nn_items[: self.num_NN]
+
+            filtered_items = self.postproc.apply(start_item, nn_items, postproc_chain)
+            model_key = model_info.get("display_name", "") if model_info else ""
+            self.overfetch_stats.record(model_key, len(nn_items), len(filtered_items))
+
+            # k counts the start item itself, which is dropped from the row, so a full lookup has k - 1 items
+            exhausted = len(nn_items) < k - 1
+            if (len(filtered_items) >= self.num_NN or exhausted or model_info is None
+                    or k >= self.max_reco_fetch_size or self._is_refinement_stateful()):
+                return filtered_items[: self.num_NN]
+            k = min(k * 2, self.max_reco_fetch_size)
+            logger.info(f"Refilling reco row of [{start_item.id}] with {k} neighbours")
+            nn_items, nn_dists = self._get_reco_items(start_item, model_info, reco_accessor, item_accessor, k)
+
+    def _build_item_rows(self, start_items: list, reco_results: list, model_info: dict | None = None,
+                         reco_accessor=None, item_accessor=None, k: int | None = None) -> list[list]:
+        """Builds one item row per start item from the reco lookup results
+
         :param start_items: start items returned in response
-        :return: Final List of Item DTOs for this search
+        :param reco_results: one (reco items, distances) tuple or exception per start item
+        :param model_info: selected model info dictionary, rows are not refilled without it
+        :param reco_accessor: reco accessor to refill rows with
+        :param item_accessor: item accessor to refill rows with
+        :param k: number of neighbours the lookups requested
+        :return: List of item rows, each starting with the start item
         """
+        raise_if_cancelled()
         all_items = []
-        for start_item in start_items:
+        postproc_chain = self._get_postproc_chain()
+        if k is None:
+            k = self._get_reco_fetch_size(model_info) if model_info else self.num_NN + 1
+
+        for start_item, reco_result in zip(start_items, reco_results):
             item_row = [start_item]
             try:
-                nn_items, nn_dists = self._get_reco_items(start_item, model_info)
-
-                # Find all filters
-                all_chosen_filters = self._get_current_filter_state("reco_filter")
-
-                if len(all_chosen_filters["remove_duplicate"]) > 0:
-                    chosen_param = []
-                    for item in all_chosen_filters["remove_duplicate"]:
-                        chosen_param.append(item[1])
-                    filtered_nn_items = self.postproc.filterDuplicates(start_item, nn_items, chosen_param)
-                    nn_items = filtered_nn_items
-
-                for idx, reco_item in enumerate(nn_items):
-                    reco_item.dist = nn_dists[idx]
-                    reco_item.position = constants.ITEM_POSITION_RECO
-                    item_row.append(reco_item)
+                if isinstance(reco_result, Exception):
+                    raise reco_result
+                item_row.extend(self._postprocess_reco_row(start_item, reco_result, k, postproc_chain, model_info,
+                                                           reco_accessor, item_accessor))
 
                 all_items.append(item_row)
             except (UnknownUserError, UnknownItemError, UnknownItemEmbeddingError):
@@ -274,9 +599,9 @@ class RecommendationController():
                 item_row.append(not_found_item)
                 all_items.append(item_row)
                 continue
-        return [model_info["display_name"]], all_items, self.model_config
+        return all_items
 
-    def _get_start_items_c2c_s2c(self, model: dict) -> tuple[int, list[ItemDto]]:
+    def _get_start_items_c2c_s2c(self, model: dict, item_accessor=None) -> tuple[int, list[ItemDto]]:
         """Gets search results based on selected model and active components
 
         First, gets the active components from registered components and checks these components
@@ -286,8 +611,10 @@ class RecommendationController():
         This function returns the actual item search results.
 
         :param model: Config of a model from the configuration yaml
+        :param item_accessor: item accessor to search with, defaults to the active one
         :return:
         """
+        item_accessor = self.item_accessor if item_accessor is None else item_accessor
         active_components = self._get_active_start_components()
         self._validate_input_data(active_components)
         accessor_method = self._get_data_accessor_method(active_components)
@@ -305,7 +632,7 @@ class RecommendationController():
         if any(has_paging):
             accessor_values.extend([((self.get_page_number() - 1) * self.get_num_items()), self.get_num_items(), ])
         logger.info("calling " + accessor_method + " with values " + str(accessor_values))
-        function_pointer = getattr(self.item_accessor, accessor_method)
+        function_pointer = getattr(item_accessor, accessor_method)
         search_result, total_hits = function_pointer(*accessor_values)
         return total_hits, search_result
 
@@ -365,28 +692,33 @@ class RecommendationController():
             users.append(new_user)
         return len(self.user_cluster[cluster_name]), users
 
-    def _get_start_items(self, model: dict) -> tuple[int, list[ItemDto]]:
+    def _get_start_items(self, model: dict, item_accessor=None) -> tuple[int, list[ItemDto]]:
         """Decides if C2C or U2C are used for the search query for the start items
 
         :param model: Config of models from the configuration yaml
+        :param item_accessor: item accessor to search with, defaults to the active one
         :return:
         """
         if self.model_type == constants.MODEL_TYPE_C2C or self.model_type == constants.MODEL_TYPE_S2C:
-            return self._get_start_items_c2c_s2c(model)
+            return self._get_start_items_c2c_s2c(model, item_accessor)
         else:
             return self._get_start_users_u2c(model)
 
-    def _get_reco_items(self, start_item, model):
+    def _get_reco_items(self, start_item, model, reco_accessor=None, item_accessor=None, k=None):
         """Decides if C2C or U2C or S2C are used for the search query for the reco items
 
         :param start_item: The start item (reference item) for which reco items are searched
         :param model: Config of models from the configuration yaml
+        :param reco_accessor: reco accessor to search with, defaults to the active one
+        :param item_accessor: item accessor to hydrate with, defaults to the active one
+        :param k: number of neighbours to request, defaults to one more than the number of recommendations
         :return:
         """
+        raise_if_cancelled()
         if self.model_type == constants.MODEL_TYPE_C2C or self.model_type == constants.MODEL_TYPE_S2C  :
-            return self._get_reco_items_c2c_s2c(start_item, model)
+            return self._get_reco_items_c2c_s2c(start_item, model, reco_accessor, item_accessor, k)
         else:
-            return self._get_reco_items_u2c(start_item, model)
+            return self._get_reco_items_u2c(start_item, model, reco_accessor, item_accessor, k)
 
     def enable_all_refinement_button(self):
         widget = self._get_refinement_widget()
@@ -398,47 +730,205 @@ class RecommendationController():
         if widget is not None:
             self.refinement_widget.check_threshold(widget)
 
+    def _is_refinement_stateful(self) -> bool:
+        return isinstance(self.refinement_widget, RefinementWidgetStatefulManger)
+
     def _get_refinement_widget(self):
         radio_box_group = self.components["reco_filter"].get("refinementType")
         if radio_box_group:
             return radio_box_group.widget_instance
         return None
 
-    def _get_reco_items_c2c_s2c(self, start_item: ItemDto, model: dict):
+    def _get_reco_items_c2c_s2c(self, start_item: ItemDto, model: dict, reco_accessor=None, item_accessor=None,
+                                k=None):
         """Gets recommended items based on the start item and filters
         :param start_item: The start item (reference item) for which reco items are searched
         :param model: Config of models from the configuration yaml
+        :param reco_accessor: reco accessor to search with, defaults to the active one
+        :param item_accessor: item accessor to hydrate with, defaults to the active one
+        :param k: number of neighbours to request, defaults to one more than the number of recommendations
         :return:
         """
-        assert self.reco_accessor is not None
+        k = self.num_NN + 1 if k is None else k
+        reco_accessor = self.reco_accessor if reco_accessor is None else reco_accessor
+        item_accessor = self.item_accessor if item_accessor is None else item_accessor
+        assert reco_accessor is not None
         reco_filter = self._get_current_filter_state("reco_filter")
-        logger.warning("calling " + str(self.reco_accessor))
+        logger.warning("calling " + str(reco_accessor))
 
-        self.refinement_widget.prepare_request(reco_filter, start_item.id)
-        self.reco_accessor.set_model_config(model)
+        # stateful refinement managers keep the state of a single request, so for them the lock is held
+        # from preparing the request until its response is processed and concurrent lookups run one by one
+        with self.refinement_lock if self._is_refinement_stateful() else contextlib.nullcontext():
+            with self.refinement_lock:
+                self.refinement_widget.prepare_request(reco_filter, start_item.id)
+            reco_accessor.set_model_config(model)
 
-        #Add the client and make it WDR if it's WDR_PA
-        start_item.client = self.current_client.upper()
+            #Add the client and make it WDR if it's WDR_PA
+            start_item.client = self.current_client.upper()
 
-        kidxs, nn_dists, oss_field, *rest = self.reco_accessor.get_k_NN(start_item, (self.num_NN + 1), reco_filter)
-        utilities = rest[0] if rest else None
+            kidxs, nn_dists, oss_field, *rest = self._get_k_NN(reco_accessor, model, start_item, k, reco_filter)
+            utilities = rest[0] if rest else None
 
-        self.refinement_widget.process_response(kidxs, utilities)
-        self.enable_all_refinement_button()
-        self.enable_disable_refinement_button()
+            with self.refinement_lock:
+                self.refinement_widget.process_response(kidxs, utilities)
+                self.enable_all_refinement_button()
+                self.enable_disable_refinement_button()
 
+        item_dto, model_type = self._get_reco_item_dto_c2c_s2c(model)
         if oss_field != "id":
-            _, db_ident = get_primary_idents(self.config)
-            kidxs_prim = []
-            try:
-                for kidx in kidxs:
-                    kidxs_prim.append(self.item_accessor.get_primary_key_by_field(kidx, db_ident))
-            except EmptySearchError as e:
-                logger.warning(str(e))
-            kidxs = kidxs_prim
-        else:
+            return self._get_reco_items_by_field(item_dto, kidxs, nn_dists, item_accessor, k - 1)
+
+        kidxs, nn_dists = self._align_kidxs_nn(start_item.id, kidxs, nn_dists)
+        return (item_accessor.get_items_by_ids(item_dto, kidxs[: k - 1], model_type)[0],
+            nn_dists[: k - 1],)
+
+    def _supports_batched_reco_items(self, reco_accessor, item_accessor) -> bool:
+        """Checks if the recos for a whole page of start items can be fetched in one go
+
+        :param reco_accessor: reco accessor configured for the model
+        :param item_accessor: item accessor configured for the model
+        :return: True if the model type is C2C or S2C, both accessors provide batch methods and the
+            refinement is stateless, as stateful refinement has to process one response before the next request
+        """
+        return (not self._is_refinement_stateful()
+                and (self.model_type == constants.MODEL_TYPE_C2C or self.model_type == constants.MODEL_TYPE_S2C)
+                and hasattr(reco_accessor, "get_k_NN_many")
+                and hasattr(item_accessor, "get_items_by_ids_many"))
+
+    def _get_reco_items_c2c_s2c_many(self, start_items: list[ItemDto], model: dict, reco_accessor=None,
+                                     item_accessor=None, k=None) -> list:
+        """Batched variant of _get_reco_items_c2c_s2c for all start items of a page
+
+        The neighbours of all start items are requested with one call to the reco accessor
+        and all reco items are hydrated with one call to the item accessor.
+        :param start_items: The start items (reference items) for which reco items are searched
+        :param model: Config of models from the configuration yaml
+        :param reco_accessor: reco accessor to search with, defaults to the active one
+        :param item_accessor: item accessor to hydrate with, defaults to the active one
+        :param k: number of neighbours to request, defaults to one more than the number of recommendations
+        :return: One (reco items, distances) tuple or exception per start item
+        """
+        raise_if_cancelled()
+        k = self.num_NN + 1 if k is None else k
+        reco_accessor = self.reco_accessor if reco_accessor is None else reco_accessor
+        item_accessor = self.item_accessor if item_accessor is None else item_accessor
+        assert reco_accessor is not None
+        logger.warning("calling " + str(reco_accessor) + " for " + str(len(start_items)) + " start items")
+        reco_accessor.set_model_config(model)
+
+        reco_filters = []
+        with self.refinement_lock:
+            for start_item in start_items:
+                reco_filter = self._get_current_filter_state("reco_filter")
+                self.refinement_widget.prepare_request(reco_filter, start_item.id)
+                start_item.client = self.current_client.upper()
+                reco_filters.append(reco_filter)
+
+        nn_results = self._get_k_NN_many(reco_accessor, model, start_items, k, reco_filters)
+
+        item_dto, model_type = self._get_reco_item_dto_c2c_s2c(model)
+        results = []
+        ids_per_row = []
+        for start_item, nn_result in zip(start_items, nn_results):
+            ids_per_row.append([])
+            if isinstance(nn_result, Exception):
+                results.append(nn_result)
+                continue
+            kidxs, nn_dists, oss_field, *rest = nn_result
+            with self.refinement_lock:
+                self.refinement_widget.process_response(kidxs, rest[0] if rest else None)
+            if oss_field != "id":
+                # already hydrated, rows with an empty id list are skipped below
+                results.append(self._get_reco_items_by_field(item_dto, kidxs, nn_dists, item_accessor, k - 1))
+                continue
             kidxs, nn_dists = self._align_kidxs_nn(start_item.id, kidxs, nn_dists)
+            results.append(nn_dists[: k - 1])
+            ids_per_row[-1] = kidxs[: k - 1]
+
+        with self.refinement_lock:
+            self.enable_all_refinement_button()
+            self.enable_disable_refinement_button()
 
+        raise_if_cancelled()
+        rows = item_accessor.get_items_by_ids_many(item_dto, ids_per_row, model_type)
+        for position, row in enumerate(rows):
+            if isinstance(results[position], (Exception, tuple)):
+                continue
+            results[position] = row if isinstance(row, Exception) else (row, results[position])
+        return results
+
+    def _get_reco_result_key(self, reco_accessor, model: dict, start_item: ItemDto, k: int, reco_filter: dict):
+        # stateful refinement requests depend on the previous response of the session and are never shared
+        if self._is_refinement_stateful():
+            return None
+        get_index_version = getattr(reco_accessor, "get_index_version", None)
+        return self.reco_result_cache.get_key(get_config_hash(model), start_item, k, reco_filter,
+                                              get_index_version() if get_index_version else None)
+
+    def _get_k_NN(self, reco_accessor, model: dict, start_item: ItemDto, k: int, reco_filter: dict) -> tuple:
+        """Gets the neighbours of the start item, served from the process-wide reco result cache if possible
+
+        :param reco_accessor: reco accessor configured for the model
+        :param model: Config of the model from the configuration yaml
+        :param start_item: Start item to get the neighbours of
+        :param k: number of neighbours to request
+        :param reco_filter: Reco filter state of the request
+        :return: Result of the reco accessor's get_k_NN
+        """
+        key = self._get_reco_result_key(reco_accessor, model, start_item, k, reco_filter)
+        result = self.reco_result_cache.get(key) if key is not None else None
+        if result is None:
+            result = reco_accessor.get_k_NN(start_item, k, reco_filter)
+            if key is not None:
+                self.reco_result_cache.set(key, result)
+        return result
+
+    def _get_k_NN_many(self, reco_accessor, model: dict, start_items: list[ItemDto], k: int,
+                       reco_filters: list[dict]) -> list:
+        """Batched variant of _get_k_NN, only start items missing in the cache are sent to the reco accessor
+
+        :return: Result of the reco accessor's get_k_NN_many, in the order of the start items
+        """
+        keys = [self._get_reco_result_key(reco_accessor, model, start_item, k, reco_filter)
+                for start_item, reco_filter in zip(start_items, reco_filters)]
+        results = [self.reco_result_cache.get(key) if key is not None else None for key in keys]
+        misses = [position for position, result in enumerate(results) if result is None]
+        if not misses:
+            return results
+
+        nn_results = reco_accessor.get_k_NN_many([start_items[position] for position in misses], k,
+                                                 [reco_filters[position] for position in misses])
+        for position, nn_result in zip(misses, nn_results):
+            results[position] = nn_result
+            if keys[position] is not None and not isinstance(nn_result, Exception):
+                self.reco_result_cache.set(keys[position], nn_result)
+        return results
+
+    def _get_reco_items_by_field(self, item_dto: ItemDto, kidxs: list, nn_dists: list, item_accessor=None,
+                                 limit=None) -> tuple[list, list]:
+        """Gets reco items identified by the primary field instead of the index id
+
+        All identifiers are resolved with a single query. Distances of identifiers without a
+        matching item are dropped, so items and distances stay aligned.
+
+        :param item_dto: Item dto used as template for the reco items
+        :param kidxs: Identifiers returned by the reco accessor
+        :param nn_dists: Distances returned by the reco accessor
+        :param item_accessor: item accessor to hydrate with, defaults to the active one
+        :param limit: max number of reco items, defaults to the number of recommendations
+        :return: Reco items and their distances, cut to the limit
+        """
+        limit = self.num_NN if limit is None else limit
+        item_accessor = self.item_accessor if item_accessor is None else item_accessor
+        _, db_ident = get_primary_idents(self.config)
+        items = item_accessor.get_items_by_field_values(item_dto, kidxs, db_ident)
+        misses = [kidx for kidx in kidxs if kidx not in items]
+        if misses:
+            logger.warning("Couldn't find reco items identified by [" + db_ident + "]: " + ", ".join(misses))
+        found = [(items[kidx], nn_dist) for kidx, nn_dist in zip(kidxs, nn_dists) if kidx in items]
+        return [item for item, _ in found][: limit], [nn_dist for _, nn_dist in found][: limit]
+
+    def _get_reco_item_dto_c2c_s2c(self, model: dict) -> tuple[ItemDto, str]:
         provenance = (
             constants.ITEM_PROVENANCE_C2C if self.model_type == constants.MODEL_TYPE_C2C else constants.ITEM_PROVENANCE_S2C)
 
@@ -447,28 +937,20 @@ class RecommendationController():
 
         item_dto = dto_from_model(model=model, position=constants.ITEM_POSITION_RECO,
             item_type=constants.ITEM_TYPE_CONTENT, provenance=provenance, )
+        return item_dto, model_type
 
-        return (self.item_accessor.get_items_by_ids(item_dto, kidxs[: self.num_NN], model_type)[0],
-            nn_dists[: self.num_NN],)
-
-    def _get_reco_items_u2c(self, start_item: ItemDto, model: dict):
+    def _get_reco_items_u2c(self, start_item: ItemDto, model: dict, reco_accessor=None, item_accessor=None, k=None):
+        reco_accessor = self.reco_accessor if reco_accessor is None else reco_accessor
+        item_accessor = self.item_accessor if item_accessor is None else item_accessor
         reco_filter = self._get_current_filter_state("reco_filter_u2c")
 
-        assert self.reco_accessor is not None
-        kidxs, nn_dists, _ = self.reco_accessor.get_recos_user(start_item, (self.num_NN + 1), reco_filter)
-
-        _, db_ident = get_primary_idents(self.config)
-        kidxs_prim = []
-        try:
-            for kidx in kidxs:
-                kidxs_prim.append(self.item_accessor.get_primary_key_by_field(kidx, db_ident))
-        except EmptySearchError as e:
-            logger.warning(str(e))
+        assert reco_accessor is not None
+        k = self.num_NN + 1 if k is None else k
+        kidxs, nn_dists, _ = reco_accessor.get_recos_user(start_item, k, reco_filter)
 
         reco_item = dto_from_model(model=model, position=constants.ITEM_POSITION_RECO,
                                    item_type=constants.ITEM_TYPE_CONTENT, provenance=constants.ITEM_PROVENANCE_U2C, )
-        return self.item_accessor.get_items_by_ids(reco_item, kidxs_prim[: self.num_NN], constants.MODEL_TYPE_U2C)[
-            0], nn_dists[: self.num_NN]
+        return self._get_reco_items_by_field(reco_item, kidxs, nn_dists, item_accessor, k - 1)
 
     def _align_kidxs_nn(self, content_id, kidxs, nn_dists):
         try:
@@ -680,6 +1162,6 @@ class RecommendationController():
 
     def get_pa_clients(self):
         self.set_mode()
-        client = NnSeekerPaServiceClients(self.initial_model_info)
+        client = NnSeekerPaServiceClients(self.initial_model_info, config=self.config)
         clients = client.get_clients()
         return  clients
\ No newline at end of file
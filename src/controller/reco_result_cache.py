@@ -0,0 +1,59 @@
+import copy
+import json
+from typing import Any, Hashable
+
+from dto.item import ItemDto
+from util.cache_utils import LRUCache
+
+RECO_RESULT_TTL = 300  # seconds until a cached reco lookup is requested from the seeker again
+
+
+class RecoResultCache:
+    """Process-wide cache of the neighbours returned by the reco seekers
+
+    Editors often look at the same popular start items with the same default filters, so the
+    (model, start item, reco filter, k) lookups of all sessions share one cache. The resolved
+    index is part of the key, so entries of an index alias that moved to another index are not
+    served anymore. Results are copied on the way in and out, callers may modify them.
+    """
+
+    def __init__(self, maxsize: int = 5000, ttl: float = RECO_RESULT_TTL):
+        self.cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    @staticmethod
+    def get_key(model_hash: str, item: ItemDto, k: int, reco_filter: dict[str, Any] | None,
+                index_version: str | None = None) -> Hashable:
+        """Builds the cache key of a reco lookup
+
+        :param model_hash: Hash of the model config, covering handler, endpoint and model parameters
+        :param item: Start item, identified by its id or, for text searches, by its description
+        :param k: Number of requested neighbours
+        :param reco_filter: Reco filter state, keys are sorted so equal states give equal keys
+        :param index_version: Concrete index the seeker searches, if it searches an index alias
+        :return: Cache key
+        """
+        item_key = item.id or getattr(item, "description", "")
+        return (
+            model_hash,
+            index_version,
+            item_key,
+            getattr(item, "client", ""),
+            json.dumps(reco_filter or {}, sort_keys=True, default=str),
+            k,
+        )
+
+    def get(self, key: Hashable) -> tuple | None:
+        result = self.cache.get(key)
+        return copy.deepcopy(result) if result is not None else None
+
+    def set(self, key: Hashable, result: tuple) -> None:
+        self.cache.set(key, copy.deepcopy(result))
+
+    def clear(self) -> None:
+        self.cache.clear()
+
+    def stats(self) -> dict[str, Any]:
+        return self.cache.stats()
+
+
+reco_result_cache = RecoResultCache()
@@ -3,7 +3,7 @@ from dataclasses import dataclass
 from dto.item import ItemDto
 from datetime import datetime
 
-@dataclass
+@dataclass(slots=True)
 class ContentItemDto(ItemDto):
     id: str = ''
     externalid: str = ''
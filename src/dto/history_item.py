@@ -5,6 +5,9 @@ from datetime import datetime
 
 @dataclass
 class HistoryItemDto(ContentItemDto):
+    # no own fields, the slots of ContentItemDto are reused
+    __slots__ = ()
+
     @property
     def viewer(self) -> str:
         self._viewer = 'ContentHistoryCard@view.cards.floatpanel_history_card'
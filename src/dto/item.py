@@ -1,14 +1,20 @@
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 
 @dataclass
 class ItemDto(ABC):
+    # the fields are slotted by the concrete dtos, python 3.10 would duplicate slots declared here in every subclass
+    __slots__ = ()
+
     _position: str
     _item_type: str
     _provenance: str
     id: str = ""
     _is_draft: bool = False
+    # set on result rows by the controller, not hydrated from the index
+    dist: float = field(default=0.0, init=False)
+    client: str = field(default="", init=False)
 
     @property
     @abstractmethod
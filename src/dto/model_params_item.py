@@ -2,8 +2,9 @@ import constants
 from dataclasses import dataclass
 from dto.item import ItemDto
 
-@dataclass
+@dataclass(slots=True)
 class ModelParametersDto(ItemDto):
+    _viewer: str = ''
 
     @property
     def viewer(self) -> str:
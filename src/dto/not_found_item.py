@@ -2,8 +2,10 @@ import constants
 from dataclasses import dataclass
 from dto.item import ItemDto
 
-@dataclass
+@dataclass(slots=True)
 class NotFoundDto(ItemDto):
+    _viewer: str = ''
+
     @property
     def viewer(self) -> str:
         self._viewer = 'NotFoundCard@view.cards.content_not_found_card'
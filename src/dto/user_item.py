@@ -3,7 +3,7 @@ from dataclasses import dataclass
 from dto.item import ItemDto
 from dto.content_item import ContentItemDto
 
-@dataclass
+@dataclass(slots=True)
 class UserItemDto(ItemDto):
     id: str = ''
     source: str = ''
@@ -3,7 +3,7 @@ from dataclasses import dataclass
 from dto.item import ItemDto
 
 
-@dataclass
+@dataclass(slots=True)
 class WDRContentItemDto(ItemDto):
     availableFrom: str = ""
     availableTo: str = ""
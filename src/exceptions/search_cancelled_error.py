@@ -0,0 +1,6 @@
+class SearchCancelledError(Exception):
+    def __init__(self, message, errors):
+        super().__init__(message)
+
+        # Now for your custom code...
+        self.errors = errors
@@ -7,11 +7,14 @@ import base64
 import constants
 from datetime import datetime
 
-from opensearchpy import OpenSearch, RequestsHttpConnection
 from model.base_data_accessor import BaseDataAccessor
+from model.opensearch.client_factory import get_opensearch_client
+from model.opensearch.facet_cache import facet_cache
+from opensearchpy import NotFoundError
 from exceptions.empty_search_error import EmptySearchError
 from dto.item import ItemDto
-from util.dto_utils import update_from_props, get_primary_idents
+from util.dto_utils import update_from_props, get_primary_idents, get_source_includes, items_from_props
+from util.cancellation import raise_if_cancelled
 
 #loggin preference
 logger = logging.getLogger(__name__)
@@ -21,62 +24,57 @@ class BaseDataAccessorOpenSearch(BaseDataAccessor):
     def __init__(self, config):
         self.config = config
 
-        auth = (self.config["opensearch.user"], self.config["opensearch.pass"])
-
-        use_ssl = self.config.get("opensearch.use_ssl", True)
-
-        self.client = OpenSearch(
-            hosts=[
-                {
-                    "host": config["opensearch.host"],
-                    "port": self.config["opensearch.port"],
-                }
-            ],
-            http_auth=auth,
-            use_ssl=use_ssl,
-            verify_certs=use_ssl,
-            connection_class=RequestsHttpConnection,
-        )
+        self.client = get_opensearch_client(config)
         self.target_idx_name = self.config["opensearch.index"]
         self.field_mapping = self.config["opensearch.field_mapping"]
         self.embedding_field_name = "embedding"
 
         self.max_items_per_fetch = 500
+        self.max_facet_values = 1000
+        self.facet_cache = facet_cache
 
-    def get_primary_key_by_field(self, item_ident, field):
+    def get_items_by_field_values(self, item: ItemDto, values: list[str], field: str) -> dict[str, ItemDto]:
+        """Gets the items identified by the values of a (non primary) field with a single query
+
+        Resolves all values with one terms query, collapsed on the field so every value yields
+        at most one item.
+
+        :param item: Item dto used as template for the found items
+        :param values: Values of the field, e.g. external ids returned by a reco service
+        :param field: Name of the field in the index
+        :return: Found items by value, values without a matching item are left out
+        """
+        unique_values = list(dict.fromkeys(values))
+        if not unique_values:
+            return {}
+        raise_if_cancelled()
+
+        oss_col = field + ".keyword"
         query = {
-            "query": {"match": {field + ".keyword": item_ident}},
-            "size": 1,
-            "_source": {"exclude": "embedding"},
+            "size": len(unique_values),
+            "_source": {"includes": self._get_source_includes(item, field)},
+            "query": {"terms": {oss_col: unique_values}},
+            "collapse": {"field": oss_col},
         }
         logger.info(query)
         response = self.client.search(body=query, index=self.target_idx_name)
 
-        if response["hits"]["total"]["value"] < 1:
-            raise EmptySearchError(
-                "Couldn't find item identified by field ["
-                + field
-                + ".keyword] and value ["
-                + item_ident
-                + "]",
-                {},
-            )
-        else:
-            return response["hits"]["hits"][0]["_id"]
+        hits_by_value = {}
+        for hit in response["hits"]["hits"]:
+            value = hit.get("fields", {}).get(oss_col, [hit["_source"].get(field)])[0]
+            hits_by_value.setdefault(value, hit)
+
+        found = [value for value in unique_values if value in hits_by_value]
+        items = items_from_props(item, [hits_by_value[value]["_source"] for value in found], self.field_mapping)
+        return dict(zip(found, items))
 
     def get_items_by_ids(
         self, item: ItemDto, ids, provenance=constants.ITEM_PROVENANCE_C2C
     ):
         if len(ids) > 0:
-            docs = [
-                {
-                    "_id": id,
-                    "_source": {
-                        "exclude": "embedding"
-                    },  # Todo: replace by all model fields
-                }
-                for id in ids
-            ]
+            raise_if_cancelled()
+            source = {"includes": self._get_source_includes(item)}
+            docs = [{"_id": id, "_source": source} for id in ids]
 
             query = {"docs": docs}
 
@@ -94,6 +92,57 @@ class BaseDataAccessorOpenSearch(BaseDataAccessor):
             # logger.info(response)
             return item_dtos, total_items
 
+    def get_items_by_ids_many(
+        self, item: ItemDto, ids_per_row: list[list[str]], provenance=constants.ITEM_PROVENANCE_C2C
+    ) -> list[list[ItemDto] | Exception]:
+        """Batched variant of get_items_by_ids for several rows of ids
+
+        Fetches the union of all ids with a single mget and splits the documents
+        back into rows, keeping the order of the ids within each row. A row without
+        any found document gets the EmptySearchError in its place.
+
+        :param item: Item dto used as template for all rows
+        :param ids_per_row: One list of ids per row
+        :param provenance:
+        :return: List of item dto lists or exceptions, one per row
+        """
+        unique_ids = list(dict.fromkeys(id for ids in ids_per_row for id in ids))
+        docs_by_id = {}
+        if unique_ids:
+            raise_if_cancelled()
+            source = {"includes": self._get_source_includes(item)}
+            query = {"docs": [{"_id": id, "_source": source} for id in unique_ids]}
+            logger.info(f"Fetching {len(unique_ids)} items for {len(ids_per_row)} rows.")
+            response_mget = self.client.mget(body=query, index=self.target_idx_name)
+            docs_by_id = {doc["_id"]: doc for doc in response_mget["docs"]}
+
+        rows = []
+        for ids in ids_per_row:
+            if not ids:
+                rows.append([])
+                continue
+            response = {
+                "hits": {
+                    "hits": [docs_by_id[id] for id in ids if id in docs_by_id],
+                    "total": {"value": len(ids)},
+                }
+            }
+            try:
+                rows.append(self.__get_items_from_response(item, response, provenance)[0])
+            except EmptySearchError as e:
+                rows.append(e)
+        return rows
+
+    def _get_source_includes(self, item: ItemDto, *extra_fields: str) -> list[str]:
+        """Returns the source fields needed to hydrate the dto, so embeddings and other unused fields stay in the index
+
+        :param item: Item dto to be hydrated from the hits
+        :param extra_fields: Additional source fields needed by the query itself
+        :return: List of source fields for _source.includes
+        """
+        includes = get_source_includes(type(item), self.field_mapping)
+        return includes + [field for field in extra_fields if field not in includes]
+
     def get_item_by_url(self, item: ItemDto, url, filter={}):
         last_string = re.search(r".*/([^/?]+)[?]*", url.strip()).group(1)
         base64_bytes = last_string.encode("ascii")
@@ -105,7 +154,7 @@ class BaseDataAccessorOpenSearch(BaseDataAccessor):
         oss_col = column + ".keyword"
         query = {
             "size": 10,  # duplicate crids max occur in data, return max 10
-            "_source": {"exclude": "embedding"},
+            "_source": {"includes": self._get_source_includes(item)},
             "query": {
                 "match": {oss_col: value},
             },
@@ -119,6 +168,16 @@ class BaseDataAccessorOpenSearch(BaseDataAccessor):
         _, prim_val = get_primary_idents(self.config)
         return self._get_item_by_column_value(item=item, column=prim_val, value=urn)
 
+    def get_items_by_urns(self, item: ItemDto, urns: list[str]) -> dict[str, ItemDto]:
+        """Batched variant of get_item_by_urn, resolving all urns with a single query
+
+        :param item: Item dto used as template for the found items
+        :param urns: Values of the primary field
+        :return: Found items by stripped urn, urns without a matching item are left out
+        """
+        _, prim_val = get_primary_idents(self.config)
+        return self.get_items_by_field_values(item, [urn.strip() for urn in urns], prim_val)
+
     def get_item_by_crid(self, item: ItemDto, crid, filter=None):
         """Builds query to get items based on a crid
 
@@ -173,7 +232,7 @@ class BaseDataAccessorOpenSearch(BaseDataAccessor):
             start_date = xx
 
         query = self.__compose_date_range_query(
-            size, offset, [start_date, end_date], item_filter
+            size, offset, [start_date, end_date], item_filter, self._get_source_includes(item)
         )
         logger.info(f"query: {query}")
         response = self.client.search(body=query, index=self.target_idx_name)
@@ -197,27 +256,63 @@ class BaseDataAccessorOpenSearch(BaseDataAccessor):
         return newest_item_in_base_ts, oldest_item_in_base_ts
 
     def get_top_k_vals_for_column(self, column, k) -> list:
-        # apply field mapping if defined
-        if column in self.field_mapping.keys():
-            new_col = self.field_mapping[column]
-            logger.info(f"mapping col {column} to {new_col}")
-            column = new_col
+        """Gets the top k values of a column from the process-wide facet cache
 
-        # term filter applies to keyword subcolumn
-        oss_col = column + ".keyword"
+        :param column: Column (dto property) to get the values of
+        :param k: Max number of values
+        :return: Values ordered by their frequency
+        """
+        return self.facet_cache.get(
+            self.target_idx_name, self._map_column(column), k, self.get_facet_values, self._resolve_index
+        )
+
+    def register_facet_columns(self, columns: list[str]) -> None:
+        """Registers columns whose facet values are loaded together with the first facet lookup
+
+        :param columns: Columns (dto properties) used by filter widgets
+        """
+        self.facet_cache.register(
+            self.target_idx_name, {self._map_column(column): self.max_facet_values for column in columns}
+        )
 
+    def get_facet_values(self, columns: dict[str, int]) -> dict[str, list]:
+        """Gets the top values of several columns with one multi aggregation query
+
+        :param columns: Max number of values per (mapped) column
+        :return: Values ordered by their frequency per column
+        """
+        agg_names = {column: "facet_" + str(idx) for idx, column in enumerate(columns)}
         query = {
             "size": 0,
             "_source": {"exclude": "*"},
             "query": {"match_all": {}},
-            "aggs": {"mydata_agg": {"terms": {"field": oss_col, "size": k}}},
+            # term aggregation applies to keyword subcolumn
+            "aggs": {
+                agg_names[column]: {"terms": {"field": column + ".keyword", "size": k}}
+                for column, k in columns.items()
+            },
         }
         logger.info(query)
         response = self.client.search(body=query, index=self.target_idx_name)
-        buckets = response["aggregations"]["mydata_agg"]["buckets"]
-        vals = [bucket["key"] for bucket in buckets]
-        top_col_vals = vals
-        return top_col_vals
+        return {
+            column: [bucket["key"] for bucket in response["aggregations"][agg_name]["buckets"]]
+            for column, agg_name in agg_names.items()
+        }
+
+    def _map_column(self, column: str) -> str:
+        # apply field mapping if defined
+        if column in self.field_mapping.keys():
+            new_col = self.field_mapping[column]
+            logger.info(f"mapping col {column} to {new_col}")
+            column = new_col
+        return column
+
+    def _resolve_index(self) -> str:
+        try:
+            response = self.client.indices.get_alias(index=self.target_idx_name)
+            return ",".join(sorted(response))
+        except NotFoundError:
+            return self.target_idx_name
 
     def get_unique_vals_for_column(self, column, sort=True, max_vals=1000) -> list:
         uniq_vals = self.get_top_k_vals_for_column(column, k=max_vals)
@@ -247,18 +342,13 @@ class BaseDataAccessorOpenSearch(BaseDataAccessor):
 
         if total_items < 1 or not len(items):
             raise EmptySearchError("Keine Treffer gefunden", {})
-        item_dtos = []
-        for opensearch_hit in items:
-            new_item = copy.copy(item)
-            new_item = update_from_props(new_item, opensearch_hit, self.field_mapping)
-            item_dtos.append(new_item)
-        return item_dtos, total_items
+        return items_from_props(item, items, self.field_mapping), total_items
 
-    def __compose_date_range_query(self, size, offset, dates, item_filter) -> dict:
+    def __compose_date_range_query(self, size, offset, dates, item_filter, source_includes) -> dict:
         query = {
             "size": size,
             "from": offset,
-            "_source": {"exclude": "embedding*"},
+            "_source": {"includes": source_includes},
             "query": {
                 "bool": {
                     "must": [
@@ -0,0 +1,84 @@
+import logging
+import threading
+from typing import Any
+
+from opensearchpy import OpenSearch, Urllib3HttpConnection
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_MAXSIZE = 25
+
+_clients: dict[tuple, OpenSearch] = {}
+_lock = threading.Lock()
+
+
+def get_opensearch_client(config) -> OpenSearch:
+    """Returns the process-wide OpenSearch client for the configured domain
+
+    Clients are shared by all sessions, accessors and seekers connecting with the same host, port,
+    credentials and pool size, so every domain gets a single pool of keep-alive connections.
+
+    :param config: App config containing the opensearch section
+    :return: Shared OpenSearch client
+    """
+    use_ssl = config.get("opensearch.use_ssl", True)
+    pool_maxsize = config.get("opensearch.pool_maxsize", DEFAULT_POOL_MAXSIZE)
+    key = (
+        config["opensearch.host"],
+        config["opensearch.port"],
+        config["opensearch.user"],
+        config["opensearch.pass"],
+        use_ssl,
+        pool_maxsize,
+    )
+
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            logger.info(f"Creating OpenSearch client for [{key[0]}:{key[1]}] with pool size {pool_maxsize}")
+            client = OpenSearch(
+                hosts=[{"host": key[0], "port": key[1]}],
+                http_auth=(key[2], key[3]),
+                use_ssl=use_ssl,
+                verify_certs=use_ssl,
+                connection_class=Urllib3HttpConnection,
+                pool_maxsize=pool_maxsize,
+            )
+            _clients[key] = client
+        return client
+
+
+def get_pool_stats() -> list[dict[str, Any]]:
+    """Reports the utilization of the connection pools of all shared clients
+
+    :return: One entry per client and host with pool size, created and idle connections and served requests
+    """
+    stats = []
+    with _lock:
+        clients = list(_clients.items())
+    for key, client in clients:
+        for connection in client.transport.connection_pool.connections:
+            pool = getattr(connection, "pool", None)
+            if pool is None or pool.pool is None:
+                continue
+            # the pool queue is pre-filled with placeholders, only real connections are idle ones
+            idle = sum(1 for conn in list(pool.pool.queue) if conn is not None)
+            stats.append(
+                {
+                    "host": connection.host,
+                    "user": key[2],
+                    "maxsize": pool.pool.maxsize,
+                    "connections_created": pool.num_connections,
+                    "requests": pool.num_requests,
+                    "idle": idle,
+                }
+            )
+    return stats
+
+
+def clear_clients() -> None:
+    """Closes and drops all shared clients, e.g. after the domain credentials changed"""
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
@@ -0,0 +1,128 @@
+import logging
+import threading
+import time
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+FACET_TTL = 600  # seconds until cached facet values are refreshed in the background
+ALIAS_CHECK_INTERVAL = 60  # seconds between checks whether the index alias moved
+
+# {column: max number of values} -> {column: values}
+FacetLoader = Callable[[dict[str, int]], dict[str, list]]
+IndexResolver = Callable[[], str]
+
+
+class _IndexFacets:
+    def __init__(self):
+        self.index = None
+        self.values: dict[str, tuple[int, list]] = {}
+        self.registered: dict[str, int] = {}
+        self.loaded_at = 0.0
+        self.checked_at = 0.0
+        self.retry_at = 0.0
+        self.refreshing = False
+        self.lock = threading.Lock()
+
+
+class FacetCache:
+    """Process-wide cache of facet values (the top terms of a column) per index alias
+
+    Filter widgets of every session ask for the same facet values, so they are loaded once per
+    (index alias, column) and served from memory afterwards. Missing columns are loaded together
+    with all registered columns in one query. Cached values older than the ttl, or of an alias that
+    moved to another index, are refreshed in a background thread while readers keep getting the
+    previous values.
+    """
+
+    def __init__(self, ttl: float = FACET_TTL, alias_check_interval: float = ALIAS_CHECK_INTERVAL):
+        self.ttl = ttl
+        self.alias_check_interval = alias_check_interval
+        self._indices: dict[str, _IndexFacets] = {}
+        self._lock = threading.Lock()
+
+    def _get_index_facets(self, alias: str) -> _IndexFacets:
+        with self._lock:
+            return self._indices.setdefault(alias, _IndexFacets())
+
+    def register(self, alias: str, columns: dict[str, int]) -> None:
+        """Registers columns to be loaded with the first query for the alias
+
+        :param alias: Index or alias name
+        :param columns: Max number of values per column
+        """
+        facets = self._get_index_facets(alias)
+        with facets.lock:
+            for column, k in columns.items():
+                facets.registered[column] = max(k, facets.registered.get(column, 0))
+
+    def get(self, alias: str, column: str, k: int, load: FacetLoader, resolve: IndexResolver) -> list:
+        """Returns up to k facet values of the column
+
+        :param alias: Index or alias name
+        :param column: Column to get the values of
+        :param k: Max number of values
+        :param load: Loads the values of several columns with one query
+        :param resolve: Resolves the alias to the index it points to
+        :return: Facet values in the order of the aggregation buckets
+        """
+        facets = self._get_index_facets(alias)
+        entry = facets.values.get(column)
+        if entry is None or entry[0] < k:
+            with facets.lock:
+                entry = facets.values.get(column)
+                if entry is None or entry[0] < k:
+                    columns = {col: max_k for col, max_k in facets.registered.items() if col not in facets.values}
+                    columns[column] = max(k, columns.get(column, 0))
+                    logger.info(f"Loading facet values of {list(columns)} for [{alias}]")
+                    if facets.index is None:
+                        facets.index = resolve()
+                        facets.loaded_at = facets.checked_at = time.monotonic()
+                    for col, values in load(columns).items():
+                        facets.values[col] = (columns[col], values)
+                    entry = facets.values[column]
+        else:
+            self._refresh_if_due(alias, facets, load, resolve)
+        return entry[1][:k]
+
+    def _refresh_if_due(self, alias: str, facets: _IndexFacets, load: FacetLoader, resolve: IndexResolver) -> None:
+        now = time.monotonic()
+        if now < facets.retry_at:
+            return
+        if now - facets.loaded_at < self.ttl and now - facets.checked_at < self.alias_check_interval:
+            return
+        with facets.lock:
+            if facets.refreshing:
+                return
+            facets.refreshing = True
+        threading.Thread(target=self._refresh, args=(alias, facets, load, resolve), daemon=True).start()
+
+    def _refresh(self, alias: str, facets: _IndexFacets, load: FacetLoader, resolve: IndexResolver) -> None:
+        try:
+            index = resolve()
+            now = time.monotonic()
+            if index == facets.index and now - facets.loaded_at < self.ttl:
+                facets.checked_at = now
+                return
+            if index != facets.index:
+                logger.info(f"Index alias [{alias}] moved from [{facets.index}] to [{index}]. Reloading facet values.")
+            with facets.lock:
+                columns = {column: entry[0] for column, entry in facets.values.items()}
+            values = load(columns)
+            with facets.lock:
+                for column, column_values in values.items():
+                    facets.values[column] = (columns[column], column_values)
+                facets.index = index
+                facets.loaded_at = facets.checked_at = now
+        except Exception as e:
+            logger.warning(f"Could not refresh facet values for [{alias}]: {e}")
+            facets.retry_at = time.monotonic() + self.alias_check_interval
+        finally:
+            facets.refreshing = False
+
+    def clear(self) -> None:
+        with self._lock:
+            self._indices.clear()
+
+
+facet_cache = FacetCache()
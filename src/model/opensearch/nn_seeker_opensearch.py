@@ -1,16 +1,27 @@
 import collections
 import logging
+import time
 from typing import Any
 
 import httpx
+import numpy as np
 from dto.item import ItemDto
 from envyaml import EnvYAML
 from model.nn_seeker import NnSeeker
-from opensearchpy import OpenSearch, RequestsHttpConnection
+from model.opensearch.client_factory import get_opensearch_client
+from opensearchpy import NotFoundError, OpenSearch, TransportError
 from exceptions.embedding_not_found_error import UnknownItemEmbeddingError
+from util.cache_utils import LRUCache
+from util.cancellation import raise_if_cancelled
 
 logger = logging.getLogger(__name__)
 
+# shared by all seeker instances, so vectors survive model switches and paging.
+# Keys are (concrete index, embedding field, item id), values float32 arrays.
+VECTOR_CACHE = LRUCache(maxsize=10000)
+# index alias -> (resolution timestamp, concrete index name(s))
+ALIAS_CACHE = LRUCache(maxsize=64)
+
 
 class NnSeekerOpenSearch(NnSeeker):
     FILTER_TYPE_SAME_GENRE = "same_genre"
@@ -27,6 +38,24 @@ class NnSeekerOpenSearch(NnSeeker):
         "theme": "thematicCategories",
         "show": "showId",
     }
+    KNN_MODE_EXACT = "exact"
+    KNN_MODE_APPROXIMATE = "approximate"
+    KNN_MODE_AUTO = "auto"
+    # engines supporting efficient (pre-)filtering inside the knn clause
+    KNN_FILTERING_ENGINES = ("lucene", "faiss")
+    # cosinesimil knn query scores per engine, mapped to and from cosine similarity
+    KNN_SCORE_TO_COSINE = {
+        "nmslib": lambda score: 2 - 1 / score,
+        "faiss": lambda score: 2 - 1 / score,
+        "lucene": lambda score: 2 * score - 1,
+    }
+    KNN_COSINE_TO_SCORE = {
+        "nmslib": lambda cosine: 1 / (2 - cosine),
+        "faiss": lambda cosine: 1 / (2 - cosine),
+        "lucene": lambda cosine: (1 + cosine) / 2,
+    }
+    # seconds after which an index alias is resolved again
+    ALIAS_RESOLUTION_TTL = 60
 
     def __init__(
         self,
@@ -39,6 +68,12 @@ class NnSeekerOpenSearch(NnSeeker):
         max_items_per_fetch: int = 500,
         embedding_field_name: str = "embedding_01",
         config_MDP2: str = "./config/mdp2_lookup.yaml",
+        knn_mode: str = KNN_MODE_EXACT,
+        knn_exact_max_candidates: int = 10000,
+        knn_engine: str = "nmslib",
+        knn_oversampling: int = 5,
+        vector_cache: LRUCache | None = None,
+        alias_cache: LRUCache | None = None,
     ):
         self.client = client
         self.target_idx_name = target_idx_name
@@ -53,22 +88,18 @@ class NnSeekerOpenSearch(NnSeeker):
         self.api_key = api_key
         self.config_MDP2 = EnvYAML(config_MDP2)
 
+        self.knn_mode = knn_mode
+        self.knn_exact_max_candidates = knn_exact_max_candidates
+        self.knn_engine = knn_engine
+        self.knn_oversampling = knn_oversampling
+
+        self.vector_cache = vector_cache if vector_cache is not None else VECTOR_CACHE
+        self.alias_cache = alias_cache if alias_cache is not None else ALIAS_CACHE
+
     @classmethod
     def from_config(cls, config):
-        use_ssl = config.get("opensearch.use_ssl", True)
         return cls(
-            client=OpenSearch(
-                hosts=[
-                    {
-                        "host": config["opensearch.host"],
-                        "port": config["opensearch.port"],
-                    }
-                ],
-                http_auth=(config["opensearch.user"], config["opensearch.pass"]),
-                use_ssl=use_ssl,
-                verify_certs=use_ssl,
-                connection_class=RequestsHttpConnection,
-            ),
+            client=get_opensearch_client(config),
             target_idx_name=config["opensearch.index"],
             field_mapping=config["opensearch.field_mapping"],
             base_url_embedding=config["ingest.base_url_embedding"],
@@ -77,6 +108,20 @@ class NnSeekerOpenSearch(NnSeeker):
 
     def set_model_config(self, model_config):
         self._set_model_name(model_config["endpoint"].removeprefix("opensearch://"))
+        self.knn_mode = model_config.get("knn_mode") or self.KNN_MODE_EXACT
+        if self.knn_mode not in (
+            self.KNN_MODE_EXACT,
+            self.KNN_MODE_APPROXIMATE,
+            self.KNN_MODE_AUTO,
+        ):
+            logger.warning(
+                "Received unknown knn mode [" + self.knn_mode + "]. Using exact search."
+            )
+            self.knn_mode = self.KNN_MODE_EXACT
+        self.knn_exact_max_candidates = model_config.get(
+            "knn_exact_max_candidates", self.knn_exact_max_candidates
+        )
+        self.knn_engine = model_config.get("knn_engine") or self.knn_engine
 
     def _set_model_name(self, model_name):
         self.embedding_field_name = model_name
@@ -93,12 +138,69 @@ class NnSeekerOpenSearch(NnSeeker):
             embedding = self.__get_vec_for_text_from_endpoint(item)
 
         reco_filter = self._transpose_reco_filter_state(nn_filter, item)
+        raise_if_cancelled()
         recomm_content_ids, nn_dists = self.__get_nn_by_embedding(
             embedding, k, reco_filter
         )
 
         return recomm_content_ids, nn_dists, "id"
 
+    def get_k_NN_many(
+        self, items: list[ItemDto], k: int, nn_filters: list[dict[str, Any]]
+    ) -> list[tuple[list[str], list[float], str] | Exception]:
+        """
+        Batched variant of get_k_NN for a page of start items, with one filter state
+        per item. All start vectors are fetched with one mget and all neighbour
+        queries are sent with one msearch. Items which cannot be served get the
+        exception in their place of the result list instead of failing the batch.
+        """
+        logger.info(f"Seeking {k} neighours for {len(items)} items.")
+        results: list[Any] = [None] * len(items)
+        vectors = self.get_vectors([item.id for item in items if item.id])
+
+        positions, embeddings, reco_filters = [], [], []
+        for position, (item, nn_filter) in enumerate(zip(items, nn_filters)):
+            try:
+                if item.id:
+                    if item.id not in vectors:
+                        raise UnknownItemEmbeddingError(
+                            'Item with primary id [' + item.id + '] does not have embedding for [' + self.embedding_field_name + ']', {}
+                        )
+                    embedding = vectors[item.id].tolist()
+                else:
+                    embedding = self.__get_vec_for_text_from_endpoint(item)
+            except UnknownItemEmbeddingError as e:
+                results[position] = e
+                continue
+            positions.append(position)
+            embeddings.append(embedding)
+            reco_filters.append(self._transpose_reco_filter_state(nn_filter, item))
+
+        if not positions:
+            return results
+
+        raise_if_cancelled()
+        modes = self._plan_knn_modes(reco_filters)
+        body = []
+        for embedding, reco_filter, mode in zip(embeddings, reco_filters, modes):
+            body.append({"index": self.target_idx_name})
+            body.append(self.__compose_nn_query(embedding, k, reco_filter, mode))
+        logger.info(f"Sending {len(positions)} knn queries in one msearch.")
+        response = self.client.msearch(body=body)
+
+        for position, mode, item_response in zip(positions, modes, response["responses"]):
+            if "error" in item_response:
+                results[position] = TransportError(
+                    item_response.get("status", 500),
+                    item_response["error"].get("type", "unknown"),
+                    item_response["error"],
+                )
+                continue
+            ids, nn_dists = self.__get_nn_from_hits(item_response["hits"]["hits"], mode)
+            results[position] = (ids, nn_dists, "id")
+
+        return results
+
     def get_max_num_neighbours(self, content_id):
         return self.__max_num_neighbours
 
@@ -108,21 +210,93 @@ class NnSeekerOpenSearch(NnSeeker):
     def __get_nn_by_embedding(
         self, embedding: list[float], k: int, filter_criteria: dict[str, Any]
     ) -> tuple[list[str], list[float]]:
-        return self.__get_exact__nn_by_embedding(embedding, k, filter_criteria)
-
-    def __get_exact__nn_by_embedding(
-        self, embedding: list[float], k: int, filter_criteria: dict[str, Any]
-    ) -> tuple[list[str], list[float]]:
-        query = self.__compose_exact_nn_by_embedding_query(
-            embedding, k, filter_criteria
-        )
+        mode = self._plan_knn_mode(filter_criteria)
+        query = self.__compose_nn_query(embedding, k, filter_criteria, mode)
         logger.info(query)
         response = self.client.search(body=query, index=self.target_idx_name)
-        hits = response["hits"]["hits"]
-        nn_dists: list[float] = [(hit["_score"] - 1) for hit in hits]
+        return self.__get_nn_from_hits(response["hits"]["hits"], mode)
+
+    def _plan_knn_mode(self, filter_criteria: dict[str, Any]) -> str:
+        """
+        Decide between exact and approximate search. In auto mode the number of
+        documents matching the filter is counted first: brute force scoring is cheap
+        and exact for small candidate sets, while the HNSW graph pays off for large
+        ones.
+        """
+        if self.knn_mode != self.KNN_MODE_AUTO:
+            return self.knn_mode
+
+        response = self.client.count(
+            body={"query": self.__compose_filter_query(filter_criteria)},
+            index=self.target_idx_name,
+        )
+        return self.__get_knn_mode_for_candidates(response["count"])
+
+    def _plan_knn_modes(self, filters: list[dict[str, Any]]) -> list[str]:
+        """
+        Batched variant of _plan_knn_mode, counting the candidates of all filters
+        with one msearch.
+        """
+        if self.knn_mode != self.KNN_MODE_AUTO:
+            return [self.knn_mode] * len(filters)
+
+        body = []
+        for filter_criteria in filters:
+            body.append({"index": self.target_idx_name})
+            body.append(
+                {
+                    "size": 0,
+                    "track_total_hits": True,
+                    "query": self.__compose_filter_query(filter_criteria),
+                }
+            )
+        response = self.client.msearch(body=body)
+        return [
+            self.__get_knn_mode_for_candidates(item_response["hits"]["total"]["value"])
+            if "error" not in item_response
+            else self.KNN_MODE_EXACT
+            for item_response in response["responses"]
+        ]
+
+    def __get_knn_mode_for_candidates(self, num_candidates: int) -> str:
+        mode = (
+            self.KNN_MODE_EXACT
+            if num_candidates <= self.knn_exact_max_candidates
+            else self.KNN_MODE_APPROXIMATE
+        )
+        logger.info(f"Planned {mode} knn search for {num_candidates} candidates.")
+        return mode
+
+    def __compose_filter_query(self, filter_criteria: dict[str, Any]) -> dict[str, Any]:
+        if filter_criteria.get("bool"):
+            return {"bool": filter_criteria["bool"]}
+        return {"match_all": {}}
+
+    def __compose_nn_query(
+        self, embedding: list[float], k: int, filter_criteria: dict[str, Any], mode: str
+    ) -> dict[str, Any]:
+        if mode == self.KNN_MODE_APPROXIMATE:
+            return self.__compose_approx_nn_by_embedding_query(
+                embedding, k, filter_criteria
+            )
+        return self.__compose_exact_nn_by_embedding_query(embedding, k, filter_criteria)
+
+    def __get_nn_from_hits(
+        self, hits: list[dict[str, Any]], mode: str
+    ) -> tuple[list[str], list[float]]:
+        if mode == self.KNN_MODE_APPROXIMATE:
+            to_cosine = self.KNN_SCORE_TO_COSINE[self.knn_engine]
+        else:
+            to_cosine = self._exact_score_to_cosine
+        nn_dists: list[float] = [to_cosine(hit["_score"]) for hit in hits]
         ids: list[str] = [hit["_id"] for hit in hits]
         return ids, nn_dists
 
+    @staticmethod
+    def _exact_score_to_cosine(score: float) -> float:
+        # script_score knn_score for cosinesimil is 1 + cosine similarity
+        return score - 1
+
     def __compose_exact_nn_by_embedding_query(
         self, embedding: list[float], k: int, filter_criteria: dict[str, Any]
     ) -> dict[str, Any]:
@@ -146,16 +320,10 @@ class NnSeekerOpenSearch(NnSeeker):
             },
         }
 
-        sub_query = {}
-
-        # add boolean expressions
-        if filter_criteria.get("bool"):
-            sub_query["bool"] = filter_criteria["bool"]
-        if not sub_query:
-            sub_query["match_all"] = {}
-
-        # assign it to the subquery
-        query["query"]["script_score"]["query"] = sub_query
+        # assign the boolean expressions to the subquery
+        query["query"]["script_score"]["query"] = self.__compose_filter_query(
+            filter_criteria
+        )
 
         # add sorting
         if filter_criteria.get("sort"):
@@ -169,51 +337,118 @@ class NnSeekerOpenSearch(NnSeeker):
 
         return query
 
-    def __get_approx_nn_by_embedding(self, embedding, k, filter_criteria):
-        query = {
-            "size": k,
-            "_source": {"include": "id"},
-            "query": {
-                "knn": {self.embedding_field_name: {"vector": embedding, "k": k}}
-            },
-        }
+    def __compose_approx_nn_by_embedding_query(
+        self, embedding: list[float], k: int, filter_criteria: dict[str, Any]
+    ) -> dict[str, Any]:
+        knn_clause = {"vector": embedding, "k": k}
+        query = {"size": k, "_source": False}
+
+        if not filter_criteria.get("bool"):
+            query["query"] = {"knn": {self.embedding_field_name: knn_clause}}
+        elif self.knn_engine in self.KNN_FILTERING_ENGINES:
+            # efficient filtering: the graph search only visits matching documents
+            knn_clause["filter"] = self.__compose_filter_query(filter_criteria)
+            query["query"] = {"knn": {self.embedding_field_name: knn_clause}}
+        else:
+            # engines without efficient filtering drop non-matching neighbours
+            # after the graph search, so oversample to still fill up k results
+            knn_clause["k"] = k * self.knn_oversampling
+            query["query"] = {
+                "bool": {
+                    "must": [{"knn": {self.embedding_field_name: knn_clause}}],
+                    "filter": [self.__compose_filter_query(filter_criteria)],
+                }
+            }
 
-        if len(filter_criteria["sortrecos"]):
+        if filter_criteria.get("sort"):
             query["sort"] = [
-                {
-                    self.field_mapping["created"]: {
-                        "order": filter_criteria["sortrecos"][0]
-                    }
-                }
+                {self.field_mapping["created"]: {"order": filter_criteria["sort"]}}
             ]
             query["track_scores"] = True
 
-        logger.info(query)
-        response = self.client.search(body=query, index=self.target_idx_name)
+        if filter_criteria.get("score"):
+            query["min_score"] = self.KNN_COSINE_TO_SCORE[self.knn_engine](
+                filter_criteria["score"]
+            )
 
-        hits = response["hits"]["hits"]
+        return query
 
-        nn_dists = [(1.0 / hit["_score"]) - 1 for hit in hits]
-        ids = [hit["_source"]["id"] for hit in hits]
+    def __get_vec_for_content_id(self, content_id):
+        vector = self.get_vectors([content_id]).get(content_id)
+        if vector is None:
+            raise UnknownItemEmbeddingError(
+                'Item with primary id [' + content_id + '] does not have embedding for [' + self.embedding_field_name + ']', {}
+            )
 
-        return ids, nn_dists
+        return vector.tolist()
+
+    def get_vectors(self, content_ids: list[str]) -> dict[str, np.ndarray]:
+        """
+        Fetch the embeddings of the given items, served from the vector cache where
+        possible. All misses are fetched with a single mget; items without an
+        embedding for the current field are left out of the result.
+        """
+        index = self._resolve_index()
+        vectors = {}
+        misses = []
+        for content_id in dict.fromkeys(content_ids):
+            vector = self.vector_cache.get((index, self.embedding_field_name, content_id))
+            if vector is None:
+                misses.append(content_id)
+            else:
+                vectors[content_id] = vector
+
+        if not misses:
+            return vectors
 
-    def __get_vec_for_content_id(self, content_id):
         query = {
-            "size": 1,
-            "_source": {"include": self.embedding_field_name},
-            "query": {"bool": {"must": [{"terms": {"id.keyword": [content_id]}}]}},
+            "docs": [
+                {"_id": content_id, "_source": {"include": [self.embedding_field_name]}}
+                for content_id in misses
+            ]
         }
-
-        logger.info(query)
-        response = self.client.search(body=query, index=self.target_idx_name)
-        first_hit_source = response.get("hits", {}).get("hits", [{}])[0].get("_source", {})
-        if self.embedding_field_name not in first_hit_source:
-            raise UnknownItemEmbeddingError(
-                'Item with primary id [' + content_id + '] does not have embedding for [' + self.embedding_field_name + ']', {}
+        logger.info(f"Fetching {len(misses)} embeddings for [{self.embedding_field_name}].")
+        response = self.client.mget(body=query, index=self.target_idx_name)
+        for doc in response["docs"]:
+            source = doc.get("_source") or {}
+            if self.embedding_field_name not in source:
+                continue
+            vector = np.asarray(source[self.embedding_field_name], dtype=np.float32)
+            self.vector_cache.set((index, self.embedding_field_name, doc["_id"]), vector)
+            vectors[doc["_id"]] = vector
+
+        return vectors
+
+    def get_index_version(self) -> str:
+        """
+        Concrete index behind the target index alias, so cached reco results can be
+        told apart after the alias moved.
+        """
+        return self._resolve_index()
+
+    def _resolve_index(self) -> str:
+        """
+        Resolve the target index alias to the concrete index it points to. When the
+        alias has been swapped to a new index, the cached vectors are dropped.
+        """
+        entry = self.alias_cache.get(self.target_idx_name)
+        if entry is not None and time.monotonic() - entry[0] < self.ALIAS_RESOLUTION_TTL:
+            return entry[1]
+
+        try:
+            response = self.client.indices.get_alias(index=self.target_idx_name)
+            resolved = ",".join(sorted(response))
+        except NotFoundError:
+            resolved = self.target_idx_name
+
+        if entry is not None and entry[1] != resolved:
+            logger.info(
+                f"Index alias [{self.target_idx_name}] moved from [{entry[1]}] to [{resolved}]. Clearing vector cache."
             )
+            self.vector_cache.clear()
 
-        return first_hit_source.get(self.embedding_field_name)
+        self.alias_cache.set(self.target_idx_name, (time.monotonic(), resolved))
+        return resolved
 
     def __get_vec_for_text_from_endpoint(self, item):
         text_to_embed = item.description
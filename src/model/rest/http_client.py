@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import threading
+from typing import Any, Coroutine
+
+import httpx
+from urllib3 import PoolManager, Retry, Timeout
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_MAXSIZE = 25
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 60.0
+DEFAULT_RETRIES = 5
+LOG_BODY_MAX_LENGTH = 500  # characters of request and response bodies written to the log
+
+_pools: dict[tuple, PoolManager] = {}
+_async_clients: dict[tuple, httpx.AsyncClient] = {}
+# async clients are bound to the event loop they are used in, so all of them run on one shared loop
+_loop: asyncio.AbstractEventLoop | None = None
+_lock = threading.Lock()
+
+
+def get_http_settings(config=None) -> tuple[int, float, float, int]:
+    """Reads the settings of the REST clients from the optional rest section of the app config
+
+    :param config: App config, defaults are used for missing keys
+    :return: Pool size, connect timeout, read timeout and retry budget
+    """
+    config = config if config is not None else {}
+    return (
+        config.get("rest.pool_maxsize", DEFAULT_POOL_MAXSIZE),
+        config.get("rest.connect_timeout", DEFAULT_CONNECT_TIMEOUT),
+        config.get("rest.read_timeout", DEFAULT_READ_TIMEOUT),
+        config.get("rest.retries", DEFAULT_RETRIES),
+    )
+
+
+def get_http_pool(config=None) -> PoolManager:
+    """Returns the process-wide connection pool of the REST seekers
+
+    Pools are shared by all sessions and seekers with the same settings, so connections to the
+    PA services are kept alive and reused between searches.
+
+    :param config: App config containing the optional rest section
+    :return: Shared pool manager
+    """
+    key = get_http_settings(config)
+    with _lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool_maxsize, connect_timeout, read_timeout, retries = key
+            logger.info(f"Creating REST connection pool with pool size {pool_maxsize}")
+            pool = PoolManager(
+                maxsize=pool_maxsize,
+                block=False,
+                timeout=Timeout(connect=connect_timeout, read=read_timeout),
+                retries=Retry(connect=retries, read=2, redirect=5, backoff_factor=0.1),
+            )
+            _pools[key] = pool
+        return pool
+
+
+def get_async_http_client(config=None) -> httpx.AsyncClient:
+    """Returns the process-wide async client, for concurrent fan-out of requests
+
+    The client may only be used on the shared event loop, i.e. in coroutines started with run_async.
+
+    :param config: App config containing the optional rest section
+    :return: Async client with the same pool size, timeouts and connect retries as the sync pool
+    """
+    key = get_http_settings(config)
+    with _lock:
+        client = _async_clients.get(key)
+        if client is None:
+            pool_maxsize, connect_timeout, read_timeout, retries = key
+            limits = httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize)
+            client = httpx.AsyncClient(
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                transport=httpx.AsyncHTTPTransport(limits=limits, retries=retries),
+            )
+            _async_clients[key] = client
+        return client
+
+
+def run_async(coroutine: Coroutine) -> Any:
+    """Runs the coroutine on the shared event loop of the async clients and waits for its result
+
+    :param coroutine: Coroutine using the async clients
+    :return: Result of the coroutine
+    """
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="rest-client-loop", daemon=True).start()
+        loop = _loop
+    return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+
+
+def format_for_log(data: Any, max_length: int = LOG_BODY_MAX_LENGTH) -> str:
+    text = data if isinstance(data, str) else str(data)
+    if len(text) <= max_length:
+        return text
+    return f"{text[:max_length]}... ({len(text)} characters)"
+
+
+def clear_clients() -> None:
+    """Closes and drops all shared pools and async clients, e.g. after the settings changed"""
+    with _lock:
+        for pool in _pools.values():
+            pool.clear()
+        _pools.clear()
+        async_clients = list(_async_clients.values())
+        _async_clients.clear()
+    for client in async_clients:
+        run_async(client.aclose())
@@ -11,14 +11,14 @@ class NnSeekerPaService(NnSeekerRest):
 
         super().__init__(config)
 
-    def _get_request_params_c2c_s2c(self, item: ItemDto, oss_field: str) -> dict[str, Any]:
+    def _get_request_params_c2c_s2c(self, item: ItemDto, oss_field: str, k: int) -> dict[str, Any]:
         return {
             "configuration": self.__configuration_c2c,
             "assetId": item.__getattribute__(oss_field),
-            "limit": self.__max_num_neighbours,
+            "limit": max(k, self.__max_num_neighbours),
         }
 
-    def _get_request_params_u2c(self, item: ItemDto, oss_field: str) -> dict[str, Any]:
+    def _get_request_params_u2c(self, item: ItemDto, oss_field: str, k: int) -> dict[str, Any]:
         return {
             "configuration": self.__configuration_u2c,
             "explain": True,
@@ -5,8 +5,8 @@ from typing import Dict
 logger = logging.getLogger(__name__)
 
 class NnSeekerPaServiceClients(RequestHelper):
-    def __init__(self, model_info: Dict, max_num_neighbours: int = 16):
-        super().__init__()
+    def __init__(self, model_info: Dict, max_num_neighbours: int = 16, config=None):
+        super().__init__(config)
         self.model_info = model_info
         self.__max_num_neighbours = max_num_neighbours
         self.set_model_config(self.model_info, endpoint_key="clients_endpoint")
@@ -1,24 +1,21 @@
 import logging
-from urllib3 import PoolManager, Retry
 import json
+from model.rest.http_client import format_for_log, get_async_http_client, get_http_pool
+from util.cancellation import raise_if_cancelled
 
 logger = logging.getLogger(__name__)
 
 class RequestHelper:
-    def __init__(self):
+    def __init__(self, config=None):
         self._endpoint = ""
         self._model_props = {}
+        self._config = config
 
         self._http = self._init_http_pool()
 
     def _init_http_pool(self):
-        retries = Retry(
-            connect= 5,
-            read= 2,
-            redirect= 5,
-            backoff_factor= 0.1,
-        )
-        return PoolManager(retries=retries)
+        # shared by all request helpers with the same settings, so connections are kept alive between searches
+        return get_http_pool(self._config)
 
     def set_model_config(self, model_config, endpoint_key="endpoint", props_key="properties"):
         self._endpoint = model_config.get(endpoint_key, None)
@@ -37,23 +34,36 @@ class RequestHelper:
     def get(self, endpoint: str | None = None, headers: dict | None = None):
         endpoint = self._endpoint if endpoint is None else endpoint
         headers = self.get_headers() if headers is None else headers
+        raise_if_cancelled()
         logger.info(f"GET call to [{endpoint}]")
         response = self._http.request("GET", endpoint, headers=headers)
         status = response.status
         data = json.loads(response.data.decode("utf-8"))
-        logger.info(f"Got status {status} with data: {data}")
+        logger.info(f"Got status {status} with data: {format_for_log(data)}")
         return status, data
 
     def post(self, endpoint: str | None = None, headers: dict | None = None, json_body: dict | None = None):
         endpoint = endpoint or self._endpoint
         headers = headers or self.get_headers()
         json_body = json_body or {}
-        logger.info(f"POST call to [{endpoint}] with body {json.dumps(json_body)}")
+        raise_if_cancelled()
+        logger.info(f"POST call to [{endpoint}] with body {format_for_log(json.dumps(json_body))}")
         response = self._http.request("POST", endpoint, headers=headers, json=json_body)
         status = response.status
         data = json.loads(response.data.decode("utf-8"))
-        logger.info(f"Got status {status} with data: {data}")
+        logger.info(f"Got status {status} with data: {format_for_log(data)}")
         return status, data
 
+    async def apost(self, endpoint: str | None = None, headers: dict | None = None, json_body: dict | None = None):
+        """Async variant of post for concurrent fan-out, to be run with run_async"""
+        endpoint = endpoint or self._endpoint
+        headers = headers or self.get_headers()
+        json_body = json_body or {}
+        logger.info(f"POST call to [{endpoint}] with body {format_for_log(json.dumps(json_body))}")
+        response = await get_async_http_client(self._config).post(endpoint, headers=headers, json=json_body)
+        data = response.json()
+        logger.info(f"Got status {response.status_code} with data: {format_for_log(data)}")
+        return response.status_code, data
+
     def get_model_props(self):
         return self._model_props
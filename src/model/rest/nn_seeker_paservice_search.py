@@ -4,7 +4,7 @@ from model.rest.nn_seeker_rest import NnSeekerRest
 
 
 class NnSeekerPaServiceSearch(NnSeekerRest):
-    def _get_request_params_c2c_s2c(self, item: ItemDto, oss_field: str) -> dict[str, Any]:
+    def _get_request_params_c2c_s2c(self, item: ItemDto, oss_field: str, k: int) -> dict[str, Any]:
         # Add the Client
         return {
             "embedText": item.description, "client": item.client,
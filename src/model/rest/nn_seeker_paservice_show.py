@@ -3,14 +3,20 @@ import logging
 import constants
 from model.opensearch.base_data_accessor_opensearch import BaseDataAccessorOpenSearch
 from model.rest.nn_seeker_paservice import NnSeekerPaService
+from util.cache_utils import LRUCache
 from util.dto_utils import dto_from_classname
 
 logger = logging.getLogger(__name__)
 
+EPISODE_CACHE_TTL = 600  # seconds until the episode of a show is looked up again
+# shared by all seeker instances, keys are (index, show id), values episode ids
+EPISODE_CACHE = LRUCache(maxsize=10000, ttl=EPISODE_CACHE_TTL)
+
 
 class NnSeekerPaServiceShow(NnSeekerPaService):
-    def __init__(self, config, item_accessor: BaseDataAccessorOpenSearch):
+    def __init__(self, config, item_accessor: BaseDataAccessorOpenSearch, episode_cache: LRUCache | None = None):
         self.__item_accessor = item_accessor
+        self.episode_cache = episode_cache if episode_cache is not None else EPISODE_CACHE
 
         super().__init__(config)
 
@@ -20,25 +26,62 @@ class NnSeekerPaServiceShow(NnSeekerPaService):
 
     def get_recos_user(self, user, n_recos, nn_filter=False):
         reco_ids, nn_dists, oss_field, utilities = super().get_recos_user(user, n_recos, nn_filter)
-        for idx, show_id in enumerate(reco_ids):
-            item_dto = dto_from_classname(
-                class_name="ShowItemDto",
-                position=constants.ITEM_POSITION_RECO,
-                item_type=constants.ITEM_TYPE_CONTENT,
-                provenance=constants.ITEM_PROVENANCE_C2C,
-            )
-            lookup_res = self.__item_accessor.get_item_by_urn(item_dto, show_id)
+        episodes = self.get_episodes(reco_ids)
+
+        episode_ids, episode_dists = [], []
+        for idx, (show_id, nn_dist) in enumerate(zip(reco_ids, nn_dists)):
+            episode = episodes.get(show_id.strip())
+            if not episode:
+                logger.warning("Could not find an episode for show id [" + show_id + "]. Omitting.")
+                continue
             logger.info(
                 "Replacing show id ["
                 + show_id
                 + "] at idx position ["
                 + str(idx)
                 + "] with corresponding episode id ["
-                + lookup_res[0][0].episode
+                + episode
                 + "]"
             )
-            reco_ids[idx] = lookup_res[0][0].episode
+            episode_ids.append(episode)
+            episode_dists.append(nn_dist)
 
         utilities = None
 
-        return reco_ids, nn_dists, oss_field, utilities
+        return episode_ids, episode_dists, oss_field, utilities
+
+    def get_episodes(self, show_ids: list[str]) -> dict[str, str]:
+        """Resolves the show ids to their episode ids
+
+        Episodes are served from the episode cache, all show ids missing in the cache are looked
+        up with a single query.
+
+        :param show_ids: Show ids returned by the reco service
+        :return: Episode id by stripped show id, show ids without an episode are left out
+        """
+        index = self.__item_accessor.target_idx_name
+        episodes = {}
+        misses = []
+        for show_id in dict.fromkeys(show_id.strip() for show_id in show_ids):
+            episode = self.episode_cache.get((index, show_id))
+            if episode is None:
+                misses.append(show_id)
+            else:
+                episodes[show_id] = episode
+
+        if not misses:
+            return episodes
+
+        item_dto = dto_from_classname(
+            class_name="ShowItemDto",
+            position=constants.ITEM_POSITION_RECO,
+            item_type=constants.ITEM_TYPE_CONTENT,
+            provenance=constants.ITEM_PROVENANCE_C2C,
+        )
+        shows = self.__item_accessor.get_items_by_urns(item_dto, misses)
+        for show_id, show in shows.items():
+            if show.episode:
+                self.episode_cache.set((index, show_id), show.episode)
+                episodes[show_id] = show.episode
+
+        return episodes
@@ -1,3 +1,4 @@
+import asyncio
 import json
 import logging
 from typing import Any, Callable
@@ -7,17 +8,19 @@ from exceptions.item_not_found_error import UnknownItemError
 from exceptions.user_not_found_error import UnknownUserError
 from model.nn_seeker import NnSeeker
 from util.dto_utils import get_primary_idents
+from model.rest.http_client import run_async
 from model.rest.nn_seeker_paservice_request_helper import RequestHelper
+from util.cancellation import raise_if_cancelled
 from typing import Union
 
 
 logger = logging.getLogger(__name__)
 
-RequestParamsBuilder = Callable[[ItemDto, str], dict[str, Any]]
+RequestParamsBuilder = Callable[[ItemDto, str, int], dict[str, Any]]
 
 class NnSeekerRest(NnSeeker):
     def __init__(self, config, max_num_neighbours=16):
-        self.request_helper = RequestHelper()
+        self.request_helper = RequestHelper(config)
         self.__config = config
         self.__max_num_neighbours = max_num_neighbours
 
@@ -28,6 +31,19 @@ class NnSeekerRest(NnSeeker):
             self._get_request_params_c2c_s2c, UnknownItemError, item, k, nn_filter
         )
 
+    def get_k_NN_many(
+        self, items: list[ItemDto], k: int, nn_filters: list[dict[str, Any] | None]
+    ) -> list[tuple[list[str], list[float], Any, dict[Any, Any]] | Exception]:
+        """Batched variant of get_k_NN, sending the requests of all start items concurrently
+
+        Items which cannot be served get the exception in their place of the result list instead of
+        failing the batch.
+        """
+        raise_if_cancelled()
+        return run_async(self._get_recos_many(
+            self._get_request_params_c2c_s2c, UnknownItemError, items, k, nn_filters
+        ))
+
     def get_recos_user(
         self, user: UserItemDto, n_recos: int, nn_filter: dict[str, Any] | None = None
     ) -> tuple[list[str], list[float], Any, dict[Any, Any]]:
@@ -48,9 +64,37 @@ class NnSeekerRest(NnSeeker):
     ) -> tuple[list[str], list[float], Any, dict[Any, Any]]:
         _, oss_field = get_primary_idents(self.__config)
 
-        params = self._build_request(request_params_builder, item, oss_field, nn_filter)
+        params = self._build_request(request_params_builder, item, oss_field, k, nn_filter)
         status, data = self.request_helper.post(json_body=params)
+        return self._get_result(unknown_item_exception, item, oss_field, status, data)
+
+    async def _get_recos_many(
+        self,
+        request_params_builder: RequestParamsBuilder,
+        unknown_item_exception: Union[type[UnknownItemError], type[UnknownUserError]],
+        items: list[ItemDto],
+        k: int,
+        nn_filters: list[dict[str, Any] | None],
+    ) -> list[tuple[list[str], list[float], Any, dict[Any, Any]] | Exception]:
+        _, oss_field = get_primary_idents(self.__config)
+
+        async def get_recos(item: ItemDto, nn_filter: dict[str, Any] | None):
+            params = self._build_request(request_params_builder, item, oss_field, k, nn_filter)
+            status, data = await self.request_helper.apost(json_body=params)
+            return self._get_result(unknown_item_exception, item, oss_field, status, data)
 
+        return await asyncio.gather(
+            *(get_recos(item, nn_filter) for item, nn_filter in zip(items, nn_filters)), return_exceptions=True
+        )
+
+    def _get_result(
+        self,
+        unknown_item_exception: Union[type[UnknownItemError], type[UnknownUserError]],
+        item: ItemDto,
+        oss_field: str,
+        status: int,
+        data: dict[str, Any],
+    ) -> tuple[list[str], list[float], Any, dict[Any, Any]]:
         # TODO - add better status and error handling
         if status != 200:
             raise unknown_item_exception(
@@ -67,15 +111,16 @@ class NnSeekerRest(NnSeeker):
 
     def _build_request(
         self,
-        request_params_builder: Callable[[ItemDto, str], dict[str, Any]],
+        request_params_builder: RequestParamsBuilder,
         item: ItemDto,
         oss_field: str,
+        k: int,
         nn_filter: dict[str, Any] | None,
     ):
         return {
             **self._get_filters(nn_filter),
             **self._get_model_config_params(),
-            **request_params_builder(item, oss_field),
+            **request_params_builder(item, oss_field, k),
         }
 
     def _get_model_config_params(self) -> dict[str, Any]:
@@ -115,8 +160,8 @@ class NnSeekerRest(NnSeeker):
     def _parse_response(response: dict[str, Any]) -> tuple[list[str], list[float], dict[Any, Any]]:
         raise NotImplementedError()
 
-    def _get_request_params_c2c_s2c(self, item: ItemDto, oss_field: str) -> dict[str, Any]:
+    def _get_request_params_c2c_s2c(self, item: ItemDto, oss_field: str, k: int) -> dict[str, Any]:
         raise NotImplementedError()
 
-    def _get_request_params_u2c(self, item: ItemDto, oss_field: str) -> dict[str, Any]:
+    def _get_request_params_u2c(self, item: ItemDto, oss_field: str, k: int) -> dict[str, Any]:
         raise NotImplementedError()
\ No newline at end of file
@@ -0,0 +1,85 @@
+import logging
+import threading
+
+import boto3
+from botocore.config import Config
+from botocore.credentials import AssumeRoleCredentialFetcher, DeferredRefreshableCredentials
+from botocore.session import get_session
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REGION = "eu-central-1"
+DEFAULT_MAX_POOL_CONNECTIONS = 25
+ROLE_SESSION_NAME = "RecoExplorerU2C"
+
+_sessions: dict[tuple, boto3.Session] = {}
+_clients: dict[tuple, object] = {}
+_lock = threading.Lock()
+
+
+def get_assumed_role_session(role_arn: str, region: str = DEFAULT_REGION) -> boto3.Session:
+    """Returns the process-wide session acting as the given role
+
+    The role is only assumed on the first call of a client of the session, and assumed again
+    shortly before the temporary credentials expire, so long-lived clients keep working.
+
+    :param role_arn: Arn of the role to assume
+    :param region: Region of the clients
+    :return: Shared session with refreshable credentials
+    """
+    key = (role_arn, region)
+    with _lock:
+        session = _sessions.get(key)
+        if session is None:
+            source_session = get_session()
+            fetcher = AssumeRoleCredentialFetcher(
+                client_creator=source_session.create_client,
+                source_credentials=source_session.get_credentials(),
+                role_arn=role_arn,
+                extra_args={"RoleSessionName": ROLE_SESSION_NAME},
+            )
+            role_session = get_session()
+            role_session._credentials = DeferredRefreshableCredentials(
+                method="assume-role", refresh_using=fetcher.fetch_credentials
+            )
+            role_session.set_config_variable("region", region)
+            session = boto3.Session(botocore_session=role_session)
+            _sessions[key] = session
+        return session
+
+
+def get_aws_client(service: str, role_arn: str, region: str = DEFAULT_REGION, endpoint_url: str | None = None):
+    """Returns the process-wide client of the service, acting as the given role
+
+    Clients are thread-safe and keep their connection pool, so every (service, role, region)
+    combination gets one client shared by all sessions and model clients.
+
+    :param service: Name of the service, e.g. sagemaker-runtime
+    :param role_arn: Arn of the role to assume
+    :param region: Region of the service
+    :param endpoint_url: Url of a local stub of the service, e.g. for tests. No role is assumed then.
+    :return: Shared boto3 client
+    """
+    key = (service, role_arn, region, endpoint_url)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    config = Config(max_pool_connections=DEFAULT_MAX_POOL_CONNECTIONS)
+    if endpoint_url:
+        logger.info(f"Creating {service} client for stub endpoint [{endpoint_url}]")
+        client = boto3.client(service, region_name=region, endpoint_url=endpoint_url, config=config,
+                              aws_access_key_id="stub", aws_secret_access_key="stub")
+    else:
+        logger.info(f"Creating {service} client for role [{role_arn}]")
+        client = get_assumed_role_session(role_arn, region).client(service, config=config)
+
+    with _lock:
+        return _clients.setdefault(key, client)
+
+
+def clear_clients() -> None:
+    """Drops all shared sessions and clients, e.g. after the roles changed"""
+    with _lock:
+        _sessions.clear()
+        _clients.clear()
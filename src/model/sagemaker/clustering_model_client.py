@@ -1,39 +1,31 @@
+import copy
 import logging
 import json
 import constants
 
-from boto3 import client as boto3client
 from exceptions.endpoint_error import EndpointError
 from exceptions.user_not_found_error import UnknownUserError
+from model.sagemaker.aws_clients import get_aws_client
+from util.cache_utils import LRUCache
 
 logger = logging.getLogger(__name__)
 
+CLUSTER_RESPONSE_TTL = 300  # seconds until user clusters are requested from the endpoint again
+# shared by all client instances, keys are (endpoint, request body), values decoded responses
+CLUSTER_RESPONSE_CACHE = LRUCache(maxsize=256, ttl=CLUSTER_RESPONSE_TTL)
+
 class ClusteringModelClient:
 
-    def __init__( self, config ):
+    def __init__( self, config, response_cache: LRUCache | None = None ):
         self.__model_config = {}
-        cross_account_options = self.__get_cross_account_options(
-            config[constants.MODEL_CONFIG_U2C]['clustering_models']['U2C-Knn-Model']['role_arn']
+        model_info = config[constants.MODEL_CONFIG_U2C]['clustering_models']['U2C-Knn-Model']
+        self._client = get_aws_client(
+            "sagemaker-runtime", model_info['role_arn'], endpoint_url=model_info.get('endpoint_url')
         )
-        self._client = boto3client("sagemaker-runtime", **cross_account_options)
+        self.response_cache = response_cache if response_cache is not None else CLUSTER_RESPONSE_CACHE
 
     def get_user_cluster(self):
-        json_body = json.dumps({ "action": "list_clusters" })
-
-        try:
-
-            logger.info('Invoking clustering endpoint call to [' + self.__model_config['endpoint'] + ']')
-            
-            response = self._client.invoke_endpoint(
-                EndpointName=self.__model_config['endpoint'].removeprefix("sagemaker://"),
-                Body=json_body,
-                ContentType="application/json",
-            )
-        except Exception as e:
-            logging.error(e)
-            raise EndpointError("Couldn't get a response from endpoint [" + self.__model_config['endpoint'] + ']')
-
-        response_data = json.loads(response["Body"].read().decode("utf-8"))
+        response_data = self.__invoke_endpoint({ "action": "list_clusters" })
         user_cluster = {}
         for one_cluster in response_data['clusters']:
             user_cluster[one_cluster['label']] = one_cluster['userids']
@@ -51,11 +43,28 @@ class ClusteringModelClient:
             }
         }
 
-        json_body = json.dumps(body_dict)
+        response_data = self.__invoke_endpoint(body_dict)
 
+        if not len(response_data):
+            # no users consume mainly this genre at the moment
+            raise UnknownUserError(self.__model_config['endpoint'], genreCategory, {})
+        user_cluster = {}
+        user_cluster[genreCategory] = response_data
+        return user_cluster
+
+    def set_model_config(self, model_config):
+        self.__model_config = model_config
+
+    def __invoke_endpoint(self, body_dict):
+        """Invokes the clustering endpoint, serving responses of the last minutes from the response cache"""
+        json_body = json.dumps(body_dict, sort_keys=True)
+        cache_key = (self.__model_config['endpoint'], json_body)
+        response_data = self.response_cache.get(cache_key)
+        if response_data is not None:
+            return copy.deepcopy(response_data)
 
         try:
-          
+
             logger.info('Invoking clustering endpoint call to [' + self.__model_config['endpoint'] + ']')
 
             response = self._client.invoke_endpoint(
@@ -63,30 +72,10 @@ class ClusteringModelClient:
                 Body=json_body,
                 ContentType="application/json",
             )
-
         except Exception as e:
             logging.error(e)
             raise EndpointError("Couldn't get a response from endpoint [" + self.__model_config['endpoint'] + ']', {})
 
         response_data = json.loads(response["Body"].read().decode("utf-8"))
-
-        if not len(response_data):
-            raise UnknownUserError("Momentan gibt es keine Benutzer, die in erster Linie das Genre [" + genreCategory + "]" + " konsumieren", {})
-        user_cluster = {}
-        user_cluster[genreCategory] = response_data
-        return user_cluster
-
-    def set_model_config(self, model_config):
-        self.__model_config = model_config
-
-    def __get_cross_account_options(self, role_arn):
-        sts_client = boto3client("sts")
-        assumed_role = sts_client.assume_role(
-            RoleArn=role_arn, RoleSessionName="RecoExplorerU2C"
-        )
-        return {
-            "aws_access_key_id": assumed_role["Credentials"]["AccessKeyId"],
-            "aws_secret_access_key": assumed_role["Credentials"]["SecretAccessKey"],
-            "aws_session_token": assumed_role["Credentials"]["SessionToken"],
-            "region_name": "eu-central-1"
-        }
+        self.response_cache.set(cache_key, copy.deepcopy(response_data))
+        return response_data
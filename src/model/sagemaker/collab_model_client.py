@@ -2,9 +2,10 @@ import re
 import logging
 import json
 import constants
+from typing import Any
 
 from model.u2c_seeker import U2CSeeker
-from boto3 import client as boto3client
+from model.sagemaker.aws_clients import get_aws_client
 from botocore.exceptions import ClientError
 from exceptions.endpoint_error import EndpointError
 from exceptions.user_not_found_error import UnknownUserError
@@ -21,12 +22,10 @@ class CollabModelClient(U2CSeeker):
         self.__num_recos = 16
         self.__model_config = {}
  
-        cross_account_options = self.__get_cross_account_options(
-            config[constants.MODEL_CONFIG_U2C][constants.MODEL_TYPE_U2C]['ARD-ALS-Experiments']['role_arn']
+        model_info = config[constants.MODEL_CONFIG_U2C][constants.MODEL_TYPE_U2C]['ARD-ALS-Experiments']
+        self.__sm_run_client = get_aws_client(
+            "sagemaker-runtime", model_info['role_arn'], endpoint_url=model_info.get('endpoint_url')
         )
-        self.__sm_run_client = boto3client("sagemaker-runtime", **cross_account_options)
-        self.__sm_client = boto3client("sagemaker", **cross_account_options)
-        self.__s3_client = boto3client('s3', **cross_account_options)
 
         self.model_properties = {}
         self.step_reports = {
@@ -57,7 +56,7 @@ class CollabModelClient(U2CSeeker):
             )
             response_data = json.loads(response["Body"].read().decode("utf-8"))
             if response_data.get('message', '').startswith("Unknown userId"):
-                raise UnknownUserError("Keine Empfehlungen für den Benutzer [" + user_item.id + "] in diesem Modell", {})
+                raise UnknownUserError(self.__model_config['endpoint'], user_item.id, {})
             reco_ids = [hit['id'] for hit in response_data['recommendations']]
             reco_scores = [hit['score'] for hit in response_data['recommendations']]
             return reco_ids, reco_scores, self.ITEM_IDENTIFIER_PROP
@@ -71,16 +70,4 @@ class CollabModelClient(U2CSeeker):
     def set_model_config(self, model_config):
         self.__model_config = model_config
 
-    def __get_cross_account_options(self, role_arn):
-        sts_client = boto3client("sts")
-        assumed_role = sts_client.assume_role(
-            RoleArn=role_arn, RoleSessionName="RecoExplorerU2C"
-        )
-        return {
-            "aws_access_key_id": assumed_role["Credentials"]["AccessKeyId"],
-            "aws_secret_access_key": assumed_role["Credentials"]["SecretAccessKey"],
-            "aws_session_token": assumed_role["Credentials"]["SessionToken"],
-            "region_name": "eu-central-1"
-        }
-
 
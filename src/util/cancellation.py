@@ -0,0 +1,46 @@
+import contextvars
+import threading
+from concurrent.futures import Executor, Future
+from typing import Any, Callable
+
+from exceptions.search_cancelled_error import SearchCancelledError
+
+
+class CancellationToken:
+    """Marks a search as superseded, so its remaining backend calls are skipped"""
+
+    def __init__(self):
+        self._cancelled = threading.Event()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+
+_current_token: contextvars.ContextVar[CancellationToken | None] = contextvars.ContextVar(
+    "cancellation_token", default=None
+)
+
+
+def run_cancellable(token: CancellationToken, func: Callable, *args) -> Any:
+    """Runs the function with the token as cancellation token of all its stages and backend calls"""
+    reset_token = _current_token.set(token)
+    try:
+        return func(*args)
+    finally:
+        _current_token.reset(reset_token)
+
+
+def submit_with_context(executor: Executor, func: Callable, *args) -> Future:
+    """Submits the function to the executor, keeping the cancellation token of the calling thread"""
+    return executor.submit(contextvars.copy_context().run, func, *args)
+
+
+def raise_if_cancelled() -> None:
+    """Raises a SearchCancelledError if the search running in this context was superseded"""
+    token = _current_token.get()
+    if token is not None and token.cancelled:
+        raise SearchCancelledError("Search was superseded by a newer one", {})
@@ -28,6 +28,9 @@ class ModelDetails:
     role_arn: Optional[str] = None
     user_type: Optional[str] = None
     field_mapping: Optional[dict[str, str]] = None
+    knn_mode: Optional[str] = None
+    knn_exact_max_candidates: Optional[int] = None
+    knn_engine: Optional[str] = None
 
     @classmethod
     def from_dict(cls, data: dict[str, Any]) -> 'ModelDetails':
@@ -70,7 +73,10 @@ class ModelDetails:
             properties=data.get('properties'),
             role_arn=get_optional_str('role_arn'),
             user_type=get_optional_str('user_type'),
-            field_mapping=data.get('field_mapping')
+            field_mapping=data.get('field_mapping'),
+            knn_mode=get_optional_str('knn_mode'),
+            knn_exact_max_candidates=data.get('knn_exact_max_candidates'),
+            knn_engine=get_optional_str('knn_engine')
         )
 
 
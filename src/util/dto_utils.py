@@ -1,4 +1,5 @@
 from dataclasses import dataclass, fields
+from functools import lru_cache
 from dto.item import ItemDto
 from dto.content_item import ContentItemDto
 from dto.show_item import ShowItemDto
@@ -7,6 +8,7 @@ from dto.history_item import HistoryItemDto
 from dto.model_params_item import ModelParametersDto
 from dto.not_found_item import NotFoundDto
 from dto.wdr_content_item import WDRContentItemDto
+import copy
 import logging
 import sys
 
@@ -16,16 +18,44 @@ def content_fields(item: ItemDto) -> set[str]:
     item_props = { f.name for f in fields(item) if f.init and not f.name.startswith('_')  }
     return item_props
 
+@lru_cache(maxsize=None)
+def _field_plan(item_class: type, mapping_items: tuple) -> tuple[tuple[str, str], ...]:
+    field_mapping = dict(mapping_items)
+    return tuple(
+        (f.name, field_mapping.get(f.name, f.name))
+        for f in fields(item_class) if f.init and not f.name.startswith('_')
+    )
+
+def get_field_plan(item_class: type, field_mapping: dict) -> tuple[tuple[str, str], ...]:
+    """Returns the (dto property, source key) pairs to hydrate a dto class, computed once per class and mapping"""
+    return _field_plan(item_class, tuple(sorted(field_mapping.items())))
+
+def get_source_includes(item_class: type, field_mapping: dict) -> list[str]:
+    """Returns the source keys a dto class is hydrated from, to be used as _source includes"""
+    return list(dict.fromkeys(source_key for _, source_key in get_field_plan(item_class, field_mapping)))
+
 def update_from_props(item: ItemDto, database_props: dict, field_mapping: dict) -> ItemDto:
-    item_props = content_fields(item)
-    for prop in item_props:
-        mapped_key = field_mapping.get(prop, prop)
-        if database_props.get(mapped_key):
-            item.__setattr__(prop, database_props[mapped_key])
+    for prop, mapped_key in get_field_plan(type(item), field_mapping):
+        value = database_props.get(mapped_key)
+        if value:
+            setattr(item, prop, value)
         else:
-           logger.debug('Could not find a value for mapped dto property [' + mapped_key + ']')
+           logger.debug('Could not find a value for mapped dto property [%s]', mapped_key)
     return item
 
+def items_from_props(item: ItemDto, database_props_list: list[dict], field_mapping: dict) -> list[ItemDto]:
+    """Hydrates one copy of the template item per source dict, in one pass over a shared field plan"""
+    plan = get_field_plan(type(item), field_mapping)
+    item_dtos = []
+    for database_props in database_props_list:
+        new_item = copy.copy(item)
+        for prop, mapped_key in plan:
+            value = database_props.get(mapped_key)
+            if value:
+                setattr(new_item, prop, value)
+        item_dtos.append(new_item)
+    return item_dtos
+
 def dto_from_classname(class_name: str, position: str, item_type: str, provenance: str) -> ItemDto:
     class_ = getattr(sys.modules[__name__], class_name)
     return class_(_position=position, _item_type=item_type, _provenance=provenance)
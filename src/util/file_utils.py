@@ -1,3 +1,4 @@
+import copy
 import glob
 import logging
 import os
@@ -12,6 +13,7 @@ import constants
 import dataclasses
 
 from exceptions.config_error import ConfigError
+from util.cache_utils import LRUCache
 from view import ui_constants
 from util.dataclasses.setup_configuration_data_class import SetupConfiguration
 from util.dataclasses.model_configuration_data_class import ModelConfiguration
@@ -19,6 +21,31 @@ from util.dataclasses.opensearch_configuration_data_class import OpenSearchConfi
 
 logger = logging.getLogger(__name__)
 
+MODEL_CONFIG_TTL = 300  # seconds the remote model configuration is reused by new sessions
+
+# parsed yaml files per (path, modification time), shared by all sessions of the process
+CONFIG_CACHE = LRUCache(maxsize=64)
+# remote model configurations per (endpoint url, api key)
+MODEL_CONFIG_CACHE = LRUCache(maxsize=16, ttl=MODEL_CONFIG_TTL)
+
+
+def read_yaml(path: str | Path, include_environment: bool = True) -> dict[str, Any]:
+    """
+    Reads and exports a yaml file once per process and file version. Callers get their own
+    copy, so sessions can modify their config without affecting each other.
+
+    :param path: Path of the yaml file
+    :param include_environment: Whether environment variables are included, see EnvYAML
+    :return: Exported yaml content
+    """
+    path = Path(path)
+    key = (str(path.resolve()), path.stat().st_mtime_ns, include_environment)
+    exported = CONFIG_CACHE.get(key)
+    if exported is None:
+        exported = EnvYAML(path, include_environment=include_environment).export()
+        CONFIG_CACHE.set(key, exported)
+    return copy.deepcopy(exported)
+
 
 def get_all_config_files(path) -> list:
     pattern = os.path.dirname(path) + "/" + "config_[a-z]*.yaml"
@@ -70,13 +97,13 @@ def get_client_ident_from_search(search: str) -> str | None:
 
 def get_client_options(all_configs: dict[str, str]) -> dict[str, str]:
     return {
-        EnvYAML(config_path).get("display_name", client.capitalize()): client
+        read_yaml(config_path).get("display_name", client.capitalize()): client
         for client, config_path in all_configs.items()
     }
 
 
 def load_config(full_path: Path) -> dict[str, str]:
-    config = EnvYAML(full_path).export()
+    config = read_yaml(full_path)
 
     return load_ui_config(config, full_path)
 
@@ -97,7 +124,7 @@ def load_ui_config(config: dict[str, str], full_path: Path) -> dict[str, str]:
         logger.warning("UI config file at %s not found.", full_ui_config_path)
         return config
 
-    ui_config = EnvYAML(full_ui_config_path, include_environment=False).export()
+    ui_config = read_yaml(full_ui_config_path, include_environment=False)
     config.update(ui_config)
     return config
 
@@ -113,9 +140,7 @@ def load_deployment_version_config(config: dict[str, str]) -> dict[str, str]:
     """
     version_config = {}
     try:
-        version_config = EnvYAML(
-            "config/wdr/version_information.yaml", include_environment=False
-        ).export()
+        version_config = read_yaml("config/wdr/version_information.yaml", include_environment=False)
     except FileNotFoundError:
         logger.info("No version information yaml found. Only used for dev environment")
 
@@ -150,7 +175,8 @@ def _get_model_config_from_endpoint(config: dict[str, str]) -> dict[str, Any]:
     Fetches the model configuration from a remote API endpoint using the provided
     configuration dictionary. This function verifies the input configuration for
     required keys, constructs the endpoint URL, and performs an HTTP GET request
-    to retrieve the model configuration. Any issues during the HTTP request or
+    to retrieve the model configuration. Responses are reused by all sessions for
+    MODEL_CONFIG_TTL seconds. Any issues during the HTTP request or
     JSON parsing will result in a custom `ConfigError` being raised with specific
     details.
 
@@ -175,6 +201,9 @@ def _get_model_config_from_endpoint(config: dict[str, str]) -> dict[str, Any]:
         raise ConfigError("Missing base URL or API key in configuration.",{})
 
     endpoint_url = _construct_endpoint_url(base_url, config.get("model_config_key"))
+    cached = MODEL_CONFIG_CACHE.get((endpoint_url, api_key))
+    if cached is not None:
+        return copy.deepcopy(cached)
 
     try:
         response = httpx.get(
@@ -182,7 +211,10 @@ def _get_model_config_from_endpoint(config: dict[str, str]) -> dict[str, Any]:
             timeout=10,
             headers={"x-api-key": api_key}
         )
-        return response.json()
+        model_config = response.json()
+        if response.is_success:
+            MODEL_CONFIG_CACHE.set((endpoint_url, api_key), model_config)
+        return copy.deepcopy(model_config)
     except httpx.TimeoutException:
         raise ConfigError(
             "Request to endpoint timed out. Check the network or server status.",
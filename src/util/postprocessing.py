@@ -1,20 +1,113 @@
+import logging
+import threading
+from typing import Any, Callable, Iterable
+
 from dto.item import ItemDto
-import pandas as pd
-from dataclasses import dataclass, asdict
+
+logger = logging.getLogger(__name__)
+
+# option names of the reco_filter remove_duplicate options in the ui config
+DUPLICATE_FILTER_NAMES = (
+    "filterDuplicateCrid",
+    "filterDuplicateDescription",
+    "filterDuplicateImageUrl",
+    "filterDuplicateTitle",
+    "filterDuplicateShow",
+)
+
+# (start item, reco items, item property) -> filtered reco items
+PostProcessor = Callable[[ItemDto, list, str], list]
+
+
+def _hashable(value: Any) -> Any:
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_hashable(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _hashable(v)) for k, v in value.items()))
+    return value
+
+
 class FilterPostproc():
+    """Post-processing of reco items, applied as a chain of post-processors
+
+    The reco_filter remove_duplicate options of the ui config select the chain: each option value is a
+    [post-processor name, item property] pair, e.g. [filterDuplicateCrid, crid]. Post-processors are looked
+    up by name, the duplicate filters of the ui config are registered by default and unknown names are skipped.
+    """
+
+    def __init__(self):
+        self.postprocessors: dict[str, PostProcessor] = {name: self.filterDuplicate for name in DUPLICATE_FILTER_NAMES}
 
-    def filterDuplicates(self, start_item: ItemDto, reco_items: list, parameters):
-        # doesn't work with imageurl, has to be changed to teaserimage
-        for parameter in parameters:
-            all_param_items = []
-            nn_items = []
-            for item in reco_items:
-                if asdict(item)[parameter] not in asdict(start_item)[parameter] and asdict(item)[parameter] not in all_param_items:
-                    all_param_items.append(asdict(item)[parameter])
-                    nn_items.append(item)
+    def register(self, name: str, postprocessor: PostProcessor) -> None:
+        self.postprocessors[name] = postprocessor
+
+    def apply(self, start_item: ItemDto, reco_items: list, chain: Iterable) -> list:
+        """Applies the selected post-processors one after another
+
+        :param start_item: Start item of the row
+        :param reco_items: Reco items in ranking order
+        :param chain: [post-processor name, item property] pairs from the reco filter state
+        :return: Remaining reco items in ranking order
+        """
+        for name, parameter in chain:
+            postprocessor = self.postprocessors.get(name)
+            if postprocessor is None:
+                logger.warning(f"Skipping unknown post-processor [{name}]")
+                continue
+            reco_items = postprocessor(start_item, reco_items, parameter)
+        return reco_items
+
+    def filterDuplicate(self, start_item: ItemDto, reco_items: list, parameter: str) -> list:
+        """Keeps the first reco item per value of the property, dropping items sharing the start item's value
+
+        Items without a value for the property are kept.
+        """
+        seen = {_hashable(getattr(start_item, parameter, None))}
+        nn_items = []
+        for item in reco_items:
+            value = getattr(item, parameter, None)
+            if not value:
+                nn_items.append(item)
+                continue
+            value = _hashable(value)
+            if value not in seen:
+                seen.add(value)
+                nn_items.append(item)
         return nn_items
 
 
+class OverfetchStats:
+    """Tracks per model which share of the fetched reco items survives post-processing
+
+    The over-fetch factor of a model is the inverse of its smoothed hit rate, so models whose rows
+    lose many items to deduplication request more candidates up front.
+    """
+
+    def __init__(self, initial_factor: float = 2.0, max_factor: float = 5.0, smoothing: float = 0.2):
+        self.initial_factor = initial_factor
+        self.max_factor = max_factor
+        self.smoothing = smoothing
+        self._hit_rates: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def get_factor(self, model_key: str) -> float:
+        hit_rate = self._hit_rates.get(model_key)
+        if hit_rate is None:
+            return self.initial_factor
+        return min(max(1.0 / max(hit_rate, 1.0 / self.max_factor), 1.0), self.max_factor)
+
+    def record(self, model_key: str, fetched: int, kept: int) -> None:
+        if fetched < 1:
+            return
+        hit_rate = kept / fetched
+        with self._lock:
+            previous = self._hit_rates.get(model_key)
+            self._hit_rates[model_key] = (
+                hit_rate if previous is None else previous + self.smoothing * (hit_rate - previous))
+
+    def get_hit_rates(self) -> dict[str, float]:
+        with self._lock:
+            return dict(self._hit_rates)
+
 
-    def filterDuplicateImage(df, item):
-        pass
+overfetch_stats = OverfetchStats()
@@ -24,3 +24,21 @@ def retrieve_default_model_accordion(ui_config):
 
     # If not found, return a default value
     return str(1)
+
+
+def retrieve_option_default_columns(ui_config):
+    # collect the item columns multi selects take their options from (option_default),
+    # so their facet values can be loaded together.
+    columns = []
+    pending = list(ui_config.get("blocks", []))
+    while pending:
+        component = pending.pop(0)
+        if isinstance(component, list):
+            pending.extend(component)
+            continue
+        if not isinstance(component, dict):
+            continue
+        if component.get("type") == "multi_select" and isinstance(component.get("option_default"), str):
+            columns.append(component["option_default"])
+        pending.extend(value for value in component.values() if isinstance(value, (list, dict)))
+    return list(dict.fromkeys(columns))
@@ -9,7 +9,9 @@ from controller.reco_controller import RecommendationController
 from exceptions.date_validation_error import DateValidationError
 from exceptions.empty_search_error import EmptySearchError
 from exceptions.model_validation_error import ModelValidationError
-from util.ui_utils import retrieve_default_model_accordion
+from exceptions.search_cancelled_error import SearchCancelledError
+from util.cancellation import CancellationToken, run_cancellable
+from util.ui_utils import retrieve_default_model_accordion, retrieve_option_default_columns
 from util.dto_utils import dto_from_classname
 from util.file_utils import (get_client_options, )
 from view import ui_constants
@@ -48,6 +50,9 @@ class RecoExplorerApp:
         self.config_full_paths = config_full_paths
         self.config_full_path = config_full_paths[client]
         self.controller = RecommendationController(self.config, self.client)
+        # token of the latest search, superseded searches get cancelled
+        self.search_token = None
+        self.controller.register_item_defaults(retrieve_option_default_columns(self.config.get("ui_config", {})))
 
         self.widgets = {
 
@@ -658,62 +663,139 @@ class RecoExplorerApp:
             sidebar.append(version_widget)
         return sidebar
 
+    def get_diagnostics_and_append_to_sidebar(self, sidebar):
+        """
+        Method to append a panel with the hit rates of the process-wide caches to the sidebar.
+        Only used if diagnostics is enabled in the ui config.
+
+        :param sidebar: The sidebar to append the diagnostics panel.
+        :return: The updated sidebar.
+        """
+        if not self.get_ui_config_value(ui_constants.UI_CONFIG_DIAGNOSTICS_KEY, False):
+            return sidebar
+        cache_stats = pn.pane.Markdown(self.format_cache_stats())
+        refresh_button = pn.widgets.Button(name="Aktualisieren", width=100)
+        refresh_button.on_click(lambda event: setattr(cache_stats, "object", self.format_cache_stats()))
+        sidebar.append(pn.layout.Divider())
+        sidebar.append(pn.Card(cache_stats, refresh_button, title="Diagnose", collapsed=True))
+        return sidebar
+
+    def format_cache_stats(self) -> str:
+        rows = ["| Cache | Einträge | Treffer | Trefferquote |", "| --- | --- | --- | --- |"]
+        for name, stats in self.controller.get_cache_stats().items():
+            rows.append(f"| {name} | {stats['size']} / {stats['maxsize']} | {stats['hits']} / "
+                        f"{stats['hits'] + stats['misses']} | {stats['hit_ratio']:.0%} |")
+        return "\n".join(rows)
+
+    def loading_row(self) -> pn.Row:
+        return pn.Row(
+            pn.indicators.LoadingSpinner(value=True, width=25, height=25, align="center", margin=(5, 0, 5, 10), ))
+
+    def remove_loading_rows(self, placeholders: list[pn.Row]) -> None:
+        self.main_content[:] = [obj for obj in self.main_content if not any(obj is p for p in placeholders)]
+
     async def get_items_with_parameters(self):
         """
-        Calls the actual search function in controller to get results for query
+        Calls the actual search function in controller to get results for query.
+        Rows are drawn one by one as their recommendations arrive, pending rows show a spinner.
         """
-        self.main_content[:] = [pn.Row(
-            pn.indicators.LoadingSpinner(value=True, width=25, height=25, align="center", margin=(5, 0, 5, 10), ))]
+        placeholders = [self.loading_row()]
+        self.main_content[:] = placeholders
         self.pagination_top[:] = []
 
+        if self.search_token is not None:
+            self.search_token.cancel()
+        self.search_token = token = CancellationToken()
+
         self.__in_flight_counter += 1
+        item_rows = None
         try:
-            models, items, config = await asyncio.to_thread(self.controller.get_items)
-
+            models, config, num_rows, item_rows = await asyncio.to_thread(
+                run_cancellable, token, self.controller.get_items_stream)
+            placeholders = [self.loading_row() for _ in range(num_rows)]
+            self.main_content[:] = placeholders
+            while (row := await asyncio.to_thread(run_cancellable, token, next, item_rows, None)) is not None:
+                if token.cancelled:
+                    return
+                idx, item_row = row
+                self.main_content[idx] = self.add_cards_row(models, config, idx, item_row)
+            # rows without result, e.g. models without start item
+            self.remove_loading_rows(placeholders)
+
+        except SearchCancelledError:
+            logger.info("Search was superseded by a newer one")
+            return
         except (EmptySearchError, ModelValidationError) as e:
+            self.remove_loading_rows(placeholders)
             self.main_content.append(pn.pane.Alert(str(e), alert_type="warning"))
             return
         except DateValidationError as e:
+            self.remove_loading_rows(placeholders)
             logger.info(str(e))
             return
         except Exception as e:
+            self.remove_loading_rows(placeholders)
             self.main_content.append(pn.pane.Alert(str(e), alert_type="danger"))
             logger.warning(traceback.print_exc())
             return
         finally:
             self.__in_flight_counter -= 1
+            # rows of a superseded search are dropped, closing shuts down their lookups off the event loop
+            if item_rows is not None:
+                await asyncio.to_thread(item_rows.close)
 
         if self.__in_flight_counter:
             return
 
-        self.main_content[:] = [self.add_cards_row(models, config, idx, row) for idx, row in enumerate(items)]
         self.draw_pagination()
         self.disablePageButtons()
+        # most users page forward, so the next page is fetched while this one is looked at
+        self.controller.prefetch_next_page()
 
     def add_cards_row(self, models: list[Any], config: str, idx: int, row: list[Any]) -> pn.Row:
-        start_card = None
-        reco_cards = []
-        for idz, item_dto in enumerate(row):
-            card = self.controller.get_item_viewer(item_dto, self)
-            if self.controller.get_display_mode() == constants.DISPLAY_MODE_SINGLE:
+        """
+        Only the start card and the cards of the first page are drawn up front, the cards of further pages are
+        drawn when they are navigated to and kept for navigating back.
+
+        :param models: list, models of the displayed rows
+        :param config: str, model config the rows were fetched with
+        :param idx: int, index of the row
+        :param row: list, start item dto followed by the reco item dtos
+        :return: pn.Row, row with the cards and the navigation buttons
+        """
+        model = models[0] if self.controller.get_display_mode() == constants.DISPLAY_MODE_SINGLE else models[idx]
 
-                displayed_card = card.draw(item_dto, idz, models[0], config, self.trigger_modal)
-            else:
-                displayed_card = card.draw(item_dto, idz, models[idx], config, self.trigger_modal)
-            if idz == 0:
-                start_card = displayed_card
-            else:
-                reco_cards.append(displayed_card)
-        cards_row = pn.Row(start_card, *reco_cards[: self.page_size])
-        row_with_navigation_buttons = self.create_navigation_elements_for_cards_row(cards_row, start_card, reco_cards)
+        def draw_card(idz: int) -> pn.layout.card.Card:
+            item_dto = row[idz]
+            card = self.controller.get_item_viewer(item_dto, self)
+            return card.draw(item_dto, idz, model, config, self.trigger_modal)
+
+        start_card = draw_card(0)
+        # one slot per reco item, filled once the card got drawn
+        reco_cards = [None] * (len(row) - 1)
+        widgets_in_row = {"start_card": start_card, "reco_cards": reco_cards, "draw_card": draw_card, }
+        cards_row = pn.Row(start_card, *self._get_reco_cards(widgets_in_row, 0, self.page_size))
+        row_with_navigation_buttons = self.create_navigation_elements_for_cards_row(cards_row, widgets_in_row)
         return pn.Row(pn.Column(cards_row, row_with_navigation_buttons))
 
-    def create_navigation_elements_for_cards_row(self, cards_row: pn.Row, start_card: pn.layout.card.Card,
-            reco_cards: list) -> pn.Row:
+    @staticmethod
+    def _get_reco_cards(widgets: dict[any], start: int, end: int) -> list:
+        """
+        :param widgets: Dictionary containing the reco card slots and the draw function of the row
+        :param start: Index of the first reco card
+        :param end: Index after the last reco card
+        :return: Reco cards of the slice, drawing the ones not drawn yet
+        """
+        reco_cards = widgets["reco_cards"]
+        for idz in range(start, min(end, len(reco_cards))):
+            if reco_cards[idz] is None:
+                reco_cards[idz] = widgets["draw_card"](idz + 1)
+        return reco_cards[start:end]
+
+    def create_navigation_elements_for_cards_row(self, cards_row: pn.Row, widgets_in_row: dict[any]) -> pn.Row:
         """
         :param cards_row: pn.Row, the parent row containing the card elements to navigate through
-        :param start_card: pn.layout.card.Card, the card element at the start
-        :param reco_cards: list, list of recommended card elements
+        :param widgets_in_row: dict, the start card, the reco card slots and the draw function of the row
         :return: pn.Row, row with navigation buttons for navigating through the cards
         """
         prev_button = pn.widgets.Button(name=f"{ui_constants.LEFT_ARROW}", width=100)
@@ -721,14 +803,18 @@ class RecoExplorerApp:
         next_button = pn.widgets.Button(name=f"{ui_constants.RIGHT_ARROW}", width=100)
         row_with_navigation_buttons = pn.Row(prev_button, pn.Spacer(), next_button, )
 
-        widgets_in_row = {"cards_row": cards_row, "start_card": start_card, "reco_cards": reco_cards,
-            "page_size": self.page_size, "prev_button": prev_button, "next_button": next_button, }
+        widgets_in_row.update({"cards_row": cards_row, "page_size": self.page_size, "prev_button": prev_button,
+            "next_button": next_button, })
 
         prev_button.on_click(functools.partial(self._update_prev, widgets=widgets_in_row))
         next_button.on_click(functools.partial(self._update_next, widgets=widgets_in_row))
 
         return row_with_navigation_buttons
 
+    def _show_reco_cards(self, widgets: dict[any]):
+        visible_cards = self._get_reco_cards(widgets, widgets["page_size"] - self.page_size, widgets["page_size"])
+        widgets["cards_row"].objects = [widgets["start_card"], *visible_cards, ]
+
     def _update_next(self, event, widgets: dict[any]):
         """
         :param event: Event that triggers the update
@@ -736,13 +822,12 @@ class RecoExplorerApp:
         :return: None
 
         This method updates the next page of cards based on the current page size. If the page size is smaller than the length
-        of the cards list, it adjusts the page size and updates the cards to display the next set of cards. Finally, it toggles
-        the 'next_button' and 'prev_button' widgets based on the new page size.
+        of the cards list, it adjusts the page size and updates the cards to display the next set of cards, drawing the
+        ones not drawn yet. Finally, it toggles the 'next_button' and 'prev_button' widgets based on the new page size.
         """
         if widgets["page_size"] < len(widgets["reco_cards"]):
             widgets["page_size"] += self.page_size
-            widgets["cards_row"].objects = [widgets["start_card"],
-                *widgets["reco_cards"][widgets["page_size"] - self.page_size: widgets["page_size"]], ]
+            self._show_reco_cards(widgets)
         widgets["prev_button"].disabled = False
         widgets["next_button"].disabled = (widgets["page_size"] + self.page_size) > len(widgets["reco_cards"])
 
@@ -758,8 +843,7 @@ class RecoExplorerApp:
         """
         if widgets["page_size"] > self.page_size:
             widgets["page_size"] -= self.page_size
-            widgets["cards_row"].objects = [widgets["start_card"],
-                *widgets["reco_cards"][widgets["page_size"] - self.page_size: widgets["page_size"]], ]
+            self._show_reco_cards(widgets)
         widgets["next_button"].disabled = False
         widgets["prev_button"].disabled = widgets["page_size"] <= self.page_size
 
@@ -783,6 +867,7 @@ class RecoExplorerApp:
         sidebar = self.config_based_nav_controls
 
         sidebar = self.get_version_information_and_append_to_sidebar(sidebar)
+        sidebar = self.get_diagnostics_and_append_to_sidebar(sidebar)
 
         # finally add onload, check if url parameter are defined in config and link to widgets
         pn.state.onload(self.update_widgets_from_url_parameter)
@@ -19,7 +19,12 @@ class ContentCard:
     ):
         self.config = config
         self.reco_explorer_app_instance = reco_explorer_app_instance
-        self.controller = RecommendationController(self.config)
+        # share the session's controller instead of building one (and its handlers) per card
+        self.controller = (
+            reco_explorer_app_instance.controller
+            if reco_explorer_app_instance is not None
+            else RecommendationController(self.config)
+        )
         self.card_height = height if height is not None else 600
         self.card_width = width if width is not None else 300
         self.card_image_height = image_height if width is not None else 75
@@ -10,7 +10,7 @@ class ContentHistoryCard(ContentCard):
 
     def draw(self, content_dto: ContentItemDto, nr, model):
         child_objects = [
-            pn.pane.HTML(f"""<img style="height: { self.card_image_height }px; display: block; margin-left: auto; margin-right: auto; align:center" src={content_dto.teaserimage}></img>"""),
+            pn.pane.HTML(f"""<img loading="lazy" style="height: { self.card_image_height }px; display: block; margin-left: auto; margin-right: auto; align:center" src={content_dto.teaserimage}></img>"""),
             pn.pane.Markdown(f""" ### Video {nr} """)
         ]
 
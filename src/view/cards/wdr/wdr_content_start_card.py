@@ -101,8 +101,8 @@ class WDRContentStartCard(WDRContentCard):
                      """
         teaserimage = pn.pane.HTML(f"""
                      <div class="img_wrapper">
-                         <img class="blurred_background" src={content_dto.teaserimage}>
-                         <img class="teaser_image" src={content_dto.teaserimage}>
+                         <img class="blurred_background" loading="lazy" src={content_dto.teaserimage}>
+                         <img class="teaser_image" loading="lazy" src={content_dto.teaserimage}>
                          <div class="duration_label">
                              <span>{(content_dto.duration / 60):.0f} Min.</span>
                          </div>
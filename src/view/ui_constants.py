@@ -7,6 +7,7 @@ UI_CONFIG_LOGO_KEY = "logo"
 UI_CONFIG_HEADER_BACKGROUND_COLOR_KEY = "header_background"
 UI_CONFIG_PAGE_SIZE_KEY = "page_size"
 UI_CONFIG_CUSTOM_CSS_KEY = "custom_css"
+UI_CONFIG_DIAGNOSTICS_KEY = "diagnostics"
 UI_CONFIG_PAGE_SIZE_KEY = "page_size"
 FALLBACK_UI_PAGE_SIZE_VALUE = 4
 
@@ -1,7 +1,12 @@
+import threading
 from collections import namedtuple
 import pytest
 from src import constants
-from src.controller.reco_controller import RecommendationController
+from src.controller.reco_controller import RecommendationController, SearchCancelledError, UnknownItemEmbeddingError
+from src.controller.RefinementWidgetManger.NoRefinementWidgetRequestManger import NoRefinementWidgetRequestManger
+from src.controller.reco_result_cache import RecoResultCache
+from src.dto.content_item import ContentItemDto
+from src.util.postprocessing import OverfetchStats
 
 
 @pytest.fixture
@@ -33,7 +38,429 @@ def test_increasing_page_number_succeeds(controller: RecommendationController) -
     assert controller.get_page_number() == 2
 
 
+def get_item_rows(controller: RecommendationController, model_info: dict, start_items: list) -> list[list]:
+    item_rows = controller._iter_item_rows([(model_info, start_items, controller.reco_accessor, controller.item_accessor)])
+    return controller._collect_item_rows(item_rows, len(start_items))
+
+
 def test_get_start_components_succeeds(controller: RecommendationController) -> None:
     component = controller._get_active_start_components()
     assert isinstance(component, list)
     assert component
+
+
+def test_get_reco_items_for_start_items__batched(controller: RecommendationController, mocker) -> None:
+    start_items = [
+        ContentItemDto(_position="start", _item_type="content", _provenance="c2c", id=id)
+        for id in ["s1", "s2"]
+    ]
+    reco_items = [
+        ContentItemDto(_position="reco", _item_type="content", _provenance="c2c", id=id)
+        for id in ["r1", "r2"]
+    ]
+    controller.num_NN = 2
+    # stateful refinement is never batched
+    controller.refinement_widget = NoRefinementWidgetRequestManger()
+    controller.reco_accessor = mocker.Mock()
+    controller.reco_accessor.get_k_NN_many.return_value = [
+        (["s1", "r1", "r2"], [1.0, 0.9, 0.8], "id"),
+        UnknownItemEmbeddingError("no embedding", {}),
+    ]
+    controller.item_accessor = mocker.Mock()
+    controller.item_accessor.get_items_by_ids_many.return_value = [reco_items, []]
+
+    rows = get_item_rows(controller,
+        {"display_name": "test", "content_type": "ContentItemDto"}, start_items
+    )
+
+    controller.reco_accessor.get_k_NN.assert_not_called()
+    args = controller.reco_accessor.get_k_NN_many.call_args.args
+    assert args[0] == start_items
+    assert args[1] == 3
+    assert controller.item_accessor.get_items_by_ids_many.call_args.args[1] == [["r1", "r2"], []]
+    assert rows[0] == [start_items[0], *reco_items]
+    assert [item.dist for item in rows[0][1:]] == [0.9, 0.8]
+    assert rows[1][0] is start_items[1]
+    assert type(rows[1][1]).__name__ == "NotFoundDto"
+
+
+def test_get_reco_items_for_start_items__concurrent_lookups_keep_order(
+    controller: RecommendationController, mocker
+) -> None:
+    start_items = [
+        ContentItemDto(_position="start", _item_type="content", _provenance="c2c", id=id)
+        for id in ["s1", "s2", "s3"]
+    ]
+    barrier = threading.Barrier(len(start_items), timeout=5)
+    # stateful refinement runs lookups one by one
+    controller.refinement_widget = NoRefinementWidgetRequestManger()
+
+    def get_k_nn(start_item, k, reco_filter):
+        # every lookup waits for the others, so this only passes if they run concurrently
+        barrier.wait()
+        return [start_item.id, "r_" + start_item.id], [1.0, 0.5], "id"
+
+    def get_items_by_ids(item_dto, ids, model_type):
+        return [
+            ContentItemDto(_position="reco", _item_type="content", _provenance="c2c", id=id)
+            for id in ids
+        ], len(ids)
+
+    controller.reco_accessor = mocker.Mock(spec=["set_model_config", "get_k_NN"])
+    controller.reco_accessor.get_k_NN.side_effect = get_k_nn
+    controller.item_accessor = mocker.Mock(spec=["get_items_by_ids"])
+    controller.item_accessor.get_items_by_ids.side_effect = get_items_by_ids
+
+    rows = get_item_rows(controller,
+        {"display_name": "test", "content_type": "ContentItemDto"}, start_items
+    )
+
+    assert [[item.id for item in row] for row in rows] == [
+        ["s1", "r_s1"],
+        ["s2", "r_s2"],
+        ["s3", "r_s3"],
+    ]
+
+
+def test_get_reco_items_for_start_items__stateful_refinement_does_not_interleave(
+    controller: RecommendationController, mocker
+) -> None:
+    start_items = [
+        ContentItemDto(_position="start", _item_type="content", _provenance="c2c", id=id)
+        for id in ["s1", "s2", "s3"]
+    ]
+    calls = []
+    prepare_request = controller.refinement_widget.prepare_request
+    process_response = controller.refinement_widget.process_response
+
+    def prepare(reco_filter, current_ref_id):
+        calls.append(("prepare", current_ref_id))
+        return prepare_request(reco_filter, current_ref_id)
+
+    def process(ids, utilities):
+        calls.append(("process", ids[0]))
+        return process_response(ids, utilities)
+
+    mocker.patch.object(controller.refinement_widget, "prepare_request", side_effect=prepare)
+    mocker.patch.object(controller.refinement_widget, "process_response", side_effect=process)
+    controller.reco_accessor = mocker.Mock(spec=["set_model_config", "get_k_NN", "get_k_NN_many"])
+    controller.reco_accessor.get_k_NN.side_effect = lambda start_item, k, reco_filter: (
+        [start_item.id, "r_" + start_item.id], [1.0, 0.5], "id")
+    controller.item_accessor = mocker.Mock(spec=["get_items_by_ids", "get_items_by_ids_many"])
+    controller.item_accessor.get_items_by_ids.side_effect = lambda item_dto, ids, model_type: ([
+        ContentItemDto(_position="reco", _item_type="content", _provenance="c2c", id=id) for id in ids], len(ids))
+
+    get_item_rows(controller,
+        {"display_name": "test", "content_type": "ContentItemDto"}, start_items
+    )
+
+    controller.reco_accessor.get_k_NN_many.assert_not_called()
+    # every request is processed before the next one is prepared
+    assert len(calls) == 6
+    assert all(calls[i][1] == calls[i + 1][1] for i in range(0, len(calls), 2))
+
+
+def test_iter_item_rows__yields_rows_as_they_complete(controller: RecommendationController, mocker) -> None:
+    start_items = [
+        ContentItemDto(_position="start", _item_type="content", _provenance="c2c", id=id)
+        for id in ["slow", "fast"]
+    ]
+    fast_done = threading.Event()
+    controller.refinement_widget = NoRefinementWidgetRequestManger()
+
+    def get_k_nn(start_item, k, reco_filter):
+        if start_item.id == "slow":
+            assert fast_done.wait(timeout=5)
+        return ["r_" + start_item.id], [0.5], "id"
+
+    def get_items_by_ids(item_dto, ids, model_type):
+        return [ContentItemDto(_position="reco", _item_type="content", _provenance="c2c", id=id) for id in ids], 1
+
+    reco_accessor = mocker.Mock(spec=["set_model_config", "get_k_NN"])
+    reco_accessor.get_k_NN.side_effect = get_k_nn
+    item_accessor = mocker.Mock(spec=["get_items_by_ids"])
+    item_accessor.get_items_by_ids.side_effect = get_items_by_ids
+    model_info = {"display_name": "test", "content_type": "ContentItemDto"}
+
+    rows = controller._iter_item_rows([(model_info, start_items, reco_accessor, item_accessor)])
+
+    idx, row = next(rows)
+    assert (idx, [item.id for item in row]) == (1, ["fast", "r_fast"])
+    fast_done.set()
+    idx, row = next(rows)
+    assert (idx, [item.id for item in row]) == (0, ["slow", "r_slow"])
+    assert next(rows, None) is None
+
+
+def test_iter_item_rows__close_does_not_wait_for_pending_lookups(controller: RecommendationController, mocker) -> None:
+    start_items = [
+        ContentItemDto(_position="start", _item_type="content", _provenance="c2c", id=id)
+        for id in ["slow", "fast"]
+    ]
+    slow_release = threading.Event()
+    controller.refinement_widget = NoRefinementWidgetRequestManger()
+    controller.reco_result_cache = RecoResultCache()
+
+    def get_k_nn(start_item, k, reco_filter):
+        if start_item.id == "slow":
+            assert slow_release.wait(timeout=5)
+        return ["r_" + start_item.id], [0.5], "id"
+
+    reco_accessor = mocker.Mock(spec=["set_model_config", "get_k_NN"])
+    reco_accessor.get_k_NN.side_effect = get_k_nn
+    item_accessor = mocker.Mock(spec=["get_items_by_ids"])
+    item_accessor.get_items_by_ids.side_effect = lambda item_dto, ids, model_type: (
+        [ContentItemDto(_position="reco", _item_type="content", _provenance="c2c", id=id) for id in ids], 1)
+    model_info = {"display_name": "test", "content_type": "ContentItemDto"}
+
+    rows = controller._iter_item_rows([(model_info, start_items, reco_accessor, item_accessor)])
+    assert next(rows)[0] == 1
+
+    closer = threading.Thread(target=rows.close)
+    closer.start()
+    closer.join(timeout=1)
+    closed_while_pending = not closer.is_alive()
+    slow_release.set()
+    closer.join()
+
+    assert closed_while_pending
+
+
+def test_get_reco_items_for_start_items__refills_deduplicated_rows(
+    controller: RecommendationController, mocker
+) -> None:
+    start_item = ContentItemDto(_position="start", _item_type="content", _provenance="c2c", id="s1", crid="c0")
+    MockComponent = namedtuple("component", ["params", "value"])
+    controller.components["reco_filter"] = {
+        "remove_duplicate": MockComponent({"label": "remove_duplicate"}, [["filterDuplicateCrid", "crid"]])
+    }
+    controller.overfetch_stats = OverfetchStats(initial_factor=1.0)
+    controller.num_NN = 2
+    controller.refinement_widget = NoRefinementWidgetRequestManger()
+    # every second neighbour shares the crid of its predecessor
+    neighbours = ["r" + str(i) for i in range(12)]
+
+    def get_k_nn(item, k, reco_filter):
+        return neighbours[:k], [1.0 - i / 100 for i in range(k)], "id"
+
+    controller.reco_accessor = mocker.Mock(spec=["set_model_config", "get_k_NN"])
+    controller.reco_accessor.get_k_NN.side_effect = get_k_nn
+    controller.item_accessor = mocker.Mock(spec=["get_items_by_ids"])
+    controller.item_accessor.get_items_by_ids.side_effect = lambda item_dto, ids, model_type: ([
+        ContentItemDto(_position="reco", _item_type="content", _provenance="c2c", id=id, crid="c" + str(int(id[1:]) // 2))
+        for id in ids
+    ], len(ids))
+
+    rows = get_item_rows(controller,
+        {"display_name": "test", "content_type": "ContentItemDto"}, [start_item]
+    )
+
+    assert [call.args[1] for call in controller.reco_accessor.get_k_NN.call_args_list] == [3, 6]
+    assert [item.id for item in rows[0][1:]] == ["r2", "r4"]
+    assert [item.dist for item in rows[0][1:]] == [0.98, 0.96]
+    assert 0 < controller.overfetch_stats.get_hit_rates()["test"] < 1
+    assert controller.overfetch_stats.get_factor("test") > 1
+
+
+def test_get_reco_items_for_start_items__does_not_refill_stateful_rows(
+    controller: RecommendationController, mocker
+) -> None:
+    start_item = ContentItemDto(_position="start", _item_type="content", _provenance="c2c", id="s1", crid="cx")
+    MockComponent = namedtuple("component", ["params", "value"])
+    controller.components["reco_filter"] = {
+        "remove_duplicate": MockComponent({"label": "remove_duplicate"}, [["filterDuplicateCrid", "crid"]])
+    }
+    controller.overfetch_stats = OverfetchStats(initial_factor=1.0)
+    controller.num_NN = 2
+    neighbours = ["r" + str(i) for i in range(12)]
+
+    controller.reco_accessor = mocker.Mock(spec=["set_model_config", "get_k_NN"])
+    controller.reco_accessor.get_k_NN.side_effect = lambda item, k, reco_filter: (
+        neighbours[:k], [1.0 - i / 100 for i in range(k)], "id")
+    controller.item_accessor = mocker.Mock(spec=["get_items_by_ids"])
+    controller.item_accessor.get_items_by_ids.side_effect = lambda item_dto, ids, model_type: ([
+        ContentItemDto(_position="reco", _item_type="content", _provenance="c2c", id=id, crid="c" + str(int(id[1:]) // 2))
+        for id in ids
+    ], len(ids))
+
+    rows = get_item_rows(controller,
+        {"display_name": "test", "content_type": "ContentItemDto"}, [start_item]
+    )
+
+    # the wdr refinement manager is stateful, so the short row is shown as it is
+    assert controller.reco_accessor.get_k_NN.call_count == 1
+    assert [item.id for item in rows[0][1:]] == ["r0"]
+
+
+def test_get_items__multi_model_reuses_handlers_per_model(controller: RecommendationController, mocker) -> None:
+    model_infos = {
+        name: {"display_name": name, "handler": name, "content_type": "ContentItemDto"}
+        for name in ["model_a", "model_b"]
+    }
+    controller.config["c2c_config"] = {constants.MODEL_TYPE_C2C: model_infos}
+    controller.model_config = "c2c_config"
+    controller.selected_models = ["model_a", "model_b"]
+    controller.display_mode = constants.DISPLAY_MODE_MULTI
+    controller.num_items = 1
+    mocker.patch.object(controller, "set_mode")
+
+    reco_accessors = {name: mocker.Mock(spec=["set_model_config", "get_k_NN"]) for name in model_infos}
+    for name, reco_accessor in reco_accessors.items():
+        reco_accessor.get_k_NN.return_value = (["r_" + name], [0.5], "id")
+    mocker.patch.object(controller, "_create_reco_accessor", side_effect=lambda info: reco_accessors[info["handler"]])
+    controller.item_accessor = mocker.Mock(spec=["get_items_by_ids"])
+    controller.item_accessor.get_items_by_ids.side_effect = lambda item_dto, ids, model_type: ([
+        ContentItemDto(_position="reco", _item_type="content", _provenance="c2c", id=id) for id in ids
+    ], len(ids))
+    mocker.patch.object(controller, "_get_start_items", side_effect=lambda info, item_accessor: (2, [
+        ContentItemDto(_position="start", _item_type="content", _provenance="c2c", id="s_" + info["handler"] + str(i))
+        for i in range(2)
+    ]))
+
+    models, rows, _ = controller.get_items()
+
+    assert models == ["model_a", "model_b"]
+    assert [[item.id for item in row] for row in rows] == [["s_model_a0", "r_model_a"], ["s_model_b0", "r_model_b"]]
+    # only the displayed first row of every model is looked up
+    assert all(reco_accessor.get_k_NN.call_count == 1 for reco_accessor in reco_accessors.values())
+
+
+def test_get_reco_items_by_field__realigns_dists_for_misses(controller: RecommendationController, mocker) -> None:
+    controller.config["opensearch"] = {"primary_field": "externalid", "field_mapping": {"externalid": "externalid"}}
+    controller.num_NN = 2
+    found = [
+        ContentItemDto(_position="reco", _item_type="content", _provenance="c2c", id=id)
+        for id in ["1", "3"]
+    ]
+    item_accessor = mocker.Mock(spec=["get_items_by_field_values"])
+    item_accessor.get_items_by_field_values.return_value = {"c": found[1], "a": found[0]}
+    item_dto = ContentItemDto(_position="reco", _item_type="content", _provenance="c2c")
+
+    items, dists = controller._get_reco_items_by_field(
+        item_dto, ["a", "b", "c"], [0.9, 0.8, 0.7], item_accessor
+    )
+
+    item_accessor.get_items_by_field_values.assert_called_once_with(item_dto, ["a", "b", "c"], "externalid")
+    assert items == found
+    assert dists == [0.9, 0.7]
+
+
+def test_prefetch_next_page__serves_page_until_search_state_changes(
+        controller: RecommendationController, mocker) -> None:
+    Component = namedtuple("component", ["value", "visible", "params"])
+    controller.components["reco_filter"] = {"genre": Component([], True, {"label": "genre"})}
+    controller.refinement_widget = NoRefinementWidgetRequestManger()
+    controller.num_pages = 3
+    controller.selected_models = ["model_a"]
+    controller.display_mode = constants.DISPLAY_MODE_MULTI
+    mocker.patch.object(controller, "set_mode")
+    mocker.patch.object(controller, "_get_model_handlers", return_value=[({"display_name": "A"}, None, None)])
+    get_lookups = mocker.patch.object(controller, "_get_lookups", side_effect=lambda handlers, display_mode: (
+        3, [(handlers[0][0], ["page" + str(controller.get_page_number())], None, None)]))
+    mocker.patch.object(controller, "_iter_item_rows", side_effect=lambda lookups: iter([(0, lookups[0][1])]))
+
+    controller.prefetch_next_page()
+    controller.increase_page_number()
+    models, _, num_rows, item_rows = controller.get_items_stream()
+
+    assert (models, num_rows, list(item_rows)) == (["model_a"], 1, [(0, ["page2"])])
+    assert get_lookups.call_count == 1
+    assert controller.get_page_number() == 2
+
+    controller.prefetch_next_page()
+    controller.prefetched_pages.values()[-1][1].result()
+    controller.increase_page_number()
+    controller.components["reco_filter"]["genre"] = Component(["Sport"], True, {"label": "genre"})
+
+    assert controller._get_prefetched_items() is None
+
+
+def test_prefetch_next_page__does_not_change_controller_state(controller: RecommendationController, mocker) -> None:
+    controller.refinement_widget = NoRefinementWidgetRequestManger()
+    controller.reco_result_cache = RecoResultCache()
+    controller.num_pages = 3
+    controller.selected_models = ["model_a"]
+    controller.display_mode = constants.DISPLAY_MODE_SINGLE
+    model_info = {"display_name": "A", "content_type": "ContentItemDto"}
+    reco_accessor = mocker.Mock(spec=["set_model_config", "get_k_NN"])
+    reco_accessor.get_k_NN.side_effect = lambda start_item, k, reco_filter: (["r_" + start_item.id], [0.5], "id")
+    item_accessor = mocker.Mock(spec=["get_items_by_ids"])
+    item_accessor.get_items_by_ids.side_effect = lambda item_dto, ids, model_type: (
+        [ContentItemDto(_position="reco", _item_type="content", _provenance="c2c", id=id) for id in ids], 1)
+    mocker.patch.object(controller, "_get_model_handlers", return_value=[(model_info, reco_accessor, item_accessor)])
+    mocker.patch.object(controller, "_get_start_items", side_effect=lambda info, accessor: (30, [
+        ContentItemDto(_position="start", _item_type="content", _provenance="c2c",
+                       id="p" + str(controller.get_page_number()))]))
+    active_accessors = (controller.reco_accessor, controller.item_accessor)
+
+    controller.prefetch_next_page()
+    # a search started meanwhile switches the model
+    controller.selected_models = ["model_b"]
+    controller.display_mode = constants.DISPLAY_MODE_MULTI
+    models, rows, model_config = controller.prefetched_pages.values()[-1][1].result()
+
+    assert (models, [[item.id for item in row] for row in rows]) == (["A"], [["p2", "r_p2"]])
+    assert (controller.reco_accessor, controller.item_accessor) == active_accessors
+    assert (controller.num_pages, controller.get_page_number()) == (3, 1)
+
+
+def test_prefetch_next_page__drops_result_if_filter_changed_while_running(
+        controller: RecommendationController, mocker) -> None:
+    Component = namedtuple("component", ["value", "visible", "params"])
+    controller.components["reco_filter"] = {"genre": Component([], True, {"label": "genre"})}
+    controller.refinement_widget = NoRefinementWidgetRequestManger()
+    controller.num_pages = 3
+    controller.selected_models = ["model_a"]
+    controller.display_mode = constants.DISPLAY_MODE_MULTI
+    mocker.patch.object(controller, "_get_model_handlers", return_value=[({"display_name": "A"}, None, None)])
+
+    def get_lookups(handlers, display_mode):
+        # the user picks a filter while the start items are fetched
+        controller.components["reco_filter"]["genre"] = Component(["Sport"], True, {"label": "genre"})
+        return 3, [(handlers[0][0], ["page2"], None, None)]
+
+    mocker.patch.object(controller, "_get_lookups", side_effect=get_lookups)
+    mocker.patch.object(controller, "_iter_item_rows", side_effect=lambda lookups: iter([(0, lookups[0][1])]))
+
+    controller.prefetch_next_page()
+    with pytest.raises(SearchCancelledError):
+        controller.prefetched_pages.values()[-1][1].result()
+    # the user resets the filter, the rows fetched with the other filter are not served
+    controller.components["reco_filter"]["genre"] = Component([], True, {"label": "genre"})
+    controller.increase_page_number()
+
+    assert controller._get_prefetched_items() is None
+
+
+def test_get_k_NN__shares_results_unless_refinement_is_stateful(
+        controller: RecommendationController, mocker) -> None:
+    controller.reco_result_cache = RecoResultCache()
+    reco_accessor = mocker.Mock(spec=["get_k_NN", "get_k_NN_many", "get_index_version"])
+    reco_accessor.get_k_NN.return_value = (["a", "b"], [0.9, 0.8], "id")
+    reco_accessor.get_k_NN_many.side_effect = lambda items, k, filters: [
+        (["n_" + item.id], [0.5], "id") for item in items]
+    reco_accessor.get_index_version.return_value = "index_v1"
+    model = {"endpoint": "opensearch://embedding_01"}
+    start_item = ContentItemDto(_position="start", _item_type="content", _provenance="c2c", id="s1")
+    other_item = ContentItemDto(_position="start", _item_type="content", _provenance="c2c", id="s2")
+
+    # wdr refinement requests carry the state of the previous response
+    controller._get_k_NN(reco_accessor, model, start_item, 3, {"genre": "a"})
+    assert controller.reco_result_cache.stats()["size"] == 0
+
+    controller.refinement_widget = NoRefinementWidgetRequestManger()
+    first = controller._get_k_NN(reco_accessor, model, start_item, 3, {"genre": "a", "show": "b"})
+    first[0].append("modified")
+    second = controller._get_k_NN(reco_accessor, model, start_item, 3, {"show": "b", "genre": "a"})
+    assert second == (["a", "b"], [0.9, 0.8], "id")
+    assert reco_accessor.get_k_NN.call_count == 2
+
+    results = controller._get_k_NN_many(reco_accessor, model, [start_item, other_item], 3,
+                                        [{"genre": "a", "show": "b"}, {}])
+    assert results == [(["a", "b"], [0.9, 0.8], "id"), (["n_s2"], [0.5], "id")]
+    assert [item.id for item in reco_accessor.get_k_NN_many.call_args.args[0]] == ["s2"]
+
+    # a moved index alias does not serve results of the previous index
+    reco_accessor.get_index_version.return_value = "index_v2"
+    controller._get_k_NN(reco_accessor, model, start_item, 3, {"genre": "a", "show": "b"})
+    assert reco_accessor.get_k_NN.call_count == 3
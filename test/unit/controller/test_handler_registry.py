@@ -0,0 +1,61 @@
+import threading
+from src.controller.handler_registry import HandlerRegistry, get_config_hash, get_handler_key
+
+
+def test_get__creates_handler_once_per_key():
+    registry = HandlerRegistry()
+    created = []
+
+    def factory():
+        created.append(object())
+        return created[-1]
+
+    key = get_handler_key("Handler@module", "opensearch://embedding_01", get_config_hash({"a": 1}))
+    first = registry.get(key, factory)
+    second = registry.get(key, factory)
+    other = registry.get(get_handler_key("Handler@module", "opensearch://embedding_02", "x"), factory)
+
+    assert first is second
+    assert other is not first
+    assert len(created) == 2
+
+
+def test_get__concurrent_first_use_creates_single_instance():
+    registry = HandlerRegistry()
+    barrier = threading.Barrier(8, timeout=5)
+    created = []
+    results = []
+
+    def factory():
+        created.append(object())
+        return created[-1]
+
+    def worker():
+        barrier.wait()
+        results.append(registry.get(("Handler@module", None, "hash"), factory))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(created) == 1
+    assert all(result is created[0] for result in results)
+
+
+def test_invalidate__drops_matching_handlers():
+    registry = HandlerRegistry()
+    registry.get(("A@module", None, "hash"), object)
+    registry.get(("B@module", None, "hash"), object)
+
+    registry.invalidate("A@module")
+    assert len(registry) == 1
+
+    registry.invalidate()
+    assert len(registry) == 0
+
+
+def test_get_config_hash__is_stable_and_order_independent():
+    assert get_config_hash({"a": 1, "b": 2}) == get_config_hash({"b": 2, "a": 1})
+    assert get_config_hash({"a": 1}) != get_config_hash({"a": 2})
@@ -5,8 +5,19 @@ import pytest
 import src.constants as constants
 from src.dto.content_item import ContentItemDto
 from src.dto.user_item import UserItemDto
+from src.dto.history_item import HistoryItemDto
+from src.dto.show_item import ShowItemDto
+from src.dto.wdr_content_item import WDRContentItemDto
 from dataclasses import dataclass, fields
-from src.util.dto_utils import content_fields, dto_from_classname, dto_from_model
+from src.util.dto_utils import (
+    content_fields,
+    dto_from_classname,
+    dto_from_model,
+    get_field_plan,
+    get_source_includes,
+    items_from_props,
+    update_from_props,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -118,3 +129,71 @@ def test_dto_fields_list_succeeds() -> None:
     all_item_props = {f.name for f in fields(i) if f.init}
     content_only_props = content_fields(i)
     assert content_only_props < all_item_props
+
+
+def test_field_plan_applies_field_mapping_and_is_cached() -> None:
+    field_mapping = {"showTitle": "show_title", "created": "createdDate"}
+
+    plan = get_field_plan(ContentItemDto, field_mapping)
+
+    assert {prop for prop, _ in plan} == content_fields(
+        ContentItemDto(_position="start", _item_type="content", _provenance="c2c")
+    )
+    assert ("showTitle", "show_title") in plan
+    assert ("title", "title") in plan
+    assert get_field_plan(ContentItemDto, dict(field_mapping)) is plan
+    assert "show_title" in get_source_includes(ContentItemDto, field_mapping)
+    assert "createdDate" not in get_source_includes(ContentItemDto, field_mapping)
+
+
+def test_update_from_props_uses_mapped_keys() -> None:
+    item = ContentItemDto(_position="start", _item_type="content", _provenance="c2c")
+
+    item = update_from_props(
+        item,
+        {"id": "1", "show_title": "Show", "title": "", "embedding_01": [1, 2]},
+        {"showTitle": "show_title"},
+    )
+
+    assert item.id == "1"
+    assert item.showTitle == "Show"
+    assert item.title == ""
+
+
+def test_items_from_props_hydrates_one_copy_per_source() -> None:
+    template = ContentItemDto(_position="reco", _item_type="content", _provenance="c2c")
+
+    items = items_from_props(
+        template,
+        [{"id": "1", "show_title": "Show"}, {"id": "2", "title": "Title"}],
+        {"showTitle": "show_title"},
+    )
+
+    assert [item.id for item in items] == ["1", "2"]
+    assert items[0].showTitle == "Show"
+    assert items[1].title == "Title"
+    assert items[1].showTitle == ""
+    assert all(item.position == "reco" for item in items)
+    assert template.id == ""
+
+
+def test_content_dto_is_slotted_and_copyable() -> None:
+    item = ContentItemDto(_position="reco", _item_type="content", _provenance="c2c")
+    item.dist = 0.5
+
+    copied = copy.copy(item)
+
+    assert not hasattr(item, "__dict__")
+    assert copied.dist == 0.5
+    assert copied.viewer == "ContentRecoCard@view.cards.content_reco_card"
+    assert {"dist", "client"}.isdisjoint(content_fields(item))
+    with pytest.raises(AttributeError):
+        item.unknown_prop = "value"
+
+
+@pytest.mark.parametrize("dto_class", [ContentItemDto, HistoryItemDto, WDRContentItemDto, ShowItemDto, UserItemDto])
+def test_dto_does_not_duplicate_inherited_slots(dto_class) -> None:
+    slots = [slot for cls in dto_class.__mro__ for slot in cls.__dict__.get("__slots__", ())]
+
+    assert len(slots) == len(set(slots))
+    assert not hasattr(dto_class.__new__(dto_class), "__dict__")
@@ -0,0 +1,125 @@
+import pytest
+from opensearchpy import OpenSearch
+from src.model.opensearch.base_data_accessor_opensearch import (
+    BaseDataAccessorOpenSearch,
+    EmptySearchError,
+)
+from src.dto.content_item import ContentItemDto
+from src.model.opensearch.facet_cache import FacetCache
+
+CONTENT_ITEM_SOURCE_FIELDS = [
+    "id",
+    "externalid",
+    "title",
+    "description",
+    "longDescription",
+    "teaserimage",
+    "genreCategory",
+    "subgenreCategories",
+    "thematicCategories",
+    "showTitle",
+    "createdFormatted",
+    "crid",
+    "showId",
+    "duration",
+]
+
+
+@pytest.fixture
+def accessor(mocker):
+    accessor = BaseDataAccessorOpenSearch(
+        config={
+            "opensearch.user": "test",
+            "opensearch.pass": "test",
+            "opensearch.host": "test",
+            "opensearch.port": "8080",
+            "opensearch.index": "test",
+            "opensearch.use_ssl": True,
+            "opensearch.field_mapping": {},
+        }
+    )
+    accessor.client = mocker.Mock(OpenSearch)
+    return accessor
+
+
+def test_get_items_by_ids_many__single_mget_split_per_row(accessor):
+    accessor.client.mget.return_value = {
+        "docs": [
+            {"_id": "a", "found": True, "_source": {"id": "a"}},
+            {"_id": "b", "found": True, "_source": {"id": "b"}},
+            {"_id": "c", "found": False},
+        ]
+    }
+    item = ContentItemDto(_position="reco", _item_type="test", _provenance="test")
+
+    rows = accessor.get_items_by_ids_many(item, [["b", "a"], [], ["a", "c"], ["c"]])
+
+    accessor.client.mget.assert_called_once_with(
+        body={
+            "docs": [
+                {"_id": id, "_source": {"includes": CONTENT_ITEM_SOURCE_FIELDS}}
+                for id in ["b", "a", "c"]
+            ]
+        },
+        index="test",
+    )
+    assert [item.id for item in rows[0]] == ["b", "a"]
+    assert rows[1] == []
+    assert [item.id for item in rows[2]] == ["a"]
+    assert isinstance(rows[3], EmptySearchError)
+
+
+def test_get_items_by_field_values__single_terms_query(accessor):
+    accessor.client.search.return_value = {
+        "hits": {
+            "hits": [
+                {"_id": "1", "_source": {"id": "1", "externalid": "b"}, "fields": {"externalid.keyword": ["b"]}},
+                {"_id": "2", "_source": {"id": "2", "externalid": "a"}, "fields": {"externalid.keyword": ["a"]}},
+            ]
+        }
+    }
+    item = ContentItemDto(_position="reco", _item_type="test", _provenance="test")
+
+    items = accessor.get_items_by_field_values(item, ["a", "x", "b", "a"], "externalid")
+
+    accessor.client.search.assert_called_once_with(
+        body={
+            "size": 3,
+            "_source": {"includes": CONTENT_ITEM_SOURCE_FIELDS},
+            "query": {"terms": {"externalid.keyword": ["a", "x", "b"]}},
+            "collapse": {"field": "externalid.keyword"},
+        },
+        index="test",
+    )
+    assert {value: item.id for value, item in items.items()} == {"a": "2", "b": "1"}
+
+
+def test_get_items_by_field_values__no_values(accessor):
+    item = ContentItemDto(_position="reco", _item_type="test", _provenance="test")
+
+    assert accessor.get_items_by_field_values(item, [], "externalid") == {}
+    accessor.client.search.assert_not_called()
+
+
+def test_get_unique_vals_for_column__cached_multi_aggregation(accessor, mocker):
+    accessor.field_mapping = {"genre": "genreCategory"}
+    accessor.facet_cache = FacetCache()
+    accessor.client.indices = mocker.Mock()
+    accessor.client.indices.get_alias.return_value = {"test_1": {}}
+    accessor.client.search.return_value = {
+        "aggregations": {
+            "facet_0": {"buckets": [{"key": "Show"}]},
+            "facet_1": {"buckets": [{"key": "b"}, {"key": "a"}]},
+        }
+    }
+
+    accessor.register_facet_columns(["showTitle", "genre"])
+
+    assert accessor.get_unique_vals_for_column("genre") == ["a", "b"]
+    assert accessor.get_unique_vals_for_column("showTitle") == ["Show"]
+    accessor.client.search.assert_called_once()
+    aggs = accessor.client.search.call_args.kwargs["body"]["aggs"]
+    assert aggs == {
+        "facet_0": {"terms": {"field": "showTitle.keyword", "size": 1000}},
+        "facet_1": {"terms": {"field": "genreCategory.keyword", "size": 1000}},
+    }
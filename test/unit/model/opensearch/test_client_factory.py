@@ -0,0 +1,52 @@
+import pytest
+from opensearchpy import Urllib3HttpConnection
+from src.model.opensearch import client_factory
+
+
+@pytest.fixture
+def config():
+    return {
+        "opensearch.user": "test",
+        "opensearch.pass": "test",
+        "opensearch.host": "localhost",
+        "opensearch.port": 9200,
+        "opensearch.use_ssl": False,
+        "opensearch.pool_maxsize": 7,
+    }
+
+
+@pytest.fixture(autouse=True)
+def clear_clients():
+    client_factory.clear_clients()
+    yield
+    client_factory.clear_clients()
+
+
+def test_get_opensearch_client__shared_per_domain_and_credentials(config):
+    client = client_factory.get_opensearch_client(config)
+
+    assert client_factory.get_opensearch_client(dict(config)) is client
+    assert client_factory.get_opensearch_client({**config, "opensearch.user": "other"}) is not client
+
+
+def test_get_opensearch_client__pooled_transport(config):
+    client = client_factory.get_opensearch_client(config)
+    connection = client.transport.connection_pool.connections[0]
+
+    assert isinstance(connection, Urllib3HttpConnection)
+    assert connection.pool.pool.maxsize == 7
+
+
+def test_get_pool_stats(config):
+    client_factory.get_opensearch_client(config)
+
+    assert client_factory.get_pool_stats() == [
+        {
+            "host": "http://localhost:9200",
+            "user": "test",
+            "maxsize": 7,
+            "connections_created": 0,
+            "requests": 0,
+            "idle": 0,
+        }
+    ]
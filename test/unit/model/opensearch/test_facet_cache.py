@@ -0,0 +1,44 @@
+import time
+
+from src.model.opensearch.facet_cache import FacetCache
+
+
+def make_loader(calls, values_by_column):
+    def load(columns):
+        calls.append(dict(columns))
+        return {column: values_by_column[column][:k] for column, k in columns.items()}
+
+    return load
+
+
+def test_get__loads_registered_columns_with_one_query():
+    calls = []
+    load = make_loader(calls, {"genre": ["a", "b"], "show": ["s"]})
+    cache = FacetCache()
+    cache.register("idx", {"genre": 1000, "show": 1000})
+
+    assert cache.get("idx", "genre", 1000, load, lambda: "idx_1") == ["a", "b"]
+    assert cache.get("idx", "show", 1000, load, lambda: "idx_1") == ["s"]
+    assert cache.get("idx", "genre", 1, load, lambda: "idx_1") == ["a"]
+
+    assert calls == [{"genre": 1000, "show": 1000}]
+
+
+def test_get__reloads_in_background_when_alias_moved():
+    calls = []
+    values_by_column = {"genre": ["a"]}
+    load = make_loader(calls, values_by_column)
+    cache = FacetCache(alias_check_interval=0)
+    index = ["idx_1"]
+
+    assert cache.get("idx", "genre", 10, load, lambda: index[0]) == ["a"]
+    values_by_column["genre"] = ["b"]
+    index[0] = "idx_2"
+    # stale values are served while the refresh runs
+    assert cache.get("idx", "genre", 10, load, lambda: index[0]) == ["a"]
+
+    deadline = time.monotonic() + 5
+    while cache.get("idx", "genre", 10, load, lambda: index[0]) != ["b"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cache.get("idx", "genre", 10, load, lambda: index[0]) == ["b"]
+    assert calls == [{"genre": 10}, {"genre": 10}]
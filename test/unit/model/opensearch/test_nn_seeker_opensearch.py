@@ -1,38 +1,39 @@
 import collections
+import numpy as np
 import pytest
-from opensearchpy import OpenSearch
-from src.model.opensearch.nn_seeker_opensearch import NnSeekerOpenSearch
+from opensearchpy import OpenSearch, TransportError
+from src.model.opensearch.nn_seeker_opensearch import (
+    NnSeekerOpenSearch,
+    UnknownItemEmbeddingError,
+)
 from src.dto.content_item import ContentItemDto
+from src.util.cache_utils import LRUCache
 
 
 @pytest.fixture
 def mock_opensearch(mocker):
-    def mock_search(*args, **kwargs):
-        if "bool" in kwargs["body"]["query"]:
-            return {
-                "hits": {
-                    "hits": [
-                        {
-                            "_source": {
-                                "embedding_01": [1, 2],
-                            }
-                        }
-                    ]
-                }
-            }
+    def mock_mget(*args, **kwargs):
         return {
-            "hits": {
-                "hits": [
-                    {
-                        "_id": "test",
-                        "_score": 0.5,
-                    }
-                ]
-            }
+            "docs": [
+                {"_id": doc["_id"], "found": True, "_source": {"embedding_01": [1, 2]}}
+                for doc in kwargs["body"]["docs"]
+            ]
         }
 
     mock_os = mocker.Mock(OpenSearch)
-    mock_os.search.side_effect = mock_search
+    mock_os.search.return_value = {
+        "hits": {
+            "hits": [
+                {
+                    "_id": "test",
+                    "_score": 0.5,
+                }
+            ]
+        }
+    }
+    mock_os.mget.side_effect = mock_mget
+    mock_os.indices = mocker.Mock()
+    mock_os.indices.get_alias.return_value = {"test_idx_1": {"aliases": {"test": {}}}}
     return mock_os
 
 
@@ -44,6 +45,8 @@ def nn_seeker(mock_opensearch):
         field_mapping={"created": "created"},
         base_url_embedding="test",
         api_key="test",
+        vector_cache=LRUCache(),
+        alias_cache=LRUCache(),
     )
 
 
@@ -57,8 +60,8 @@ def test_get_k_nn__by_id__no_filter(nn_seeker):
 
     nn_seeker.get_k_NN(item=item, k=1, nn_filter={})
 
-    assert nn_seeker.client.search.call_count == 2
-    assert nn_seeker.client.search.call_args_list[1].kwargs == {
+    assert nn_seeker.client.search.call_count == 1
+    assert nn_seeker.client.search.call_args_list[0].kwargs == {
         "body": {
             "size": 1,
             "_source": False,
@@ -105,8 +108,8 @@ def test_get_k_nn__by_id__neutral_element_filter_values(nn_seeker):
         },
     )
 
-    assert nn_seeker.client.search.call_count == 2
-    assert nn_seeker.client.search.call_args_list[1].kwargs == {
+    assert nn_seeker.client.search.call_count == 1
+    assert nn_seeker.client.search.call_args_list[0].kwargs == {
         "body": {
             "size": 1,
             "_source": False,
@@ -162,8 +165,8 @@ def test_get_k_nn__by_id__multiple_filter(nn_seeker):
         },
     )
 
-    assert nn_seeker.client.search.call_count == 2
-    assert nn_seeker.client.search.call_args_list[1].kwargs == {
+    assert nn_seeker.client.search.call_count == 1
+    assert nn_seeker.client.search.call_args_list[0].kwargs == {
         "body": {
             "size": 1,
             "sort": [{"created": {"order": "test"}}],
@@ -237,3 +240,257 @@ def test_get_k_nn__by_id__multiple_filter(nn_seeker):
         },
         "index": "test",
     }
+
+
+def test_set_model_config__knn_settings(nn_seeker):
+    nn_seeker.set_model_config(
+        {
+            "endpoint": "opensearch://embedding_02",
+            "knn_mode": "auto",
+            "knn_exact_max_candidates": 42,
+            "knn_engine": "lucene",
+        }
+    )
+
+    assert nn_seeker.embedding_field_name == "embedding_02"
+    assert nn_seeker.knn_mode == "auto"
+    assert nn_seeker.knn_exact_max_candidates == 42
+    assert nn_seeker.knn_engine == "lucene"
+
+
+def test_set_model_config__unknown_knn_mode_falls_back_to_exact(nn_seeker):
+    nn_seeker.set_model_config(
+        {"endpoint": "opensearch://embedding_01", "knn_mode": "fuzzy"}
+    )
+
+    assert nn_seeker.knn_mode == "exact"
+
+
+def test_get_k_nn__approximate__no_filter(nn_seeker):
+    item = ContentItemDto(
+        _position="1",
+        _item_type="test",
+        _provenance="test",
+        id="test",
+    )
+    nn_seeker.knn_mode = "approximate"
+
+    ids, dists, _ = nn_seeker.get_k_NN(item=item, k=1, nn_filter={})
+
+    assert nn_seeker.client.search.call_args_list[0].kwargs == {
+        "body": {
+            "size": 1,
+            "_source": False,
+            "query": {"knn": {"embedding_01": {"vector": [1, 2], "k": 1}}},
+        },
+        "index": "test",
+    }
+    assert ids == ["test"]
+    # nmslib cosinesimil score 1 / (2 - cos) = 0.5 -> cos = 0
+    assert dists == [0]
+
+
+def test_get_k_nn__approximate__efficient_filter(nn_seeker):
+    item = ContentItemDto(
+        _position="1",
+        _item_type="test",
+        _provenance="test",
+        id="test",
+    )
+    nn_seeker.knn_mode = "approximate"
+    nn_seeker.knn_engine = "lucene"
+
+    ids, dists, _ = nn_seeker.get_k_NN(
+        item=item,
+        k=2,
+        nn_filter={"blacklist_id": "a,b", "score_test": 0.5},
+    )
+
+    assert nn_seeker.client.search.call_args_list[0].kwargs["body"] == {
+        "size": 2,
+        "_source": False,
+        "query": {
+            "knn": {
+                "embedding_01": {
+                    "vector": [1, 2],
+                    "k": 2,
+                    "filter": {
+                        "bool": {"must_not": [{"terms": {"id.keyword": ["a", "b"]}}]}
+                    },
+                }
+            }
+        },
+        "min_score": 0.75,
+    }
+    # lucene cosinesimil score (1 + cos) / 2 = 0.5 -> cos = 0
+    assert dists == [0]
+
+
+def test_get_k_nn__approximate__post_filter_oversamples(nn_seeker):
+    item = ContentItemDto(
+        _position="1",
+        _item_type="test",
+        _provenance="test",
+        id="test",
+    )
+    nn_seeker.knn_mode = "approximate"
+
+    nn_seeker.get_k_NN(item=item, k=2, nn_filter={"blacklist_id": "a"})
+
+    assert nn_seeker.client.search.call_args_list[0].kwargs["body"]["query"] == {
+        "bool": {
+            "must": [{"knn": {"embedding_01": {"vector": [1, 2], "k": 10}}}],
+            "filter": [
+                {"bool": {"must_not": [{"terms": {"id.keyword": ["a"]}}]}}
+            ],
+        }
+    }
+
+
+@pytest.mark.parametrize(
+    "num_candidates, expected_query_type",
+    [(10, "script_score"), (11, "bool")],
+)
+def test_get_k_nn__auto__plans_by_filter_selectivity(
+    nn_seeker, num_candidates, expected_query_type
+):
+    item = ContentItemDto(
+        _position="1",
+        _item_type="test",
+        _provenance="test",
+        id="test",
+    )
+    nn_seeker.knn_mode = "auto"
+    nn_seeker.knn_exact_max_candidates = 10
+    nn_seeker.client.count.return_value = {"count": num_candidates}
+
+    nn_seeker.get_k_NN(item=item, k=1, nn_filter={"blacklist_id": "a"})
+
+    nn_seeker.client.count.assert_called_once_with(
+        body={"query": {"bool": {"must_not": [{"terms": {"id.keyword": ["a"]}}]}}},
+        index="test",
+    )
+    query = nn_seeker.client.search.call_args_list[0].kwargs["body"]["query"]
+    assert expected_query_type in query
+
+
+def test_get_vectors__batches_misses_and_caches_float32(nn_seeker):
+    vectors = nn_seeker.get_vectors(["a", "b", "a"])
+
+    nn_seeker.client.mget.assert_called_once_with(
+        body={
+            "docs": [
+                {"_id": "a", "_source": {"include": ["embedding_01"]}},
+                {"_id": "b", "_source": {"include": ["embedding_01"]}},
+            ]
+        },
+        index="test",
+    )
+    assert list(vectors) == ["a", "b"]
+    assert vectors["a"].dtype == np.float32
+    assert ("test_idx_1", "embedding_01", "a") in nn_seeker.vector_cache._data
+
+    nn_seeker.get_vectors(["a", "b", "c"])
+
+    assert nn_seeker.client.mget.call_args.kwargs["body"] == {
+        "docs": [{"_id": "c", "_source": {"include": ["embedding_01"]}}]
+    }
+
+
+def test_get_vectors__skips_items_without_embedding(nn_seeker):
+    nn_seeker.client.mget.side_effect = None
+    nn_seeker.client.mget.return_value = {
+        "docs": [
+            {"_id": "a", "found": False},
+            {"_id": "b", "found": True, "_source": {}},
+        ]
+    }
+
+    assert nn_seeker.get_vectors(["a", "b"]) == {}
+    assert len(nn_seeker.vector_cache) == 0
+
+
+def test_get_k_nn__unknown_embedding_raises(nn_seeker):
+    nn_seeker.client.mget.side_effect = None
+    nn_seeker.client.mget.return_value = {"docs": [{"_id": "test", "found": False}]}
+    item = ContentItemDto(
+        _position="1",
+        _item_type="test",
+        _provenance="test",
+        id="test",
+    )
+
+    with pytest.raises(UnknownItemEmbeddingError):
+        nn_seeker.get_k_NN(item=item, k=1, nn_filter={})
+
+
+def test_get_vectors__alias_change_clears_cache(nn_seeker, mocker):
+    nn_seeker.get_vectors(["a"])
+    assert len(nn_seeker.vector_cache) == 1
+
+    nn_seeker.client.indices.get_alias.return_value = {
+        "test_idx_2": {"aliases": {"test": {}}}
+    }
+    mocker.patch.object(NnSeekerOpenSearch, "ALIAS_RESOLUTION_TTL", 0)
+    nn_seeker.get_vectors(["a"])
+
+    assert nn_seeker.client.mget.call_count == 2
+    assert list(nn_seeker.vector_cache._data) == [("test_idx_2", "embedding_01", "a")]
+
+
+def test_get_k_nn_many__one_mget_and_one_msearch(nn_seeker):
+    nn_seeker.client.mget.side_effect = None
+    nn_seeker.client.mget.return_value = {
+        "docs": [
+            {"_id": "a", "found": True, "_source": {"embedding_01": [1, 2]}},
+            {"_id": "b", "found": False},
+            {"_id": "c", "found": True, "_source": {"embedding_01": [3, 4]}},
+        ]
+    }
+    nn_seeker.client.msearch.return_value = {
+        "responses": [
+            {"hits": {"hits": [{"_id": "x", "_score": 1.5}]}},
+            {"error": {"type": "search_phase_execution_exception"}, "status": 400},
+        ]
+    }
+    items = [
+        ContentItemDto(_position="1", _item_type="test", _provenance="test", id=id)
+        for id in ["a", "b", "c"]
+    ]
+
+    results = nn_seeker.get_k_NN_many(items=items, k=1, nn_filters=[{}, {}, {}])
+
+    nn_seeker.client.mget.assert_called_once()
+    nn_seeker.client.search.assert_not_called()
+    body = nn_seeker.client.msearch.call_args.kwargs["body"]
+    assert body[0] == {"index": "test"}
+    assert body[1]["query"]["script_score"]["script"]["params"]["query_value"] == [1, 2]
+    assert body[3]["query"]["script_score"]["script"]["params"]["query_value"] == [3, 4]
+    assert results[0] == (["x"], [0.5], "id")
+    assert isinstance(results[1], UnknownItemEmbeddingError)
+    assert isinstance(results[2], TransportError)
+
+
+def test_get_k_nn_many__auto_plans_with_one_msearch(nn_seeker):
+    nn_seeker.knn_mode = "auto"
+    nn_seeker.knn_exact_max_candidates = 10
+    nn_seeker.client.msearch.side_effect = [
+        {
+            "responses": [
+                {"hits": {"total": {"value": 5}, "hits": []}},
+                {"hits": {"total": {"value": 50}, "hits": []}},
+            ]
+        },
+        {"responses": [{"hits": {"hits": []}}, {"hits": {"hits": []}}]},
+    ]
+    items = [
+        ContentItemDto(_position="1", _item_type="test", _provenance="test", id=id)
+        for id in ["a", "b"]
+    ]
+
+    nn_seeker.get_k_NN_many(items=items, k=1, nn_filters=[{}, {}])
+
+    assert nn_seeker.client.msearch.call_count == 2
+    body = nn_seeker.client.msearch.call_args.kwargs["body"]
+    assert "script_score" in body[1]["query"]
+    assert "knn" in body[3]["query"]
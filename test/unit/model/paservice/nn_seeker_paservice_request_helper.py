@@ -33,7 +33,7 @@ def test_get_headers():
     headers = helper.get_headers()
     assert headers == {"x": "y"}
 
-def test_get_success():
+def test_get_success(mocker):
     helper = RequestHelper()
     helper.set_model_config(TEST_CONFIG)
 
@@ -41,13 +41,13 @@ def test_get_success():
     mock_response.status = 200
     mock_response.data = b'{"result": "ok"}'
 
-    helper._http.request = MagicMock(return_value=mock_response)
+    mocker.patch.object(helper._http, "request", return_value=mock_response)
 
     status, data = helper.get()
     assert status == 200
     assert data == {"result": "ok"}
 
-def test_post_success():
+def test_post_success(mocker):
     helper = RequestHelper()
     helper.set_model_config(TEST_CONFIG)
 
@@ -55,7 +55,7 @@ def test_post_success():
     mock_response.status = 201
 
 
-    helper._http.request = MagicMock(return_value=mock_response)
+    mocker.patch.object(helper._http, "request", return_value=mock_response)
 
     status, data = helper.post(json_body={"some": "data"})
     assert status == 201
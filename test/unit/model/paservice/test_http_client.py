@@ -0,0 +1,46 @@
+import json
+from pytest_httpx import HTTPXMock
+from src.model.rest.http_client import clear_clients, format_for_log, get_async_http_client, get_http_pool, run_async
+from src.model.rest.nn_seeker_paservice_request_helper import RequestHelper
+
+TEST_CONFIG = {
+    "endpoint": "https://test.io/recos",
+    "properties": {
+        "auth_header": "x",
+        "auth_header_value": "y"
+    },
+}
+
+
+def test_get_http_pool__is_shared_per_settings():
+    assert RequestHelper()._http is RequestHelper()._http
+    assert get_http_pool({"rest.pool_maxsize": 3}) is get_http_pool({"rest.pool_maxsize": 3})
+    assert get_http_pool({"rest.pool_maxsize": 3}) is not get_http_pool()
+
+
+def test_format_for_log__caps_long_bodies():
+    assert format_for_log({"a": 1}) == "{'a': 1}"
+    assert format_for_log("x" * 20, max_length=5) == "xxxxx... (20 characters)"
+
+
+
+def test_apost(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(url="https://test.io/recos", json={"result": "ok"})
+    helper = RequestHelper()
+    helper.set_model_config(TEST_CONFIG)
+
+    status, data = run_async(helper.apost(json_body={"some": "data"}))
+
+    assert (status, data) == (200, {"result": "ok"})
+    request = httpx_mock.get_request()
+    assert request.headers["x"] == "y"
+    assert json.loads(request.content) == {"some": "data"}
+
+
+def test_clear_clients__closes_async_clients():
+    client = get_async_http_client()
+
+    clear_clients()
+
+    assert client.is_closed
+    assert get_async_http_client() is not client
@@ -1,5 +1,7 @@
 import json
+from dataclasses import replace
 import pytest
+from pytest_httpx import HTTPXMock
 from urllib3 import HTTPResponse
 from src.constants import ITEM_POSITION_START
 from src.dto.content_item import ContentItemDto
@@ -8,7 +10,9 @@ from src.model.opensearch.base_data_accessor_opensearch import (
     BaseDataAccessorOpenSearch,
 )
 from src.model.rest.nn_seeker_paservice import NnSeekerPaService
+from src.model.rest.nn_seeker_rest import UnknownItemError
 from src.model.rest.nn_seeker_paservice_show import NnSeekerPaServiceShow
+from src.util.cache_utils import LRUCache
 
 TEST_CONFIG = {
     "opensearch": {
@@ -87,6 +91,31 @@ def test_get_k_NN(mocker):
     )
 
 
+def test_get_k_NN_many__sends_requests_concurrently(httpx_mock: HTTPXMock):
+    for asset_id, status_code in [("a", 200), ("b", 200), ("c", 404)]:
+        httpx_mock.add_response(
+            url="https://test.io/recos",
+            match_headers={"test": "test"},
+            match_json={
+                "configuration": "relatedItems",
+                "assetId": asset_id,
+                "limit": 40,
+                "similarityType": "content",
+                "abGroup": "B",
+            },
+            status_code=status_code,
+            json={"recommendations": [{"score": 0.2, "asset": {"assetId": asset_id + "2"}}]},
+        )
+    nn_seeker = NnSeekerPaService(TEST_CONFIG)
+    nn_seeker.set_model_config(TEST_MODEL_CONFIG_C2C)
+    items = [ContentItemDto("test", "test", "test", externalid=id) for id in ["a", "b", "c"]]
+
+    results = nn_seeker.get_k_NN_many(items, 40, [{}, {}, {}])
+
+    assert results[:2] == [(["a2"], [0.2], "externalid", None), (["b2"], [0.2], "externalid", None)]
+    assert isinstance(results[2], UnknownItemError)
+
+
 def test_get_recos_user(mocker):
     mock_request = mocker.patch(
         "urllib3.PoolManager.request",
@@ -189,13 +218,13 @@ def test_nn_seeker_pa_service_show_get_recos_user(mocker):
         ),
     )
     mock_item_accessor = mocker.Mock(spec=BaseDataAccessorOpenSearch)
+    mock_item_accessor.target_idx_name = "test"
 
-    def mock_get_item_by_urn(item_dto, show_id):
-        item_dto.episode = show_id + "_1"
-        return [[item_dto]]
+    def mock_get_items_by_urns(item_dto, show_ids):
+        return {show_id: replace(item_dto, episode=show_id + "_1") for show_id in show_ids}
 
-    mock_item_accessor.get_item_by_urn.side_effect = mock_get_item_by_urn
-    nn_seeker = NnSeekerPaServiceShow(TEST_CONFIG, mock_item_accessor)
+    mock_item_accessor.get_items_by_urns.side_effect = mock_get_items_by_urns
+    nn_seeker = NnSeekerPaServiceShow(TEST_CONFIG, mock_item_accessor, LRUCache())
     nn_seeker.set_model_config(TEST_MODEL_CONFIG_U2C)
 
     ids, scores, oss_field, utilities = nn_seeker.get_recos_user(
@@ -222,3 +251,40 @@ def test_nn_seeker_pa_service_show_get_recos_user(mocker):
         },
         headers={"test": "test"},
     )
+
+
+def test_nn_seeker_pa_service_show_get_recos_user__resolves_episodes_with_one_query(mocker):
+    mocker.patch(
+        "urllib3.PoolManager.request",
+        return_value=HTTPResponse(
+            body=json.dumps(
+                {
+                    "recommendations": [
+                        {"score": 0.3, "asset": {"assetId": "show3"}},
+                        {"score": 0.2, "asset": {"assetId": "show2"}},
+                        {"score": 0.1, "asset": {"assetId": " show1 "}},
+                    ]
+                }
+            ).encode(),
+            status=200,
+        ),
+    )
+    mock_item_accessor = mocker.Mock(spec=BaseDataAccessorOpenSearch)
+    mock_item_accessor.target_idx_name = "test"
+    mock_item_accessor.get_items_by_urns.side_effect = lambda item_dto, show_ids: {
+        show_id: replace(item_dto, episode=show_id + "_1") for show_id in show_ids if show_id != "show2"
+    }
+    nn_seeker = NnSeekerPaServiceShow(TEST_CONFIG, mock_item_accessor, LRUCache())
+    nn_seeker.set_model_config(TEST_MODEL_CONFIG_U2C)
+    user = UserItemDto(ITEM_POSITION_START, "test", "test", "test")
+
+    for _ in range(2):
+        ids, scores, _, _ = nn_seeker.get_recos_user(user, 3, {})
+
+        # shows without an episode are dropped together with their score
+        assert ids == ["show3_1", "show1_1"]
+        assert scores == [0.3, 0.1]
+
+    # the second call serves the found episodes from the cache and only looks up the miss again
+    assert [call.args[1] for call in mock_item_accessor.get_items_by_urns.call_args_list] == [
+        ["show3", "show2", "show1"], ["show2"]]
@@ -13,28 +13,28 @@ TEST_CONFIG = {
     },
 }
 
-def test_get_clients():
+def test_get_clients(mocker):
     client = NnSeekerPaServiceClients(TEST_CONFIG)
 
     mock_response = MagicMock()
     mock_response.status = 200
     mock_response.data = b'{"clients": [{"identifier": "client_1"}, {"identifier": "client_2"}]}'
 
-    # Mock the HTTP request
-    client._http.request = MagicMock(return_value=mock_response)
+    # Mock the HTTP request, the pool is shared by all clients
+    mocker.patch.object(client._http, "request", return_value=mock_response)
 
     result = client.get_clients()
     assert result == ["client_1", "client_2"]
 
 
-def test_get_clients_failure():
+def test_get_clients_failure(mocker):
     client = NnSeekerPaServiceClients(TEST_CONFIG)
 
     mock_response = MagicMock()
     mock_response.status = 500
     mock_response.data = b'{"error": "Internal server error"}'
 
-    client._http.request = MagicMock(return_value=mock_response)
+    mocker.patch.object(client._http, "request", return_value=mock_response)
 
     with pytest.raises(ValueError) as exc_info:
         client.get_clients()
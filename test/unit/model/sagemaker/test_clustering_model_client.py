@@ -0,0 +1,52 @@
+import pytest
+from src import constants
+from src.model.sagemaker.aws_clients import get_aws_client
+from src.model.sagemaker.clustering_model_client import ClusteringModelClient, UnknownUserError
+from src.util.cache_utils import LRUCache
+
+
+@pytest.fixture
+def clustering_client(sagemaker_stub) -> ClusteringModelClient:
+    config = {
+        constants.MODEL_CONFIG_U2C: {
+            "clustering_models": {
+                "U2C-Knn-Model": {"role_arn": "arn:aws:iam::123:role/test", "endpoint_url": sagemaker_stub["url"]}
+            }
+        }
+    }
+    client = ClusteringModelClient(config, LRUCache())
+    client.set_model_config({"endpoint": "sagemaker://clustering"})
+    return client
+
+
+def test_get_user_cluster__serves_repeated_calls_from_cache(clustering_client, sagemaker_stub):
+    sagemaker_stub["responses"]["list_clusters"] = {
+        "clusters": [{"label": "sport", "userids": ["u1", "u2"]}, {"label": "news", "userids": ["u3"]}]
+    }
+
+    first = clustering_client.get_user_cluster()
+    first["sport"].append("modified")
+    second = clustering_client.get_user_cluster()
+
+    assert second == {"sport": ["u1", "u2"], "news": ["u3"]}
+    assert sagemaker_stub["requests"] == [("/endpoints/clustering/invocations", {"action": "list_clusters"})]
+
+
+def test_get_users_by_category(clustering_client, sagemaker_stub):
+    sagemaker_stub["responses"]["filter_users"] = ["u1"]
+
+    assert clustering_client.get_users_by_category("Sport") == {"Sport": ["u1"]}
+    assert sagemaker_stub["requests"][0][1]["params"]["filters"] == [{"column": "genreCategory", "value": "Sport"}]
+
+    sagemaker_stub["responses"]["filter_users"] = []
+    with pytest.raises(UnknownUserError):
+        clustering_client.get_users_by_category("Krimi")
+
+
+def test_get_aws_client__is_shared_per_role(sagemaker_stub):
+    client = get_aws_client("sagemaker-runtime", "arn:aws:iam::123:role/test", endpoint_url=sagemaker_stub["url"])
+
+    assert get_aws_client("sagemaker-runtime", "arn:aws:iam::123:role/test",
+                          endpoint_url=sagemaker_stub["url"]) is client
+    assert get_aws_client("sagemaker-runtime", "arn:aws:iam::123:role/other",
+                          endpoint_url=sagemaker_stub["url"]) is not client
@@ -0,0 +1,39 @@
+from src.util.cache_utils import LRUCache
+
+
+def test_lru_cache__evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_lru_cache__expires_entries_after_ttl(mocker):
+    monotonic = mocker.patch("src.util.cache_utils.time.monotonic", return_value=0)
+    cache = LRUCache(ttl=10)
+    cache.set("a", 1)
+
+    monotonic.return_value = 5
+    assert cache.get("a") == 1
+    monotonic.return_value = 11
+    assert cache.get("a") is None
+
+
+def test_lru_cache__stats():
+    cache = LRUCache(maxsize=10)
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("b")
+
+    assert cache.stats() == {
+        "size": 1,
+        "maxsize": 10,
+        "hits": 1,
+        "misses": 1,
+        "hit_ratio": 0.5,
+    }
@@ -0,0 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.util.cancellation import (
+    CancellationToken,
+    SearchCancelledError,
+    raise_if_cancelled,
+    run_cancellable,
+    submit_with_context,
+)
+
+
+def test_raise_if_cancelled__without_token_does_nothing():
+    raise_if_cancelled()
+
+
+def test_run_cancellable__raises_after_cancel():
+    token = CancellationToken()
+    stages = []
+
+    def search():
+        stages.append("start items")
+        raise_if_cancelled()
+        token.cancel()
+        stages.append("reco items")
+        raise_if_cancelled()
+        stages.append("hydration")
+
+    with pytest.raises(SearchCancelledError):
+        run_cancellable(token, search)
+    assert stages == ["start items", "reco items"]
+    # the token is only active within run_cancellable
+    raise_if_cancelled()
+
+
+def test_submit_with_context__keeps_token_in_worker_threads():
+    token = CancellationToken()
+    token.cancel()
+
+    def search():
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return submit_with_context(executor, raise_if_cancelled).exception()
+
+    assert isinstance(run_cancellable(token, search), SearchCancelledError)
@@ -10,7 +10,10 @@ from src.util.file_utils import (
     get_client_ident_from_search,
     _get_model_config_from_endpoint,
     load_model_configuration,
-    ConfigError
+    read_yaml,
+    ConfigError,
+    CONFIG_CACHE,
+    MODEL_CONFIG_CACHE,
 )
 
 from src.util.dataclasses.setup_configuration_data_class import SetupConfiguration
@@ -25,6 +28,12 @@ from src.util.dataclasses.model_configuration_data_class import (
 
 TEST_CONFIGS_DIRECTORY = "test_configs"
 
+
+@pytest.fixture(autouse=True)
+def clear_config_caches():
+    CONFIG_CACHE.clear()
+    MODEL_CONFIG_CACHE.clear()
+
 def load_yaml_config(filename):
     file_path = os.path.join(os.path.dirname(__file__), TEST_CONFIGS_DIRECTORY, filename)
     with open(file_path, "r") as file:
@@ -127,6 +136,18 @@ def test_load_ui_config__inline_config(full_path):
     assert result == config
 
 
+def test_read_yaml__parses_once_and_returns_copies(mocker):
+    path = Path(__file__).parent / TEST_CONFIGS_DIRECTORY / "test_ui_config.yaml"
+    envyaml = mocker.patch("src.util.file_utils.EnvYAML", wraps=__import__("envyaml").EnvYAML)
+
+    first = read_yaml(path, include_environment=False)
+    first["ui_config"]["title"] = "changed"
+    second = read_yaml(path, include_environment=False)
+
+    assert envyaml.call_count == 1
+    assert second["ui_config"]["title"] == "Test Recommender Explorer"
+
+
 def test_get_client_options(config_dummy, config_test):
     result = get_client_options({"test": config_test, "dummy": config_dummy})
 
@@ -177,6 +198,21 @@ def test_get_model_config_from_endpoint_without_model_key(httpx_mock, config_wit
     assert result == {"config": "all_models_data"}
 
 
+def test_get_model_config_from_endpoint__reuses_response(httpx_mock, config_without_model_key):
+    httpx_mock.add_response(
+        url="https://example.com/model_config",
+        method="GET",
+        json={"config": "all_models_data"}
+    )
+
+    first = _get_model_config_from_endpoint(config_without_model_key)
+    first["config"] = "changed"
+    second = _get_model_config_from_endpoint(config_without_model_key)
+
+    assert second == {"config": "all_models_data"}
+    assert len(httpx_mock.get_requests()) == 1
+
+
 def test_get_model_config_from_endpoint_missing_required_keys(config_missing_required_keys):
     with pytest.raises(ConfigError, match="Missing base URL or API key in configuration."):
         _get_model_config_from_endpoint(config_missing_required_keys)
@@ -6,8 +6,28 @@ from test.test_util import mock_start_filter_component, mock_start_and_reco_item
 logger = logging.getLogger(__name__)
 
 def test_filter_duplicates() -> None:
-    parameters = ['crid']
     start_item, reco_items = mock_start_and_reco_items_with_duplicates()
     filter_postproc = FilterPostproc()
-    nn_items = filter_postproc.filterDuplicates(start_item, reco_items, parameters)
-    assert len(nn_items) < len(reco_items)
\ No newline at end of file
+    nn_items = filter_postproc.apply(start_item, reco_items, [['filterDuplicateCrid', 'crid']])
+    assert len(nn_items) < len(reco_items)
+
+def test_filter_duplicates_composes_parameters_in_order() -> None:
+    start_item, reco_items = mock_start_and_reco_items_with_duplicates()
+    filter_postproc = FilterPostproc()
+    nn_items = filter_postproc.apply(
+        start_item, reco_items, [['filterDuplicateCrid', 'crid'], ['filterDuplicateDescription', 'description']])
+    assert [item.crid for item in nn_items] == ['crid://video2', 'crid://video3', 'crid://video4', 'crid://video5']
+
+
+def test_filter_postproc_applies_registered_chain() -> None:
+    start_item, reco_items = mock_start_and_reco_items_with_duplicates()
+    filter_postproc = FilterPostproc()
+    filter_postproc.register('filterFirst', lambda start, items, parameter: items[:1])
+    nn_items = filter_postproc.apply(start_item, reco_items, [['filterDuplicateImageUrl', 'teaserimage'], ['filterFirst', 'crid']])
+    assert nn_items == reco_items[:1]
+
+def test_filter_postproc_skips_unknown_postprocessors() -> None:
+    start_item, reco_items = mock_start_and_reco_items_with_duplicates()
+    filter_postproc = FilterPostproc()
+    nn_items = filter_postproc.apply(start_item, reco_items, [['filterDuplicateTeaser', 'crid']])
+    assert nn_items == reco_items